@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from app.config import settings
 from app.database import Base
 from app import models  # noqa: F401
+from app.partitions import is_partition
 
 config = context.config
 
@@ -25,6 +26,12 @@ if config.config_file_name is not None:
 # Set target_metadata to model's metadata
 target_metadata = Base.metadata
 
+def include_name(name, type_, parent_names):
+    # Monthly transactions partitions are created at runtime (app/partitions.py), not by migrations
+    if type_ == "table":
+        return not is_partition(name)
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -41,6 +48,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -64,7 +72,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
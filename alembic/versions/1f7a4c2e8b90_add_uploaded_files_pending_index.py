@@ -0,0 +1,29 @@
+"""Index pending uploads for the /upload backlog count
+
+Revision ID: 1f7a4c2e8b90
+Revises: 6e3f8a1c9d47
+Create Date: 2026-10-18 10:02:36.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f7a4c2e8b90'
+down_revision: Union[str, Sequence[str], None] = '6e3f8a1c9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_uploaded_pending', 'uploaded_files', ['created_at'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_uploaded_pending', table_name='uploaded_files', postgresql_where=sa.text("status = 'pending'"))
@@ -0,0 +1,40 @@
+"""Add ingestion manifest
+
+Revision ID: 354d727c2d2c
+Revises: 7678b79d5fc0
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '354d727c2d2c'
+down_revision: Union[str, Sequence[str], None] = '7678b79d5fc0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_manifest',
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('range_start', sa.BigInteger(), nullable=False),
+    sa.Column('range_end', sa.BigInteger(), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('byte_offset', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('rows_read', sa.BigInteger(), nullable=False),
+    sa.Column('rows_inserted', sa.BigInteger(), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('file_path', 'range_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingestion_manifest')
@@ -0,0 +1,34 @@
+"""Cover user_daily_spend's aggregates in its primary key
+
+Revision ID: 4b7d2e9f1c35
+Revises: 9c4e7b1a2f60
+Create Date: 2026-10-17 22:03:17.584120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7d2e9f1c35'
+down_revision: Union[str, Sequence[str], None] = '9c4e7b1a2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Same key, so ingestion's ON CONFLICT (user_id, spend_date) still finds it; the swap is one transaction
+    op.drop_constraint('user_daily_spend_pkey', 'user_daily_spend', type_='primary')
+    op.execute(
+        "ALTER TABLE user_daily_spend ADD CONSTRAINT user_daily_spend_pkey PRIMARY KEY (user_id, spend_date) "
+        "INCLUDE (total_amount, txn_count, min_amount, max_amount)"
+    )
+    op.execute("ANALYZE user_daily_spend")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('user_daily_spend_pkey', 'user_daily_spend', type_='primary')
+    op.create_primary_key('user_daily_spend_pkey', 'user_daily_spend', ['user_id', 'spend_date'])
@@ -0,0 +1,37 @@
+"""Track each upload's ingestion status in uploaded_files
+
+Revision ID: 6e3f8a1c9d47
+Revises: 4b7d2e9f1c35
+Create Date: 2026-10-18 09:14:52.671340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e3f8a1c9d47'
+down_revision: Union[str, Sequence[str], None] = '4b7d2e9f1c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Deployment-mode uploads left no trace of how their ingestion went, so they're assumed loaded;
+    # inbox uploads take their inbox file's status
+    op.add_column('uploaded_files', sa.Column('status', sa.String(), server_default='loaded', nullable=False))
+    op.alter_column('uploaded_files', 'status', server_default=None)
+    op.execute("""
+        UPDATE uploaded_files u
+        SET status = CASE WHEN i.status IN ('pending', 'processing') THEN 'pending' ELSE i.status END
+        FROM inbox_files i
+        WHERE i.file_id = u.file_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('uploaded_files', 'status')
@@ -0,0 +1,159 @@
+"""Store transactions as cents in a padding-free column order
+
+Revision ID: 9c4e7b1a2f60
+Revises: d52a9c7e1f08
+Create Date: 2026-10-17 21:12:40.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e7b1a2f60'
+down_revision: Union[str, Sequence[str], None] = 'd52a9c7e1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Online: the new layout is built as transactions_v2 next to the live table, a trigger mirrors writes into it,
+# existing rows are copied in committed batches, and the two are swapped under a short lock at the end.
+V2_COLUMNS = "transaction_id, timestamp, amount_cents, user_id, product_id"
+BACKFILL_BATCH_ROWS = 50_000
+
+V2_PARTITIONS_SQL = sa.text("""
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'transactions'::regclass
+    AND to_regclass(c.relname || '_v2') IS NULL
+    ORDER BY c.relname
+""")
+
+# The v2 table, its partitions and all their indexes (the primary keys' included)
+V2_RELATIONS_SQL = sa.text("""
+    WITH tables AS (
+        SELECT 'transactions_v2'::regclass AS oid
+        UNION ALL SELECT inhrelid FROM pg_inherits WHERE inhparent = 'transactions_v2'::regclass
+    )
+    SELECT c.relname, c.relkind FROM pg_class c WHERE c.oid IN (SELECT oid FROM tables)
+    UNION ALL
+    SELECT c.relname, c.relkind FROM pg_index ix JOIN pg_class c ON c.oid = ix.indexrelid
+    WHERE ix.indrelid IN (SELECT oid FROM tables)
+""")
+
+MIRROR_FUNCTION_SQL = f"""
+    CREATE FUNCTION transactions_v2_mirror() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM transactions_v2 WHERE transaction_id = OLD.transaction_id AND timestamp = OLD.timestamp;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO transactions_v2 ({V2_COLUMNS})
+            VALUES (NEW.transaction_id, NEW.timestamp, ROUND(NEW.transaction_amount * 100), NEW.user_id, NEW.product_id)
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END $$
+"""  # nosec B608  # V2_COLUMNS is a constant, not input
+
+# Keyset walk over (timestamp, transaction_id); returns the batch's last key, or nothing once the table is done
+BACKFILL_BATCH_SQL = sa.text(f"""
+    WITH batch AS (
+        SELECT transaction_id, timestamp, ROUND(transaction_amount * 100) AS amount_cents, user_id, product_id
+        FROM transactions
+        WHERE (timestamp, transaction_id) > (:after_timestamp, :after_transaction_id)
+        ORDER BY timestamp, transaction_id
+        LIMIT :batch_rows
+    ),
+    copied AS (
+        INSERT INTO transactions_v2 ({V2_COLUMNS})
+        SELECT {V2_COLUMNS} FROM batch
+        ON CONFLICT DO NOTHING
+    )
+    SELECT timestamp, transaction_id FROM batch ORDER BY timestamp DESC, transaction_id DESC LIMIT 1
+""")  # nosec B608  # V2_COLUMNS is a constant, not input
+
+
+def create_v2_partitions(conn):
+    """
+    A v2 partition for every partition transactions has and v2 doesn't yet. A month created mid-migration
+    had its mirrored rows land in v2's default partition: those are moved out and copied again from the source.
+    """
+    # Partition names and bounds come from the catalog, the columns are a constant
+    for name, bound in conn.execute(V2_PARTITIONS_SQL).fetchall():
+        op.execute(
+            f"DELETE FROM transactions_default_v2 d USING {name} t "
+            f"WHERE d.transaction_id = t.transaction_id AND d.timestamp = t.timestamp"  # nosec B608
+        )
+        op.execute(f"CREATE TABLE {name}_v2 PARTITION OF transactions_v2 {bound}")
+        op.execute(
+            f"INSERT INTO transactions_v2 ({V2_COLUMNS}) "
+            f"SELECT transaction_id, timestamp, ROUND(transaction_amount * 100), user_id, product_id FROM {name} "
+            f"ON CONFLICT DO NOTHING"  # nosec B608
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    nulls = conn.execute(sa.text("SELECT COUNT(*) FROM transactions WHERE user_id IS NULL")).scalar()
+    if nulls:
+        raise RuntimeError(f"{nulls} transactions have no user_id; fix or delete them before migrating.")
+
+    # The setup commits before the backfill, so a run that failed after it leaves these behind
+    op.execute("DROP TRIGGER IF EXISTS transactions_v2_mirror ON transactions")
+    op.execute("DROP FUNCTION IF EXISTS transactions_v2_mirror()")
+    op.execute("DROP TABLE IF EXISTS transactions_v2")
+
+    # Widest columns first: 16 + 8 + 8 + 4 + 4 bytes, no alignment padding between them
+    op.create_table('transactions_v2',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('amount_cents', sa.BigInteger(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('transaction_id', 'timestamp', name='transactions_v2_pkey'),
+    postgresql_partition_by='RANGE (timestamp)'
+    )
+    op.create_index('idx_user_timestamp_v2', 'transactions_v2', ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_transactions_timestamp_v2', 'transactions_v2', ['timestamp'], unique=False)
+    op.execute("CREATE TABLE transactions_default_v2 PARTITION OF transactions_v2 DEFAULT")
+    create_v2_partitions(conn)
+
+    op.execute(MIRROR_FUNCTION_SQL)
+    op.execute(
+        "CREATE TRIGGER transactions_v2_mirror AFTER INSERT OR UPDATE OR DELETE ON transactions "
+        "FOR EACH ROW EXECUTE FUNCTION transactions_v2_mirror()"
+    )
+
+    # Commits the above, then each batch on its own so ingestion keeps running while rows are copied
+    with op.get_context().autocommit_block():
+        after = ("-infinity", "00000000-0000-0000-0000-000000000000")
+        while True:
+            last = conn.execute(BACKFILL_BATCH_SQL, {
+                "after_timestamp": after[0], "after_transaction_id": str(after[1]), "batch_rows": BACKFILL_BATCH_ROWS,
+            }).first()
+            if last is None:
+                break
+            after = tuple(last)
+
+    # The swap: everything from here commits together with the version bump
+    op.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+    create_v2_partitions(conn) # Months created while the backfill ran
+    op.execute("DROP TRIGGER transactions_v2_mirror ON transactions")
+    op.execute("DROP FUNCTION transactions_v2_mirror()")
+    op.drop_table('transactions')
+    for relname, relkind in conn.execute(V2_RELATIONS_SQL).fetchall():
+        kind = "INDEX" if relkind in ("i", "I") else "TABLE"
+        op.execute(f"ALTER {kind} {relname} RENAME TO {relname.replace('_v2', '', 1)}")
+    op.execute("ANALYZE transactions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Offline: rewrites every row under an exclusive lock
+    op.add_column('transactions', sa.Column('transaction_amount', sa.DECIMAL(precision=10, scale=2), nullable=True))
+    op.execute("UPDATE transactions SET transaction_amount = amount_cents * 0.01")
+    op.drop_column('transactions', 'amount_cents')
+    op.alter_column('transactions', 'user_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,29 @@
+"""Drop the sequence user_aggregates.user_id got as a lone Integer primary key
+
+Revision ID: 9d2b6e4f7a13
+Revises: 1f7a4c2e8b90
+Create Date: 2026-10-18 11:20:07.402815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2b6e4f7a13'
+down_revision: Union[str, Sequence[str], None] = '1f7a4c2e8b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created before c7e2f5a19b34 set autoincrement=False have it as SERIAL; user_id always comes from transactions
+    op.execute("ALTER TABLE user_aggregates ALTER COLUMN user_id DROP DEFAULT")
+    op.execute("DROP SEQUENCE IF EXISTS user_aggregates_user_id_seq")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to restore: the sequence was never used
@@ -0,0 +1,51 @@
+"""Add user_daily_spend rollup
+
+Revision ID: a41c9e07d2b8
+Revises: 354d727c2d2c
+Create Date: 2026-10-17 11:02:17.294810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c9e07d2b8'
+down_revision: Union[str, Sequence[str], None] = '354d727c2d2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_daily_spend',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('spend_date', sa.Date(), nullable=False),
+    sa.Column('total_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('txn_count', sa.BigInteger(), nullable=False),
+    sa.Column('min_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('max_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('user_id', 'spend_date')
+    )
+
+    # Backfill from the existing transactions (same as `python -m app.rollups backfill`)
+    op.execute("""
+        INSERT INTO user_daily_spend (user_id, spend_date, total_amount, txn_count, min_amount, max_amount)
+        SELECT
+            user_id,
+            DATE(timestamp),
+            COALESCE(SUM(transaction_amount), 0),
+            COUNT(transaction_amount),
+            MIN(transaction_amount),
+            MAX(transaction_amount)
+        FROM transactions
+        WHERE user_id IS NOT NULL AND timestamp IS NOT NULL
+        GROUP BY user_id, DATE(timestamp)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_daily_spend')
@@ -0,0 +1,45 @@
+"""Add inbox_files
+
+Revision ID: b8d41e2a6c93
+Revises: f19c3a7d5e60
+Create Date: 2026-10-17 18:05:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d41e2a6c93'
+down_revision: Union[str, Sequence[str], None] = 'f19c3a7d5e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('inbox_files',
+    sa.Column('file_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('batch_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('rows_read', sa.BigInteger(), nullable=True),
+    sa.Column('rows_inserted', sa.BigInteger(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('file_id')
+    )
+    op.create_index('idx_inbox_status_created', 'inbox_files', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_inbox_status_created', table_name='inbox_files')
+    op.drop_table('inbox_files')
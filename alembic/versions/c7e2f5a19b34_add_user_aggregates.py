@@ -0,0 +1,59 @@
+"""Add user_aggregates
+
+Revision ID: c7e2f5a19b34
+Revises: a41c9e07d2b8
+Create Date: 2026-10-17 12:40:55.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2f5a19b34'
+down_revision: Union[str, Sequence[str], None] = 'a41c9e07d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_aggregates',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('txn_count', sa.BigInteger(), nullable=False),
+    sa.Column('total_spend', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('sum_squares', sa.NUMERIC(), nullable=False),
+    sa.Column('max_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('min_gap', sa.Interval(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_user_aggregates_total_spend'), 'user_aggregates', ['total_spend'], unique=False)
+
+    # Backfill from the existing transactions (same as `python -m app.rollups backfill`)
+    op.execute("""
+        INSERT INTO user_aggregates (user_id, txn_count, total_spend, sum_squares, max_amount, min_gap)
+        SELECT
+            user_id,
+            COUNT(transaction_amount),
+            COALESCE(SUM(transaction_amount), 0),
+            COALESCE(SUM(transaction_amount * transaction_amount), 0),
+            MAX(transaction_amount),
+            MIN(gap)
+        FROM (
+            SELECT
+                user_id,
+                transaction_amount,
+                timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp) as gap
+            FROM transactions
+            WHERE user_id IS NOT NULL
+        ) t
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_aggregates_total_spend'), table_name='user_aggregates')
+    op.drop_table('user_aggregates')
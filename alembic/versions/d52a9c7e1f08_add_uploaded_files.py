@@ -0,0 +1,39 @@
+"""Add uploaded_files
+
+Revision ID: d52a9c7e1f08
+Revises: b8d41e2a6c93
+Create Date: 2026-10-17 19:41:53.027716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52a9c7e1f08'
+down_revision: Union[str, Sequence[str], None] = 'b8d41e2a6c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('uploaded_files',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('sample_sha256', sa.String(length=64), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('file_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('idx_uploaded_size_sample', 'uploaded_files', ['size_bytes', 'sample_sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_uploaded_size_sample', table_name='uploaded_files')
+    op.drop_table('uploaded_files')
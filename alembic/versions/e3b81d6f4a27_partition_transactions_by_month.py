@@ -0,0 +1,97 @@
+"""Partition transactions by month
+
+Revision ID: e3b81d6f4a27
+Revises: c7e2f5a19b34
+Create Date: 2026-10-17 14:05:12.640317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b81d6f4a27'
+down_revision: Union[str, Sequence[str], None] = 'c7e2f5a19b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "transaction_id, user_id, product_id, timestamp, transaction_amount"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    # The partition key becomes part of the primary key, so it can't be NULL any more
+    nulls = conn.execute(sa.text("SELECT COUNT(*) FROM transactions WHERE timestamp IS NULL")).scalar()
+    if nulls:
+        raise RuntimeError(f"{nulls} transactions have no timestamp; fix or delete them before partitioning.")
+
+    # Keep the old table aside (and out of the way of the new index names) until its rows are copied
+    op.execute("LOCK TABLE transactions IN EXCLUSIVE MODE")
+    op.rename_table('transactions', 'transactions_unpartitioned')
+    op.drop_index('idx_user_timestamp', table_name='transactions_unpartitioned')
+    op.drop_index('ix_transactions_timestamp', table_name='transactions_unpartitioned')
+    op.drop_index('ix_transactions_user_id', table_name='transactions_unpartitioned')
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey")
+
+    op.create_table('transactions',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('transaction_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('transaction_id', 'timestamp'),
+    postgresql_partition_by='RANGE (timestamp)'
+    )
+    op.create_index('idx_user_timestamp', 'transactions', ['user_id', 'timestamp'], unique=False)
+    op.create_index(op.f('ix_transactions_timestamp'), 'transactions', ['timestamp'], unique=False)
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    # One partition per month that already has data (app.partitions keeps creating them from here on)
+    months = conn.execute(sa.text(
+        "SELECT DISTINCT date_trunc('month', timestamp)::date FROM transactions_unpartitioned ORDER BY 1"
+    )).scalars().all()
+    for month in months:
+        next_month = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+        op.execute(
+            f"CREATE TABLE transactions_y{month.year:04d}m{month.month:02d} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_unpartitioned")  # nosec B608  # COLUMNS is a constant
+
+    op.create_table('transaction_ids',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.execute("INSERT INTO transaction_ids (transaction_id) SELECT transaction_id FROM transactions_unpartitioned")
+
+    op.drop_table('transactions_unpartitioned')
+    op.execute("ANALYZE transactions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('transactions', 'transactions_partitioned')
+    op.drop_index('idx_user_timestamp', table_name='transactions_partitioned')
+    op.drop_index('ix_transactions_timestamp', table_name='transactions_partitioned')
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+
+    op.create_table('transactions',
+    sa.Column('transaction_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('transaction_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned")  # nosec B608  # COLUMNS is a constant
+    op.create_index('idx_user_timestamp', 'transactions', ['user_id', 'timestamp'], unique=False)
+    op.create_index(op.f('ix_transactions_timestamp'), 'transactions', ['timestamp'], unique=False)
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+
+    # Dropping the parent drops every monthly partition with it
+    op.drop_table('transactions_partitioned')
+    op.drop_table('transaction_ids')
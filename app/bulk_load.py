@@ -0,0 +1,118 @@
+# app/bulk_load.py
+import argparse
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.database import get_cached_engine
+from app.models import Transaction
+
+# Bulk-load mode: drop transactions' secondary indexes, load, then rebuild them and ANALYZE.
+# Postgres can't CREATE INDEX CONCURRENTLY on a partitioned table, so each index is rebuilt as an
+# (invalid) ON ONLY parent index, a concurrent build per partition, and an ATTACH per partition;
+# the parent turns valid once every partition's index is attached.
+
+BULK_LOAD_LOCK_SQL = text("SELECT pg_try_advisory_lock(hashtext('transactions_bulk_load'))")
+BULK_UNLOCK_SQL = text("SELECT pg_advisory_unlock(hashtext('transactions_bulk_load'))")
+
+PARTITIONS_SQL = text("""
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'transactions'::regclass ORDER BY c.relname
+""")
+
+INDEX_STATE_SQL = text("""
+    SELECT ix.indisvalid FROM pg_class c JOIN pg_index ix ON ix.indexrelid = c.oid
+    WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace
+""")
+
+# The partition's index already attached to the parent index, if any (e.g. built by ATTACH PARTITION)
+ATTACHED_CHILD_SQL = text("""
+    SELECT child.relname FROM pg_inherits i
+    JOIN pg_class child ON child.oid = i.inhrelid
+    JOIN pg_index ix ON ix.indexrelid = child.oid
+    WHERE i.inhparent = to_regclass(:parent) AND ix.indrelid = to_regclass(:partition)
+""")
+
+def secondary_indexes():
+    """transactions' indexes besides the primary key, as declared in models.py."""
+    return sorted(Transaction.__table__.indexes, key=lambda index: index.name)
+
+def index_columns(index):
+    return ", ".join(column.name for column in index.columns)
+
+def index_state(connection, name: str):
+    """True if valid, False if invalid (an interrupted build), None if missing."""
+    return connection.execute(INDEX_STATE_SQL, {"name": name}).scalar()
+
+def drop_secondary_indexes(connection):
+    """Dropping a partitioned index drops every partition's copy along with it."""
+    for index in secondary_indexes():
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+def build_secondary_indexes(connection):
+    """
+    (Re)creates any missing secondary index without blocking writes, and finishes interrupted builds.
+    Needs an AUTOCOMMIT connection. Returns {index name: seconds}.
+    """
+    timings = {}
+    partitions = connection.execute(PARTITIONS_SQL).scalars().all()
+    for index in secondary_indexes():
+        if index_state(connection, index.name):
+            continue
+        start = time.perf_counter()
+        columns = index_columns(index)
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON ONLY transactions ({columns})"))
+        for partition in partitions:
+            if connection.execute(ATTACHED_CHILD_SQL, {"parent": index.name, "partition": partition}).first():
+                continue
+            child = f"{partition}_{index.name}"
+            if index_state(connection, child) is False:
+                connection.execute(text(f"DROP INDEX {child}")) # Leftover of a failed concurrent build
+            connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} ({columns})"))
+            connection.execute(text(f"ALTER INDEX {index.name} ATTACH PARTITION {child}"))
+        timings[index.name] = time.perf_counter() - start
+    return timings
+
+@contextmanager
+def deferred_indexes(database_url: str):
+    """
+    Bulk-load mode around the block that loads the rows. Yields a dict that ends up with each phase's duration
+    in seconds (drop_indexes, load, build:<index>, analyze). The indexes are rebuilt even if the load fails,
+    so transactions is never left without them; if the rebuild itself is interrupted, rerun
+    `python -m app.bulk_load rebuild-indexes`. Only one bulk load runs at a time.
+    """
+    engine = get_cached_engine(database_url)
+    timings = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if not connection.execute(BULK_LOAD_LOCK_SQL).scalar():
+            raise RuntimeError("Another bulk load is already running.")
+        try:
+            start = time.perf_counter()
+            drop_secondary_indexes(connection)
+            timings["drop_indexes"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            try:
+                yield timings
+            finally:
+                timings["load"] = time.perf_counter() - start
+                timings |= {f"build:{name}": seconds for name, seconds in build_secondary_indexes(connection).items()}
+
+                start = time.perf_counter()
+                connection.execute(text("ANALYZE transactions"))
+                timings["analyze"] = time.perf_counter() - start
+                print("Bulk load phases: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+        finally:
+            connection.execute(BULK_UNLOCK_SQL)
+
+if __name__ == "__main__":
+    # python -m app.bulk_load rebuild-indexes   (after a bulk load was killed before it could rebuild them)
+    parser = argparse.ArgumentParser(description="Maintain transactions' secondary indexes around bulk loads.")
+    parser.add_argument("command", choices=["rebuild-indexes"])
+    args = parser.parse_args()
+
+    engine = create_engine(settings.get_database_url(), isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        built = build_secondary_indexes(connection)
+    print(f"Rebuilt indexes: {', '.join(built) or 'none'}.")
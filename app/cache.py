@@ -0,0 +1,125 @@
+# app/cache.py
+import json
+import threading
+from typing import Optional
+from cachetools import TTLCache
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from .config import settings
+
+# Cached values are stored JSON-compatible (through jsonable_encoder), so every backend can hold them
+MISSING = object()
+
+class MemoryCache:
+    """Per-process LRU cache with a TTL. The async methods never block, so they're safe on the event loop."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self._entries = TTLCache(maxsize=max_entries or settings.CACHE_MAX_ENTRIES, ttl=ttl_seconds or settings.CACHE_TTL_SECONDS)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    async def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "max_entries": int(self._entries.maxsize)}
+
+
+class RedisCache:
+    """Shared cache across API processes. Redis evicts by TTL (and its own maxmemory policy); hit counts are per process."""
+
+    def __init__(self, client, ttl_seconds: Optional[int] = None, prefix: str = "txn-api:"):
+        self._client = client
+        self._ttl = ttl_seconds or settings.CACHE_TTL_SECONDS
+        self._prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise ValueError("CACHE_BACKEND=redis needs the optional 'redis' package.")
+        return cls(redis.asyncio.Redis.from_url(url), **kwargs)
+
+    async def get(self, key: str):
+        raw = await self._client.get(self._prefix + key)
+        if raw is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value):
+        await self._client.set(self._prefix + key, json.dumps(value), ex=self._ttl)
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+class NoCache:
+    """Caching switched off (CACHE_BACKEND=none), e.g. to benchmark the database path."""
+    def __init__(self):
+        self.misses = 0
+
+    async def get(self, key: str):
+        self.misses += 1
+        return MISSING
+
+    async def set(self, key: str, value):
+        pass
+
+    def stats(self):
+        return {"backend": "none", "hits": 0, "misses": self.misses}
+
+
+def make_cache(backend: Optional[str] = None):
+    backend = backend or settings.CACHE_BACKEND
+    if backend == "none":
+        return NoCache()
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("CACHE_BACKEND=redis needs REDIS_URL.")
+        return RedisCache.from_url(settings.REDIS_URL)
+    raise ValueError(f"Unknown cache backend '{backend}'. Choose one of: none, memory, redis.")
+
+async def read_data_versions(db, *scopes: str):
+    """Current version of each scope ("global", "user:<id>"), 0 if nothing was ever ingested for it."""
+    rows = (await db.execute(
+        text("SELECT scope, version FROM data_versions WHERE scope = ANY(:scopes)"), {"scopes": list(scopes)}
+    )).fetchall()
+    versions = dict.fromkeys(scopes, 0) | {row.scope: row.version for row in rows}
+    return "-".join(str(versions[scope]) for scope in scopes)
+
+def cache_key(endpoint: str, version: str, **params):
+    return f"{endpoint}|v{version}|" + "&".join(f"{name}={params[name]}" for name in sorted(params))
+
+async def get_or_compute(cache, key: str, compute, encoder=jsonable_encoder):
+    """
+    Returns the cached value for key, or awaits compute(), stores and returns it (JSON-encoded).
+    Pass encoder=None when compute() already returns JSON-native values. Exceptions (e.g. 404s) aren't cached.
+    """
+    value = await cache.get(key)
+    if value is MISSING:
+        value = await compute()
+        if encoder:
+            value = encoder(value)
+        await cache.set(key, value)
+    return value
@@ -10,6 +10,46 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = "5432"
 
     DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 20 # Async API engine; requests beyond pool_size + max_overflow wait for a connection
+    DB_MAX_OVERFLOW: int = 10
+
+    # Uploads
+    MAX_UPLOAD_BYTES: int = 2 * 1024 ** 3 # 2 GiB
+    UPLOAD_CHUNK_SIZE: int = 1024 ** 2 # Bytes read/written per step while streaming an upload to disk
+    UPLOAD_SAMPLE_BYTES: int = 1024 ** 2 # The start of an upload that goes into its sampled hash
+    # Uploads at least this big are matched by size + sampled hash alone, as soon as their first sample has arrived.
+    # Off by default: two different files with the same size and head would be taken for duplicates.
+    UPLOAD_SAMPLED_DEDUPE_MIN_BYTES: Optional[int] = None
+    # A "pending" upload older than this lost its ingestion (e.g. a killed worker): a re-upload of it is accepted again
+    UPLOAD_STALE_SECONDS: int = 6 * 3600
+
+    # Ingestion
+    INGEST_WORKERS: int = 1 # >1 splits CSVs into byte ranges parsed/loaded by a process pool
+    WORKER_CONCURRENCY: int = 4 # Flow runs worker.py executes at once
+    INGEST_MAX_WRITERS: int = 2 # Loads writing to the database at once, across every flow run, range worker and consumer
+    UPLOAD_MAX_BACKLOG: int = 100 # /upload answers 429 once this many files are waiting to be ingested
+    UPLOAD_RETRY_AFTER_SECONDS: int = 60 # The 429's Retry-After in deployment mode; inbox mode uses INBOX_MAX_WAIT_SECONDS
+    PARTITION_MONTHS_AHEAD: int = 3 # Monthly transactions partitions the nightly flow keeps pre-created
+
+    # Inbox: "deployment" starts one ingestion flow run per upload, "inbox" queues uploads for the batching consumer
+    INGEST_MODE: str = "deployment"
+    INBOX_MAX_BATCH_BYTES: int = 64 * 1024 ** 2 # A batch is due once this much is pending...
+    INBOX_MAX_WAIT_SECONDS: int = 30 # ...or once the oldest pending file has waited this long
+    INBOX_POLL_SECONDS: float = 5
+    INBOX_STALE_SECONDS: int = 900 # "processing" files older than this (a consumer died) go back to pending
+
+    # Batch and export endpoints
+    BATCH_MAX_USERS: int = 10_000 # Users per /batch request
+    EXPORT_BATCH_ROWS: int = 5_000 # Rows fetched from the server-side cursor per streamed chunk
+
+    GZIP_MIN_BYTES: int = 4096 # Responses smaller than this aren't worth compressing
+    WORKER_METRICS_PORT: int = 9100 # worker.py serves its Prometheus metrics here (the API's are at /metrics)
+
+    # Response cache
+    CACHE_BACKEND: str = "memory" # "memory" (per process), "redis" (shared, needs REDIS_URL) or "none"
+    CACHE_MAX_ENTRIES: int = 10_000 # memory backend only, least recently used entries go first
+    CACHE_TTL_SECONDS: int = 3600 # Upper bound only; entries are invalidated by data version as soon as data changes
+    REDIS_URL: Optional[str] = None
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,16 +1,38 @@
 # app/database.py
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app.metrics import instrument_engine
 
 DATABASE_URL = settings.get_database_url()
 
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://")
 
-engine = create_engine(DATABASE_URL)
+engine = instrument_engine(create_engine(DATABASE_URL), "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str):
+    """Same database through asyncpg, for the API's read endpoints."""
+    return url.replace("postgresql+psycopg2://", "postgresql://").replace("postgresql://", "postgresql+asyncpg://", 1)
+
+async_engine = create_async_engine(to_async_url(DATABASE_URL), pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+# Ingestion tasks share one engine (and connection pool) per URL for the life of the process
+_cached_engines = {}
+_cached_engines_lock = threading.Lock()
+
+def get_cached_engine(database_url: str):
+    with _cached_engines_lock:
+        if database_url not in _cached_engines:
+            _cached_engines[database_url] = instrument_engine(create_engine(database_url, pool_pre_ping=True), "ingest")
+        return _cached_engines[database_url]
+
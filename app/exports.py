@@ -0,0 +1,108 @@
+# app/exports.py
+from datetime import date, datetime, timedelta
+from typing import Optional
+import uuid
+import orjson
+import pyarrow as pa
+from sqlalchemy import text
+
+from .config import settings
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "arrow": "application/vnd.apache.arrow.stream"}
+ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00" # End-of-stream marker of the Arrow IPC streaming format
+
+TRANSACTION_SCHEMA = pa.schema([
+    ("transaction_id", pa.string()),
+    ("user_id", pa.int32()),
+    ("product_id", pa.int32()),
+    ("timestamp", pa.timestamp("us")),
+    ("transaction_amount", pa.decimal128(10, 2)),
+])
+
+SPEND_TREND_SCHEMA = pa.schema([
+    ("spend_date", pa.date32()),
+    ("daily_total", pa.float64()),
+    ("rolling_7d_avg", pa.float64()),
+])
+
+def transactions_export_query(user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                              after_timestamp: Optional[datetime] = None, after_transaction_id: Optional[uuid.UUID] = None,
+                              limit: Optional[int] = None):
+    """
+    One user's transactions in (timestamp, transaction_id) order, walking idx_user_timestamp.
+    Keyset pagination: pass the last row's timestamp (and transaction_id) to get the rows after it.
+    Dates are turned into a half-open timestamp range so Postgres can prune monthly partitions.
+    """
+    conditions = ["user_id = :user_id"]
+    params = {"user_id": user_id, "limit": limit}
+    if start_date:
+        conditions.append("timestamp >= :lower")
+        params["lower"] = datetime.combine(start_date, datetime.min.time())
+    if end_date:
+        conditions.append("timestamp < :upper")
+        params["upper"] = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    if after_timestamp and after_transaction_id:
+        conditions.append("(timestamp, transaction_id) > (:after_timestamp, :after_transaction_id)")
+        params |= {"after_timestamp": after_timestamp, "after_transaction_id": after_transaction_id}
+    elif after_timestamp:
+        conditions.append("timestamp > :after_timestamp")
+        params["after_timestamp"] = after_timestamp
+
+    query = text(f"""
+        SELECT transaction_id, user_id, product_id, timestamp, amount_cents * 0.01 AS transaction_amount
+        FROM transactions
+        WHERE {" AND ".join(conditions)}
+        ORDER BY timestamp, transaction_id
+        LIMIT :limit
+    """)  # nosec B608  # Only the fixed condition strings above are interpolated, values are bound parameters
+    return query, params
+
+def transaction_dict(row):
+    return {
+        "transaction_id": str(row.transaction_id),
+        "user_id": row.user_id,
+        "product_id": row.product_id,
+        "timestamp": row.timestamp.isoformat(),
+        "transaction_amount": float(row.transaction_amount) if row.transaction_amount is not None else None,
+    }
+
+def spend_trend_dict(row):
+    return {
+        "spend_date": row.spend_date.isoformat(),
+        "daily_total": float(row.daily_total),
+        "rolling_7d_avg": float(row.rolling_7d_avg),
+    }
+
+def encode_json_line(obj):
+    return orjson.dumps(obj) + b"\n"
+
+def encode_ndjson(rows, to_dict):
+    return b"".join(encode_json_line(to_dict(row)) for row in rows)
+
+def encode_arrow(rows, schema: pa.Schema):
+    columns = {}
+    for field in schema:
+        values = [row._mapping[field.name] for row in rows]
+        # Arrow won't coerce UUIDs to strings or NUMERIC (Decimal) to doubles by itself
+        if pa.types.is_string(field.type):
+            values = [str(value) if value is not None else None for value in values]
+        elif pa.types.is_floating(field.type):
+            values = [float(value) if value is not None else None for value in values]
+        columns[field.name] = values
+    return pa.RecordBatch.from_pydict(columns, schema=schema).serialize().to_pybytes()
+
+async def stream_export(sessionmaker, query, params: dict, export_format: str, schema: pa.Schema, to_dict,
+                        batch_rows: Optional[int] = None):
+    """
+    Streams a query's rows as NDJSON lines or an Arrow IPC stream (one record batch per fetch).
+    A server-side cursor hands rows over batch_rows at a time, so memory stays flat whatever the row count.
+    """
+    batch_rows = batch_rows or settings.EXPORT_BATCH_ROWS
+    async with sessionmaker() as db:
+        result = await db.stream(query, params, execution_options={"yield_per": batch_rows})
+        if export_format == "arrow":
+            yield schema.serialize().to_pybytes()
+        async for rows in result.partitions(batch_rows):
+            yield encode_arrow(rows, schema) if export_format == "arrow" else encode_ndjson(rows, to_dict)
+        if export_format == "arrow":
+            yield ARROW_EOS
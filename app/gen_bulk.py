@@ -1,43 +1,79 @@
 # app/gen_bulk.py
 import csv
+import gzip
 import random
 import uuid
 from pathlib import Path
 from faker import Faker
+import pyarrow as pa
+import pyarrow.parquet as pq
 from prefect import task, flow
+from app.ids import uuid7
 from app.processing import run_csv_pipeline 
 from app.config import settings
 
+PARQUET_ROW_GROUP_SIZE = 100_000
+PARQUET_SCHEMA = pa.schema([
+    ("transaction_id", pa.string()),
+    ("user_id", pa.int32()),
+    ("product_id", pa.int32()),
+    ("timestamp", pa.timestamp("us")),
+    ("transaction_amount", pa.float64()),
+])
+
+def fake_transaction(fake: Faker):
+    return {
+        "transaction_id": str(uuid7()), # Time-ordered, so PK inserts stay append-mostly
+        "user_id": fake.random_int(min=1, max=1000),
+        "product_id": fake.random_int(min=1, max=500),
+        "timestamp": fake.date_time_between(start_date="-1y", end_date="now"),
+        "transaction_amount": round(random.uniform(5.0, 500.0), 2),  # nosec B311
+    }
+
+def write_parquet(file_path: Path, rows: int, fake: Faker):
+    with pq.ParquetWriter(file_path, PARQUET_SCHEMA) as writer:
+        for start in range(0, rows, PARQUET_ROW_GROUP_SIZE):
+            batch = [fake_transaction(fake) for _ in range(min(PARQUET_ROW_GROUP_SIZE, rows - start))]
+            writer.write_table(pa.Table.from_pylist(batch, schema=PARQUET_SCHEMA))
+
 @task
-def generate_bulk_csv(rows: int):
-    filename_str = f"bulk_batch_{uuid.uuid4()}.csv"
+def generate_bulk_csv(rows: int, compress: bool = False, file_format: str = "csv"):
+    """Writes `rows` fake transactions as CSV (gzipped if `compress`) or, with file_format="parquet", as Parquet."""
+    if file_format not in ("csv", "parquet"):
+        raise ValueError("file_format must be 'csv' or 'parquet'.")
+    extension = ".parquet" if file_format == "parquet" else ".csv" + (".gz" if compress else "")
+    filename_str = f"bulk_batch_{uuid.uuid4()}{extension}"
     # Save directly to the EC2 shared volume
     file_path = Path("/shared_data") / filename_str 
     
     fake = Faker()
     print(f"Generating {rows} rows into {file_path}...")
 
-    with open(file_path, mode="w", newline="") as file:
+    if file_format == "parquet":
+        write_parquet(file_path, rows, fake)
+        return str(file_path)
+
+    opener = gzip.open if compress else open
+    with opener(file_path, mode="wt", newline="") as file:
         headers = ["transaction_id", "user_id", "product_id", "timestamp", "transaction_amount"]
         writer = csv.DictWriter(file, fieldnames=headers)
         writer.writeheader()
         
         for _ in range(rows):
-            writer.writerow({
-                "transaction_id": fake.uuid4(),
-                "user_id": fake.random_int(min=1, max=1000),
-                "product_id": fake.random_int(min=1, max=500),
-                "timestamp": fake.date_time_between(start_date="-1y", end_date="now"),
-                "transaction_amount": round(random.uniform(5.0, 500.0), 2),  # nosec B311
-            })
+            writer.writerow(fake_transaction(fake))
 
     return str(file_path)
 
 @flow(name="Bulk Data Generator Pipeline")
-def run_bulk_generation(num_rows: int = 10000):
+def run_bulk_generation(num_rows: int = 10000, loader: str = "insert", compress: bool = False, file_format: str = "csv",
+                        bulk: bool = False):
     """
     Generates a specified number of dummy transactions and ingests them into the database.
+    `loader` picks the ingestion engine ("insert" or "copy") so the two can be benchmarked.
+    `compress` writes the file gzipped to save space on the shared volume.
+    `file_format` ("csv" or "parquet") to benchmark the two formats end to end.
+    `bulk` loads with the secondary indexes dropped and rebuilds them, then the rollups, afterwards.
     """
-    file_path = generate_bulk_csv(rows=num_rows)
-    run_csv_pipeline(file_path=file_path, database_url=settings.get_database_url())
+    file_path = generate_bulk_csv(rows=num_rows, compress=compress, file_format=file_format)
+    run_csv_pipeline(file_path=file_path, database_url=settings.get_database_url(), loader=loader, bulk=bulk)
 
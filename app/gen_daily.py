@@ -6,8 +6,12 @@ from pathlib import Path
 from faker import Faker
 from datetime import datetime, timedelta
 from prefect import task, flow
+from app.ids import uuid7
 from app.processing import run_csv_pipeline 
+from app.partitions import ensure_future_partitions
+from app.inbox import enqueue_file
 from app.config import settings
+from app.database import get_cached_engine
 
 @task
 def generate_daily_batch(rows: int = 150):
@@ -29,7 +33,7 @@ def generate_daily_batch(rows: int = 150):
             
         for _ in range(rows):
             writer.writerow({
-                "transaction_id": fake.uuid4(),
+                "transaction_id": str(uuid7()),
                 "user_id": fake.random_int(min=1, max=1000),
                 "product_id": fake.random_int(min=1, max=500),
                 "timestamp": fake.date_time_between(start_date=yesterday_start, end_date=yesterday_end),
@@ -38,10 +42,30 @@ def generate_daily_batch(rows: int = 150):
 
     return str(file_path)
 
+@task
+def create_upcoming_partitions(database_url: str):
+    engine = get_cached_engine(database_url)
+    with engine.begin() as connection:
+        created = ensure_future_partitions(connection, datetime.now().date())
+    print(f"Created partitions: {', '.join(created) or 'none'}.")
+    return created
+
+@task
+def queue_daily_batch(file_path: str, database_url: str):
+    # The inbox consumer loads it together with whatever else is pending
+    engine = get_cached_engine(database_url)
+    with engine.begin() as connection:
+        return str(enqueue_file(connection, file_path))
+
 @flow(name="Nightly Data Generator")
 def run_nightly_generation():
+    # Pre-create next months' partitions so new rows never pile up in transactions_default
+    create_upcoming_partitions(settings.get_database_url())
     daily_file_path = generate_daily_batch()
-    run_csv_pipeline(file_path=daily_file_path, database_url=settings.get_database_url())
+    if settings.INGEST_MODE == "inbox":
+        queue_daily_batch(daily_file_path, settings.get_database_url())
+    else:
+        run_csv_pipeline(file_path=daily_file_path, database_url=settings.get_database_url())
 
 if __name__ == "__main__":
     # "1 0 * * *" means 12:01 AM every day
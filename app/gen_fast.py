@@ -0,0 +1,149 @@
+# app/gen_fast.py
+import argparse
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+import pandas as pd
+from prefect import task, flow
+
+from app.config import settings
+from app.database import get_cached_engine
+from app.ids import uuid7_strings
+from app.partitions import ensure_partitions_for_timestamps
+from app.processing import (COLUMNS, LOADERS, STAGING_TABLE_SQL, copy_chunk_to_db, insert_chunk_to_db,
+                            writer_slot)
+from app.rollups import apply_inserted_rows
+
+# Whole batches of transactions from NumPy arrays, instead of one Faker call per field per row.
+# The same seed (and options) always produces the same rows, batch after batch.
+BATCH_ROWS = 100_000
+USER_DISTRIBUTIONS = ("uniform", "zipf") # zipf: user 1 is the biggest whale, then user 2, ...
+AMOUNT_DISTRIBUTIONS = ("uniform", "lognormal")
+MAX_AMOUNT = 99_999_999.99 # The rollups keep min/max amounts as NUMERIC(10, 2)
+SEEDED_END = datetime(2025, 1, 1) # A seeded run's default window ends here rather than now, so it doesn't move
+
+def zipf_weights(num_users: int, exponent: float):
+    """Bounded Zipf: P(user k) proportional to 1 / k**exponent for k in 1..num_users."""
+    weights = 1.0 / np.arange(1, num_users + 1) ** exponent
+    return weights / weights.sum()
+
+def generate_batch(rng: np.random.Generator, rows: int, start: datetime, end: datetime, num_users: int = 1000,
+                   num_products: int = 500, user_distribution: str = "uniform", zipf_exponent: float = 1.1,
+                   amount_distribution: str = "uniform", min_amount: float = 5.0, max_amount: float = 500.0,
+                   id_ms: Optional[int] = None):
+    """
+    One DataFrame of `rows` fake transactions, timestamps uniform in [start, end).
+    lognormal amounts have their median at min_amount * 4 and a long tail, capped at max_amount.
+    Ids are increasing UUIDv7s stamped with id_ms (default: end), so the same seed still gives the same rows.
+    """
+    if user_distribution not in USER_DISTRIBUTIONS:
+        raise ValueError(f"Unknown user distribution '{user_distribution}'. Choose one of: {', '.join(USER_DISTRIBUTIONS)}.")
+    if amount_distribution not in AMOUNT_DISTRIBUTIONS:
+        raise ValueError(f"Unknown amount distribution '{amount_distribution}'. Choose one of: {', '.join(AMOUNT_DISTRIBUTIONS)}.")
+    if end <= start:
+        raise ValueError("end must be after start.")
+
+    if user_distribution == "zipf":
+        user_ids = rng.choice(num_users, size=rows, p=zipf_weights(num_users, zipf_exponent)) + 1
+    else:
+        user_ids = rng.integers(1, num_users + 1, size=rows)
+
+    span_us = int((end - start) / timedelta(microseconds=1))
+    timestamps = np.datetime64(start, "us") + rng.integers(0, span_us, size=rows).astype("timedelta64[us]")
+
+    if amount_distribution == "lognormal":
+        amounts = np.clip(rng.lognormal(np.log(min_amount * 4), 1.0, size=rows), min_amount, min(max_amount, MAX_AMOUNT))
+    else:
+        amounts = rng.uniform(min_amount, max_amount, size=rows)
+
+    return pd.DataFrame({
+        "transaction_id": uuid7_strings(rng, rows, id_ms if id_ms is not None else int(end.timestamp() * 1000)),
+        "user_id": user_ids.astype(np.int32),
+        "product_id": rng.integers(1, num_products + 1, size=rows, dtype=np.int32),
+        "timestamp": timestamps,
+        "transaction_amount": np.round(amounts, 2),
+    }, columns=COLUMNS)
+
+def iter_batches(rows: int, seed: Optional[int] = None, batch_rows: Optional[int] = None, **options):
+    """
+    Yields DataFrames of at most batch_rows until `rows` rows have been generated.
+    The window defaults to the year before now, or before SEEDED_END when a seed is given.
+    """
+    rng = np.random.default_rng(seed)
+    batch_rows = batch_rows or BATCH_ROWS
+    end = options.pop("end", None) or (SEEDED_END if seed is not None else datetime.now().replace(microsecond=0))
+    start = options.pop("start", None) or end - timedelta(days=365)
+    id_ms = int(end.timestamp() * 1000)
+    for batch_index, offset in enumerate(range(0, rows, batch_rows)):
+        # One millisecond per batch keeps ids increasing from batch to batch
+        yield generate_batch(rng, min(batch_rows, rows - offset), start, end, id_ms=id_ms + batch_index, **options)
+
+def load_generated(connection, rows: int, loader: str = "copy", seed: Optional[int] = None,
+                   batch_rows: Optional[int] = None, **options):
+    """
+    Streams generated batches straight into transactions through the ingestion loaders, rollups included.
+    Each batch commits on its own. Returns (rows generated, rows inserted).
+    """
+    if loader not in LOADERS:
+        raise ValueError(f"Unknown loader '{loader}'. Choose one of: {', '.join(LOADERS)}.")
+    if loader == "copy":
+        with connection.begin():
+            connection.execute(STAGING_TABLE_SQL)
+
+    total_rows = inserted_rows = 0
+    for batch_df in iter_batches(rows, seed, batch_rows, **options):
+        with connection.begin():
+            ensure_partitions_for_timestamps(connection, batch_df["timestamp"])
+        with connection.begin():
+            inserted = copy_chunk_to_db(batch_df, connection) if loader == "copy" else insert_chunk_to_db(batch_df, connection)
+            apply_inserted_rows(connection, inserted)
+        total_rows += len(batch_df)
+        inserted_rows += len(inserted)
+    return total_rows, inserted_rows
+
+def write_generated_csv(file_path: str, rows: int, seed: Optional[int] = None, batch_rows: Optional[int] = None, **options):
+    """Same rows as load_generated, as a CSV for the upload endpoint or run_csv_pipeline."""
+    for index, batch_df in enumerate(iter_batches(rows, seed, batch_rows, **options)):
+        batch_df.to_csv(file_path, mode="w" if index == 0 else "a", header=index == 0, index=False)
+    return file_path
+
+@task
+def stream_generated_rows(database_url: str, rows: int, loader: str = "copy", seed: Optional[int] = None, **options):
+    engine = get_cached_engine(database_url)
+    with engine.connect() as connection, writer_slot(connection):
+        total_rows, inserted_rows = load_generated(connection, rows, loader, seed, **options)
+    print(f"Generated {total_rows} rows via '{loader}': {inserted_rows} inserted.")
+    return inserted_rows
+
+@flow(name="Fast Data Generator Pipeline")
+def run_fast_generation(num_rows: int = 1_000_000, loader: str = "copy", seed: Optional[int] = None,
+                        user_distribution: str = "zipf", amount_distribution: str = "uniform",
+                        start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Vectorized counterpart of run_bulk_generation that skips the intermediate file."""
+    return stream_generated_rows(settings.get_database_url(), num_rows, loader, seed,
+                                 user_distribution=user_distribution, amount_distribution=amount_distribution,
+                                 start=start, end=end)
+
+if __name__ == "__main__":
+    # python -m app.gen_fast --rows 10000000 --seed 42 --users zipf
+    parser = argparse.ArgumentParser(description="Generate fake transactions and stream them into the database.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--loader", choices=LOADERS, default="copy")
+    parser.add_argument("--users", choices=USER_DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--num-users", type=int, default=1000)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--amounts", choices=AMOUNT_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Earliest timestamp (default: a year before --end)")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help=f"Timestamps are before this (default: now, or {SEEDED_END.date()} with --seed)")
+    parser.add_argument("--csv", help="Write the rows to this CSV instead of the database")
+    args = parser.parse_args()
+
+    options = {"user_distribution": args.users, "num_users": args.num_users, "zipf_exponent": args.zipf_exponent,
+               "amount_distribution": args.amounts, "start": args.start, "end": args.end}
+    if args.csv:
+        write_generated_csv(args.csv, args.rows, args.seed, **options)
+        print(f"Wrote {args.rows} rows to {args.csv}.")
+    else:
+        stream_generated_rows.fn(settings.get_database_url(), args.rows, args.loader, args.seed, **options)
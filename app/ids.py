@@ -0,0 +1,57 @@
+# app/ids.py
+import os
+import threading
+import time
+import uuid
+import numpy as np
+
+# Time-ordered UUIDs (RFC 9562 version 7): a millisecond Unix timestamp, then a counter, then random bits.
+# New ids sort after older ones, so inserts land at the right edge of the primary key and transaction_ids
+# indexes instead of on random pages all over them.
+
+_clock_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7():
+    """A version 7 UUID. Ids made by one process keep increasing, even within the same millisecond."""
+    global _last_ms, _counter
+    with _clock_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _counter = 0
+        else:
+            ms = _last_ms
+            _counter += 1
+            if _counter > 0xFFF: # 12-bit counter exhausted: borrow the next millisecond
+                ms, _counter = ms + 1, 0
+        _last_ms = ms
+        counter = _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+UUID_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+def uuid_strings(raw):
+    """Canonical strings for an (n, 16) uint8 array of UUID bytes."""
+    nibbles = np.stack([raw >> 4, raw & 0x0F], axis=2).reshape(len(raw), 32)
+    chars = np.full((len(raw), 36), ord("-"), dtype=np.uint8)
+    chars[:, UUID_HEX_POSITIONS] = HEX_DIGITS[nibbles]
+    return chars.view("S36").ravel().astype(str)
+
+def uuid7_strings(rng: np.random.Generator, rows: int, unix_ms: int):
+    """
+    `rows` version 7 UUID strings for one millisecond, in increasing order: a 42-bit row counter
+    follows the timestamp and the last 32 bits come from rng.
+    """
+    raw = np.frombuffer(rng.bytes(16 * rows), dtype=np.uint8).reshape(rows, 16).copy()
+    raw[:, :6] = np.frombuffer(int(unix_ms).to_bytes(6, "big"), dtype=np.uint8)
+    counter = np.arange(rows, dtype=np.uint64)
+    raw[:, 6] = 0x70 | ((counter >> 38) & 0x0F)
+    raw[:, 7] = (counter >> 30) & 0xFF
+    raw[:, 8] = 0x80 | ((counter >> 24) & 0x3F) # RFC 4122 variant
+    raw[:, 9] = (counter >> 16) & 0xFF
+    raw[:, 10] = (counter >> 8) & 0xFF
+    raw[:, 11] = counter & 0xFF
+    return uuid_strings(raw)
@@ -0,0 +1,237 @@
+# app/inbox.py
+import argparse
+import os
+import time
+import uuid
+from typing import Optional
+import pandas as pd
+from prefect import flow
+from sqlalchemy import create_engine, insert, text
+
+from app.config import settings
+from app.database import get_cached_engine
+from app.models import InboxFile
+from app.partitions import ensure_partitions_for_timestamps
+from app.processing import (COLUMNS, LOADERS, STAGING_TABLE_SQL, copy_chunk_to_db, insert_chunk_to_db, is_columnar, writer_slot,
+                            iter_columnar_chunks, iter_csv_chunks, load_byte_range, prepare_chunk, read_columnar_columns,
+                            read_csv_header)
+from app.rollups import apply_inserted_rows
+from app.uploads import SET_UPLOAD_STATUS_SQL
+
+# Many small uploads, one ingestion: uploads land in the inbox directory with a pending inbox_files row,
+# and the consumer loads every due file in a single transaction instead of one flow run per file.
+
+def inbox_dir():
+    return os.path.join(os.getenv("UPLOAD_DIR", "/shared_data"), "inbox")
+
+def register_file_stmt(file_path: str, filename: str, size_bytes: int, sha256: Optional[str] = None,
+                       file_id: Optional[uuid.UUID] = None):
+    """INSERT for a new pending inbox file; works on sync connections and async sessions alike."""
+    return insert(InboxFile.__table__).values(
+        file_id=file_id or uuid.uuid4(), file_path=file_path, filename=filename,
+        size_bytes=size_bytes, sha256=sha256, status="pending",
+    )
+
+def enqueue_file(connection, file_path: str, filename: Optional[str] = None):
+    """Moves an existing file into the inbox and queues it. Returns its file_id."""
+    os.makedirs(inbox_dir(), exist_ok=True)
+    file_id = uuid.uuid4()
+    filename = filename or os.path.basename(file_path)
+    inbox_path = os.path.join(inbox_dir(), f"{file_id}_{filename}")
+    os.replace(file_path, inbox_path)
+    connection.execute(register_file_stmt(inbox_path, filename, os.path.getsize(inbox_path), file_id=file_id))
+    return file_id
+
+REQUEUE_STALE_SQL = text("""
+    UPDATE inbox_files SET status = 'pending', batch_id = NULL, updated_at = now()
+    WHERE status = 'processing' AND updated_at < now() - make_interval(secs => :stale_seconds)
+""")
+
+PENDING_FILES_SQL = text("""
+    SELECT file_id, file_path, size_bytes, created_at <= now() - make_interval(secs => :max_wait) AS waited_enough
+    FROM inbox_files
+    WHERE status = 'pending'
+    ORDER BY created_at, file_id
+    FOR UPDATE SKIP LOCKED
+""")
+
+MARK_PROCESSING_SQL = text("""
+    UPDATE inbox_files SET status = 'processing', batch_id = :batch_id, updated_at = now()
+    WHERE file_id = ANY(CAST(:file_ids AS uuid[]))
+""")
+
+SET_STATUS_SQL = text("""
+    UPDATE inbox_files
+    SET status = :status, rows_read = :rows_read, rows_inserted = :rows_inserted, error = :error, updated_at = now()
+    WHERE file_id = :file_id
+""")
+
+def claim_due_batch(connection, force: bool = False, max_bytes: Optional[int] = None, max_wait_seconds: Optional[int] = None):
+    """
+    Claims the oldest pending files (up to max_bytes, at least one) if a batch is due: enough bytes are pending,
+    the oldest file has waited max_wait_seconds, or force. SKIP LOCKED lets several consumers run side by side.
+    Returns the claimed files, oldest first, or [] if nothing is due.
+    """
+    max_bytes = max_bytes or settings.INBOX_MAX_BATCH_BYTES
+    max_wait_seconds = settings.INBOX_MAX_WAIT_SECONDS if max_wait_seconds is None else max_wait_seconds
+    with connection.begin():
+        connection.execute(REQUEUE_STALE_SQL, {"stale_seconds": settings.INBOX_STALE_SECONDS})
+        pending = connection.execute(PENDING_FILES_SQL, {"max_wait": max_wait_seconds}).fetchall()
+        if not pending:
+            return []
+        if not (force or pending[0].waited_enough or sum(f.size_bytes for f in pending) >= max_bytes):
+            return []
+
+        batch, batch_bytes = [], 0
+        for f in pending:
+            if batch and batch_bytes + f.size_bytes > max_bytes:
+                break
+            batch.append(f)
+            batch_bytes += f.size_bytes
+        connection.execute(MARK_PROCESSING_SQL, {"batch_id": str(uuid.uuid4()), "file_ids": [str(f.file_id) for f in batch]})
+    return batch
+
+def read_inbox_file(file_path: str, loader: str):
+    """The whole file as one prepared DataFrame (batched files are at most INBOX_MAX_BATCH_BYTES, see load_large_file)."""
+    if is_columnar(file_path):
+        read_columnar_columns(file_path)
+        chunks = list(iter_columnar_chunks(file_path))
+    else:
+        columns, data_start = read_csv_header(file_path)
+        chunks = [chunk_df for chunk_df, _ in iter_csv_chunks(file_path, columns, data_start)]
+    if not chunks:
+        return pd.DataFrame(columns=COLUMNS)
+    return prepare_chunk(pd.concat(chunks, ignore_index=True)[COLUMNS], loader)
+
+def inserted_per_file(batch_df, inserted):
+    """Attributes inserted rows back to their files: the first occurrence of an id in batch order is the one loaded."""
+    ids = batch_df["transaction_id"].astype(str).str.lower()
+    inserted_ids = {str(row.transaction_id) for row in inserted}
+    loaded = ~ids.duplicated() & ids.isin(inserted_ids)
+    return loaded.groupby(batch_df["file_index"]).sum()
+
+def load_frames(connection, files, frames, loader: str):
+    """Loads the frames in one transaction and marks their files (and uploads) loaded. Raises (rolling back) on any error."""
+    batch_df = pd.concat([df.assign(file_index=i) for i, df in frames], ignore_index=True)
+    with connection.begin():
+        ensure_partitions_for_timestamps(connection, batch_df["timestamp"])
+    with connection.begin():
+        if loader == "copy":
+            connection.execute(STAGING_TABLE_SQL)
+            inserted = copy_chunk_to_db(batch_df, connection)
+        else:
+            inserted = insert_chunk_to_db(batch_df, connection)
+        apply_inserted_rows(connection, inserted)
+
+        per_file = inserted_per_file(batch_df, inserted)
+        connection.execute(SET_STATUS_SQL, [
+            {"file_id": str(files[i].file_id), "status": "loaded", "rows_read": len(df),
+             "rows_inserted": int(per_file.get(i, 0)), "error": None}
+            for i, df in frames
+        ])
+        connection.execute(SET_UPLOAD_STATUS_SQL, [{"file_id": str(files[i].file_id), "status": "loaded"} for i, _ in frames])
+
+def mark_failed(connection, file_id, error: str):
+    with connection.begin():
+        connection.execute(SET_STATUS_SQL, {"file_id": str(file_id), "status": "failed", "rows_read": None,
+                                            "rows_inserted": None, "error": error})
+        connection.execute(SET_UPLOAD_STATUS_SQL, {"file_id": str(file_id), "status": "failed"})
+
+def load_large_file(connection, f, loader: str):
+    """
+    A file bigger than a whole batch (it's always claimed alone) is loaded chunk by chunk with checkpoints,
+    like a deployment-mode upload, instead of being read into memory at once. A requeued file resumes.
+    """
+    try:
+        if is_columnar(f.file_path):
+            columns, data_start = read_columnar_columns(f.file_path), 0
+        else:
+            columns, data_start = read_csv_header(f.file_path)
+        rows_read, rows_inserted = load_byte_range(connection, f.file_path, columns, data_start, None, loader)
+    except Exception as e:
+        mark_failed(connection, f.file_id, str(e))
+        return 0
+    with connection.begin():
+        connection.execute(SET_STATUS_SQL, {"file_id": str(f.file_id), "status": "loaded", "rows_read": rows_read,
+                                            "rows_inserted": rows_inserted, "error": None})
+        connection.execute(SET_UPLOAD_STATUS_SQL, {"file_id": str(f.file_id), "status": "loaded"})
+    if os.path.exists(f.file_path):
+        os.remove(f.file_path)
+    return 1
+
+def load_batch(connection, files, loader: str = "copy"):
+    """
+    Loads claimed files as one ingestion batch. Files that don't parse are marked failed on their own;
+    if the database rejects the batch (e.g. a malformed UUID), each file is retried alone to isolate the bad one.
+    Loaded files are deleted, failed ones stay on disk. Returns the number of files loaded.
+    """
+    if loader not in LOADERS:
+        raise ValueError(f"Unknown loader '{loader}'. Choose one of: {', '.join(LOADERS)}.")
+    if len(files) == 1 and files[0].size_bytes > settings.INBOX_MAX_BATCH_BYTES:
+        return load_large_file(connection, files[0], loader)
+
+    frames = []
+    for i, f in enumerate(files):
+        try:
+            frames.append((i, read_inbox_file(f.file_path, loader)))
+        except Exception as e:
+            mark_failed(connection, f.file_id, str(e))
+    if not frames:
+        return 0
+
+    try:
+        load_frames(connection, files, frames, loader)
+        loaded = frames
+    except Exception as e:
+        if len(frames) == 1:
+            mark_failed(connection, files[frames[0][0]].file_id, str(e))
+            return 0
+        loaded = []
+        for frame in frames:
+            try:
+                load_frames(connection, files, [frame], loader)
+                loaded.append(frame)
+            except Exception as e:
+                mark_failed(connection, files[frame[0]].file_id, str(e))
+
+    for i, _ in loaded:
+        if os.path.exists(files[i].file_path):
+            os.remove(files[i].file_path)
+    return len(loaded)
+
+def drain_inbox(connection, loader: str = "copy", force: bool = False):
+    """Loads batches until nothing is due. Returns (files claimed, files loaded)."""
+    claimed = loaded = 0
+    while files := claim_due_batch(connection, force=force):
+        claimed += len(files)
+        with writer_slot(connection):
+            loaded += load_batch(connection, files, loader)
+    return claimed, loaded
+
+@flow(name="Inbox Consumer")
+def run_inbox_consumer(database_url: Optional[str] = None, loader: str = "copy", force: bool = False):
+    engine = get_cached_engine(database_url or settings.get_database_url())
+    with engine.connect() as connection:
+        claimed, loaded = drain_inbox(connection, loader, force)
+    if claimed:
+        print(f"Inbox: loaded {loaded} of {claimed} files.")
+    return loaded
+
+if __name__ == "__main__":
+    # python -m app.inbox watch   (a long-running consumer without per-poll flow runs)
+    # python -m app.inbox drain   (load everything pending now, due or not)
+    parser = argparse.ArgumentParser(description="Load queued inbox uploads in batches.")
+    parser.add_argument("command", choices=["watch", "drain"])
+    parser.add_argument("--loader", choices=LOADERS, default="copy")
+    args = parser.parse_args()
+
+    engine = create_engine(settings.get_database_url())
+    with engine.connect() as connection:
+        if args.command == "drain":
+            print("Loaded {1} of {0} files.".format(*drain_inbox(connection, args.loader, force=True)))
+        else:
+            while True:
+                claimed, loaded = drain_inbox(connection, args.loader)
+                if claimed:
+                    print(f"Loaded {loaded} of {claimed} files.")
+                time.sleep(settings.INBOX_POLL_SECONDS)
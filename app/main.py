@@ -15,102 +15,265 @@
 
 # terraform apply -var-file="secrets.tfvars"
 
-from datetime import date
-import shutil
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional, Union
 import uuid
 import os
-import asyncio
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+import importlib.util
+import anyio
+import hashlib
+import string
+import time
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from prefect.deployments import run_deployment
+from prometheus_client import CONTENT_TYPE_LATEST
 from sqlalchemy import text
-import plotly.graph_objects as go
 
-from .database import engine as main_engine, SessionLocal
+from .database import engine as main_engine, AsyncSessionLocal
 from .config import settings
-from .schemas import SummaryStats, SpendTrendItem
+from .schemas import SummaryStats, SummaryBucket, SpendTrendItem, SpendTrendColumns, BatchUsers, BatchSummaryQuery, BatchSpendTrendQuery, UserSpendTrend, InboxFileStatus
+from .uploads import SET_UPLOAD_STATUS_SQL, receive_upload, find_sampled_upload, pending_uploads, record_upload
+from .inbox import inbox_dir, register_file_stmt
+from .cache import make_cache, read_data_versions, cache_key, get_or_compute
+from .metrics import REQUEST_LATENCY, render_metrics
+from .exports import (MEDIA_TYPES, TRANSACTION_SCHEMA, SPEND_TREND_SCHEMA, transactions_export_query,
+                      transaction_dict, spend_trend_dict, encode_json_line, stream_export)
 from . import models  # noqa: F401
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/shared_data")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Compressed uploads are stored as-is and decompressed while streaming into the database
+UPLOAD_SUFFIXES = (".csv", ".csv.gz", ".csv.zst", ".parquet", ".arrow")
 
 app = FastAPI(
     title="Transaction API",
-    description="API for uploading and summarising transaction data."
+    description="API for uploading and summarising transaction data.",
+    default_response_class=ORJSONResponse, # orjson instead of json.dumps for every JSON response
 )
+# Compresses responses (streams included) over the threshold for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_BYTES)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Labelled by route template (/summary/{user_id}), not by path, so every user shares one series
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(request.method, route.path if route else "unmatched", status).observe(time.perf_counter() - start)
 
 @app.on_event("startup")
 async def startup_event(): print("Open Swagger UI here: http://localhost:8000/docs")
 
+# Analytics responses, keyed on the data versions ingestion bumps (see app/cache.py)
+response_cache = make_cache()
+
 def get_engine():
     yield main_engine
 
-def get_db():
-    db = SessionLocal()
-    try:
+def get_cache():
+    return response_cache
+
+def get_sessionmaker():
+    return AsyncSessionLocal
+
+async def get_db(sessionmaker=Depends(get_sessionmaker)):
+    # Async session: the read endpoints run on the event loop instead of queueing for Starlette's threadpool
+    async with sessionmaker() as db:
         yield db
-    finally:
-        db.close()
 
 @app.get("/")
 def read_root():
     return {"message": "Hello from the automated cloud!"}
 
-@app.post("/upload")
-async def upload_csv(file: UploadFile = File(...)):
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV.")
+async def upload_backlog(db: AsyncSession):
+    """Files waiting to be ingested: pending inbox rows, or (one flow run per file) uploads whose run hasn't finished."""
+    if settings.INGEST_MODE == "inbox":
+        return (await db.execute(text("SELECT COUNT(*) FROM inbox_files WHERE status IN ('pending', 'processing')"))).scalar()
+    # run_csv_pipeline marks each upload loaded or failed; failed files stay in UPLOAD_DIR but no longer count
+    return await pending_uploads(db)
+
+def upload_retry_after():
+    # The inbox drains a batch at least every INBOX_MAX_WAIT_SECONDS; flow runs drain at their own pace
+    return settings.INBOX_MAX_WAIT_SECONDS if settings.INGEST_MODE == "inbox" else settings.UPLOAD_RETRY_AFTER_SECONDS
+
+def duplicate_upload_response(filename: str, original_id, size: int, checksum: Optional[str]):
+    return {
+        "message": f"File '{filename}' was already uploaded as {original_id}, nothing new to ingest.",
+        "file_id": str(original_id),
+        "duplicate_of": str(original_id),
+        "size_bytes": size,
+        "sha256": checksum,
+    }
+
+# The body is parsed by receive_upload rather than declared as File(...), so describe it for the docs
+UPLOAD_OPENAPI = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@app.post("/upload", openapi_extra=UPLOAD_OPENAPI)
+async def upload_csv(request: Request, db: AsyncSession = Depends(get_db)):
+    # Refuse before reading the body, so an upload storm can't fill the disk or the ingestion queue
+    backlog = await upload_backlog(db)
+    if backlog >= settings.UPLOAD_MAX_BACKLOG:
+        raise HTTPException(status_code=429, detail=f"{backlog} files are already waiting to be ingested, try again later.",
+                            headers={"Retry-After": str(upload_retry_after())})
 
     file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    
+    upload_dir = inbox_dir() if settings.INGEST_MODE == "inbox" else UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+
+    def open_path(filename: str):
+        # Checked on the part's headers, before any of the file is written
+        if not filename.endswith(UPLOAD_SUFFIXES):
+            raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV (optionally .csv.gz or .csv.zst), Parquet or Arrow IPC file.")
+        if filename.endswith('.zst') and importlib.util.find_spec("zstandard") is None:
+            raise HTTPException(status_code=400, detail="zstd uploads are not enabled on this server.")
+        return os.path.join(upload_dir, f"{file_id}_{filename}")
+
+    async def find_duplicate(size: int, sample_sha256: str):
+        # Multi-GB re-uploads are answered without writing or hashing the rest of the file
+        min_sampled = settings.UPLOAD_SAMPLED_DEDUPE_MIN_BYTES
+        if min_sampled is not None and size >= min_sampled:
+            return await find_sampled_upload(db, size, sample_sha256)
+        return None
+
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Prefect deployment
-        asyncio.create_task(
-            run_deployment(
+        upload = await receive_upload(request, open_path, find_duplicate)
+        filename, file_path, size, checksum = upload["filename"], upload["file_path"], upload["size"], upload["sha256"]
+        if upload["duplicate_of"]:
+            return duplicate_upload_response(filename, upload["duplicate_of"], size, None)
+
+        original_id = await record_upload(db, checksum, upload["sample_sha256"], size, file_id, filename)
+        if original_id:
+            await db.rollback()
+            await anyio.to_thread.run_sync(os.remove, file_path)
+            return duplicate_upload_response(filename, original_id, size, checksum)
+
+        if settings.INGEST_MODE == "inbox":
+            # The inbox consumer picks it up with the other pending files
+            await db.execute(register_file_stmt(file_path, filename, size, checksum, uuid.UUID(file_id)))
+            await db.commit()
+            return {
+                "message": f"File '{filename}' queued in the inbox.",
+                "file_id": file_id,
+                "size_bytes": size,
+                "sha256": checksum,
+                "queue_position": backlog + 1,
+            }
+
+        await db.commit()
+
+        # Prefect deployment. Awaited (it returns once the flow run is created), so an upload whose run never
+        # started is marked failed and a re-upload can take it over instead of waiting out UPLOAD_STALE_SECONDS
+        try:
+            await run_deployment(
                 name="CSV Ingestion Pipeline/csv-processor",
                 parameters={
                     "file_path": file_path, 
-                    "database_url": settings.get_database_url()
+                    "database_url": settings.get_database_url(),
+                    "upload_id": file_id,
                 },
                 timeout=0 # Doesn't wait for the flow to finish
             )
-        )
+        except Exception as e:
+            await db.execute(SET_UPLOAD_STATUS_SQL, {"file_id": file_id, "status": "failed"})
+            await db.commit()
+            await anyio.to_thread.run_sync(os.remove, file_path)
+            raise HTTPException(status_code=503, detail=f"Couldn't start the ingestion of '{filename}': {e}")
 
-        return {"message": f"File '{file.filename}' queued for processing."}
+        return {
+            "message": f"File '{filename}' queued for processing.",
+            "file_id": file_id,
+            "size_bytes": size,
+            "sha256": checksum,
+            "queue_position": backlog + 1,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to queue file: {e}")
     
+@app.get("/uploads/{file_id}", response_model=InboxFileStatus)
+async def get_upload_status(file_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    """Status of a file uploaded in inbox mode: pending, processing, loaded or failed."""
+    row = (await db.execute(
+        text("""
+            SELECT file_id, filename, size_bytes, sha256, status, batch_id, rows_read, rows_inserted, error, created_at, updated_at
+            FROM inbox_files WHERE file_id = :file_id
+        """), {"file_id": file_id}
+    )).mappings().first()
+    if not row:
+        raise HTTPException(status_code=404, detail="No inbox upload with this file_id.")
+    return row
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus exposition of request, query, pool and (in-process) ingestion metrics."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/cache/stats")
+async def get_cache_stats(cache=Depends(get_cache)):
+    """Hit/miss counters of the analytics response cache."""
+    return cache.stats()
+
 @app.get("/summary/{user_id}", response_model=SummaryStats)
-def get_summary(user_id: int, start_date: date, end_date: date, db: Session = Depends(get_db)):
+async def get_summary(user_id: int, start_date: date, end_date: date, db: AsyncSession = Depends(get_db), cache=Depends(get_cache)):
     # Validation check for date logic
     if start_date > end_date:
         raise HTTPException(
             status_code=400,
             detail="start_date cannot be after end_date"
         )
-    
-    query = text("""
+
+    key = cache_key("summary", await read_data_versions(db, f"user:{user_id}"),
+                    user_id=user_id, start_date=start_date, end_date=end_date)
+    return await get_or_compute(cache, key, lambda: compute_summary(user_id, start_date, end_date, db))
+
+# Served from the daily rollup: one row per active day instead of every transaction.
+# A bare, half-open spend_date range keeps it a range scan of the primary key, which INCLUDEs the
+# aggregated columns, so the rows come from an index-only scan without touching the heap.
+SUMMARY_SQL = text("""
     SELECT
-        MAX(transaction_amount) as max_val,
-        MIN(transaction_amount) as min_val,
-        AVG(transaction_amount) as mean_val
-    FROM transactions
+        MAX(max_amount) as max_val,
+        MIN(min_amount) as min_val,
+        SUM(total_amount) / NULLIF(SUM(txn_count), 0) as mean_val
+    FROM user_daily_spend
     WHERE user_id = :user_id
-      AND DATE(timestamp) BETWEEN :start_date AND :end_date
-    """)
-    
+      AND spend_date >= :start_date AND spend_date < :end_before
+""")
+
+# Same scan, grouped into calendar weeks (starting Monday) or months; edge buckets only cover the requested days
+SUMMARY_BUCKETS_SQL = text("""
+    SELECT
+        CAST(date_trunc(:granularity, CAST(spend_date AS TIMESTAMP)) AS DATE) as bucket_start,
+        MAX(max_amount) as max_val,
+        MIN(min_amount) as min_val,
+        SUM(total_amount) / NULLIF(SUM(txn_count), 0) as mean_val,
+        SUM(txn_count) as txn_count
+    FROM user_daily_spend
+    WHERE user_id = :user_id
+      AND spend_date >= :start_date AND spend_date < :end_before
+    GROUP BY 1
+    HAVING MAX(max_amount) IS NOT NULL
+    ORDER BY 1
+""")
+
+def summary_params(user_id: int, start_date: date, end_date: date):
+    """Inclusive dates as the half-open [start_date, end_date + 1 day) range the summary queries take."""
+    return {"user_id": user_id, "start_date": start_date, "end_before": end_date + timedelta(days=1)}
+
+async def compute_summary(user_id: int, start_date: date, end_date: date, db: AsyncSession):
     try:
-        result = db.execute(query, {
-            'user_id': user_id,
-            'start_date': start_date,
-            'end_date': end_date
-        }).fetchone()
+        result = (await db.execute(SUMMARY_SQL, summary_params(user_id, start_date, end_date))).fetchone()
         
         if result and result[0] is not None:
             return SummaryStats(
@@ -126,53 +289,65 @@ def get_summary(user_id: int, start_date: date, end_date: date, db: Session = De
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database query failed: {e}")
     
+@app.get("/summary/{user_id}/buckets", response_model=list[SummaryBucket])
+async def get_summary_buckets(user_id: int, start_date: date, end_date: date, granularity: Literal["week", "month"] = "week",
+                              db: AsyncSession = Depends(get_db), cache=Depends(get_cache)):
+    """/summary per calendar week or month in the range, oldest first. Buckets without transactions are left out."""
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
+
+    key = cache_key("summary-buckets", await read_data_versions(db, f"user:{user_id}"),
+                    user_id=user_id, start_date=start_date, end_date=end_date, granularity=granularity)
+    return await get_or_compute(cache, key, lambda: compute_summary_buckets(user_id, start_date, end_date, granularity, db))
+
+async def compute_summary_buckets(user_id: int, start_date: date, end_date: date, granularity: str, db: AsyncSession):
+    params = summary_params(user_id, start_date, end_date) | {"granularity": granularity}
+    rows = (await db.execute(SUMMARY_BUCKETS_SQL, params)).fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No transactions found for user in the given date range.")
+    return [
+        SummaryBucket(
+            bucket_start=row.bucket_start,
+            txn_count=row.txn_count,
+            max_transaction=row.max_val,
+            min_transaction=row.min_val,
+            mean_transaction=row.mean_val,
+        )
+        for row in rows
+    ]
+
 @app.get("/analytics/risk-profile/{user_id}")
-def get_user_risk_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_user_risk_profile(user_id: int, db: AsyncSession = Depends(get_db), cache=Depends(get_cache)):
     """A user's spending volatility, global ranking, and transaction velocity."""
-    query = text("""
-        WITH UserAggregates AS (
-            SELECT 
-                user_id,
-                COUNT(*) as total_transactions,
-                SUM(transaction_amount) as total_spend,
-                AVG(transaction_amount) as avg_spend,
-                COALESCE(STDDEV_POP(transaction_amount), 0) as spend_stddev
-            FROM transactions
-            GROUP BY user_id
-        ),
-        GlobalRanking AS (
-            SELECT 
-                user_id,
-                total_spend,
-                CASE 
-                    WHEN avg_spend = 0 THEN 0 
-                    ELSE (spend_stddev / avg_spend) 
-                END as volatility_index,
-                DENSE_RANK() OVER (ORDER BY total_spend DESC) as whale_rank
-            FROM UserAggregates
-        ),
-        UserTimeGaps AS (
-            SELECT 
-                user_id,
-                transaction_amount,
-                timestamp,
-                EXTRACT(EPOCH FROM (timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp))) / 60 as mins_since_last_txn
-            FROM transactions
-            WHERE user_id = :uid
-        )
-        SELECT 
-            r.whale_rank,
-            ROUND(r.volatility_index, 2) as volatility_index,
-            r.total_spend,
-            ROUND(MIN(g.mins_since_last_txn), 2) as shortest_txn_gap_mins,
-            MAX(g.transaction_amount) as max_single_spike
-        FROM GlobalRanking r
-        LEFT JOIN UserTimeGaps g ON r.user_id = g.user_id
-        WHERE r.user_id = :uid
-        GROUP BY r.whale_rank, r.volatility_index, r.total_spend;
-    """)
-
-    result = db.execute(query, {"uid": user_id}).fetchone()
+    # The whale rank depends on every user's totals, so this follows the global version
+    key = cache_key("risk-profile", await read_data_versions(db, "global"), user_id=user_id)
+    return await get_or_compute(cache, key, lambda: compute_risk_profile(user_id, db))
+
+# Reads the maintained per-user aggregates; the whale rank is an index range count on total_spend
+# (distinct totals above this user's, i.e. DENSE_RANK) instead of ranking every user.
+RISK_PROFILE_SQL = text("""
+    SELECT
+        (
+            SELECT COUNT(DISTINCT total_spend) + 1
+            FROM user_aggregates
+            WHERE total_spend > a.total_spend
+        ) as whale_rank,
+        ROUND(
+            CASE
+                WHEN a.txn_count = 0 OR a.total_spend = 0 THEN 0
+                ELSE SQRT(GREATEST(a.sum_squares / a.txn_count - POWER(a.total_spend / a.txn_count, 2), 0))
+                     / (a.total_spend / a.txn_count)
+            END, 2
+        ) as volatility_index,
+        a.total_spend,
+        ROUND(EXTRACT(EPOCH FROM a.min_gap) / 60, 2) as shortest_txn_gap_mins,
+        a.max_amount as max_single_spike
+    FROM user_aggregates a
+    WHERE a.user_id = :uid
+""")
+
+async def compute_risk_profile(user_id: int, db: AsyncSession):
+    result = (await db.execute(RISK_PROFILE_SQL, {"uid": user_id})).fetchone()
 
     if not result:
         raise HTTPException(status_code=404, detail="User not found or no transactions exist.")
@@ -189,97 +364,262 @@ def get_user_risk_profile(user_id: int, db: Session = Depends(get_db)):
         "analysis": "High volatility implies erratic spending. Short transaction gaps may indicate automated or fraudulent activity."
     }
     
-def fetch_spend_trend_data(user_id: int, db: Session):
-    """Calc 7-day rolling averages."""
-    query = text("""
-        WITH date_range AS (
-            SELECT MIN(DATE(timestamp)) as start_date, MAX(DATE(timestamp)) as end_date
-            FROM transactions
-            WHERE user_id = :uid
-        ),
-        calendar AS (
-            SELECT generate_series(start_date::timestamp, end_date::timestamp, '1 day'::interval)::date as spend_date
-            FROM date_range
-        ),
-        daily_sums AS (
-            SELECT 
-                DATE(timestamp) as spend_date,
-                SUM(transaction_amount) as daily_total
-            FROM transactions
-            WHERE user_id = :uid
-            GROUP BY DATE(timestamp)
-        )
+# Daily spend and 7-day rolling averages from the daily rollup, one row per calendar day
+SPEND_TREND_SQL = text("""
+    WITH date_range AS (
+        SELECT MIN(spend_date) as start_date, MAX(spend_date) as end_date
+        FROM user_daily_spend
+        WHERE user_id = :uid
+    ),
+    calendar AS (
+        SELECT generate_series(start_date::timestamp, end_date::timestamp, '1 day'::interval)::date as spend_date
+        FROM date_range
+    ),
+    daily_sums AS (
         SELECT 
+            spend_date,
+            total_amount as daily_total
+        FROM user_daily_spend
+        WHERE user_id = :uid
+    )
+    SELECT 
+        c.spend_date,
+        COALESCE(d.daily_total, 0) as daily_total,
+        AVG(COALESCE(d.daily_total, 0)) OVER (
+            ORDER BY c.spend_date 
+            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+        ) as rolling_7d_avg
+    FROM calendar c
+    LEFT JOIN daily_sums d ON c.spend_date = d.spend_date
+    ORDER BY c.spend_date;
+""")
+
+async def fetch_spend_trend_data(user_id: int, db: AsyncSession):
+    """Calc 7-day rolling averages from the daily rollup."""
+    return (await db.execute(SPEND_TREND_SQL, {"uid": user_id})).fetchall()
+
+
+@app.get("/analytics/spend-trend/{user_id}", response_model=Union[list[SpendTrendItem], SpendTrendColumns])
+async def get_user_spend_trend(user_id: int, layout: Literal["rows", "columns"] = "rows",
+                               db: AsyncSession = Depends(get_db), cache=Depends(get_cache)):
+    """Daily spend and a 7-day rolling average, as one object per day or (layout=columns) as three parallel arrays."""
+    key = cache_key("spend-trend", await read_data_versions(db, f"user:{user_id}"), user_id=user_id, layout=layout)
+    content = await get_or_compute(cache, key, lambda: compute_spend_trend(user_id, db, layout), encoder=None)
+    # Already JSON-native: returning the response directly skips re-validating every day against response_model
+    return ORJSONResponse(content)
+
+async def compute_spend_trend(user_id: int, db: AsyncSession, layout: str = "rows"):
+    results = await fetch_spend_trend_data(user_id, db)
+
+    if not results:
+        raise HTTPException(status_code=404, detail="No transactions found for this user.")
+
+    # Plain lists straight from the rows, no model per day
+    if layout == "columns":
+        return {
+            "dates": [row.spend_date.isoformat() for row in results],
+            "totals": [float(row.daily_total) for row in results],
+            "avgs": [float(row.rolling_7d_avg) for row in results],
+        }
+    return [spend_trend_dict(row) for row in results]
+
+
+# The dashboard is a static shell plus a JSON data endpoint; the browser draws the Plotly charts
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+with open(os.path.join(STATIC_DIR, "dashboard.js"), "rb") as f:
+    DASHBOARD_JS = f.read()
+with open(os.path.join(STATIC_DIR, "dashboard.html")) as f:
+    DASHBOARD_SHELL = string.Template(f.read())
+# Content-hashed, so the script can be cached forever and a deploy still ships the new one
+DASHBOARD_JS_NAME = f"dashboard.{hashlib.sha256(DASHBOARD_JS).hexdigest()[:12]}.js"
+PLOTLY_JS_URL = "https://cdn.plot.ly/plotly-3.3.1.min.js"
+
+@app.get("/dashboard/assets/{name}", include_in_schema=False)
+async def get_dashboard_script(name: str):
+    if name != DASHBOARD_JS_NAME:
+        raise HTTPException(status_code=404, detail="Unknown asset.")
+    return Response(DASHBOARD_JS, media_type="text/javascript",
+                    headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+DASHBOARD_USER_SQL = text("SELECT 1 FROM user_aggregates WHERE user_id = :uid")
+
+@app.get("/dashboard/{user_id}", response_class=HTMLResponse)
+async def get_user_dashboard(user_id: int, db: AsyncSession = Depends(get_db)):
+    """Plotly HTML dashboard for the user. The page is a static shell; the data comes from /dashboard/{user_id}/data."""
+    has_data = (await db.execute(DASHBOARD_USER_SQL, {"uid": user_id})).first()
+    if not has_data:
+        return HTMLResponse(content=f"<h2>No data available to plot for User {user_id}</h2>", status_code=404)
+
+    html_content = DASHBOARD_SHELL.substitute(user_id=user_id, plotly_url=PLOTLY_JS_URL,
+                                              script_url=f"/dashboard/assets/{DASHBOARD_JS_NAME}")
+    # Doesn't depend on the data; a day's max-age so a redeployed shell still reaches browsers
+    return HTMLResponse(content=html_content, headers={"Cache-Control": "public, max-age=86400"})
+
+@app.get("/dashboard/{user_id}/data", response_model=SpendTrendColumns, responses={304: {"description": "Data unchanged since the ETag sent in If-None-Match."}})
+async def get_user_dashboard_data(user_id: int, request: Request, db: AsyncSession = Depends(get_db), cache=Depends(get_cache)):
+    """The dashboard's chart data. The strong ETag follows the user's data version, so refreshes are 304s until new data lands."""
+    version = await read_data_versions(db, f"user:{user_id}")
+    headers = {"ETag": f'"dashboard-{user_id}-{version}"', "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or headers["ETag"] in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    # Same entry as /analytics/spend-trend?layout=columns
+    key = cache_key("spend-trend", version, user_id=user_id, layout="columns")
+    content = await get_or_compute(cache, key, lambda: compute_spend_trend(user_id, db, "columns"), encoder=None)
+    return ORJSONResponse(content, headers=headers)
+
+# Batch endpoints: one set-based query for many users, streamed back as NDJSON while Postgres produces it.
+# Same rollup and maths as the per-user endpoints, so each line equals that user's single response.
+BATCH_SUMMARY_SQL = """
+    SELECT
+        user_id,
+        MAX(max_amount) as max_val,
+        MIN(min_amount) as min_val,
+        SUM(total_amount) / NULLIF(SUM(txn_count), 0) as mean_val
+    FROM user_daily_spend
+    WHERE {users}
+      AND spend_date >= :start_date AND spend_date < :end_before
+    GROUP BY user_id
+    HAVING MAX(max_amount) IS NOT NULL
+    ORDER BY user_id
+"""
+
+# With a window the calendar starts 6 days early (but not before the user's first day),
+# so the first rolling averages in the window match the full-history ones.
+BATCH_SPEND_TREND_SQL = """
+    WITH bounds AS (
+        SELECT
+            user_id,
+            GREATEST(MIN(spend_date), CAST(:start_date AS DATE) - 6) as first_day,
+            LEAST(MAX(spend_date), CAST(:end_date AS DATE)) as last_day
+        FROM user_daily_spend
+        WHERE {users}
+        GROUP BY user_id
+    ),
+    calendar AS (
+        SELECT user_id, generate_series(first_day::timestamp, last_day::timestamp, '1 day'::interval)::date as spend_date
+        FROM bounds
+    ),
+    series AS (
+        SELECT
+            c.user_id,
             c.spend_date,
-            COALESCE(d.daily_total, 0) as daily_total,
-            AVG(COALESCE(d.daily_total, 0)) OVER (
-                ORDER BY c.spend_date 
+            COALESCE(d.total_amount, 0) as daily_total,
+            AVG(COALESCE(d.total_amount, 0)) OVER (
+                PARTITION BY c.user_id
+                ORDER BY c.spend_date
                 ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
             ) as rolling_7d_avg
         FROM calendar c
-        LEFT JOIN daily_sums d ON c.spend_date = d.spend_date
-        ORDER BY c.spend_date;
-    """)
-    return db.execute(query, {"uid": user_id}).fetchall()
+        LEFT JOIN user_daily_spend d ON d.user_id = c.user_id AND d.spend_date = c.spend_date
+    )
+    SELECT user_id, spend_date, daily_total, rolling_7d_avg
+    FROM series
+    WHERE CAST(:start_date AS DATE) IS NULL OR spend_date >= CAST(:start_date AS DATE)
+    ORDER BY user_id, spend_date
+"""
 
+def batch_users_filter(batch: BatchUsers):
+    if batch.user_ids is not None:
+        return "user_id = ANY(:user_ids)", {"user_ids": batch.user_ids}
+    return "user_id BETWEEN :user_id_from AND :user_id_to", {"user_id_from": batch.user_id_from, "user_id_to": batch.user_id_to}
 
-@app.get("/analytics/spend-trend/{user_id}", response_model=list[SpendTrendItem])
-def get_user_spend_trend(user_id: int, db: Session = Depends(get_db)):
-    """Daily spend and a 7-day rolling average."""
-    results = fetch_spend_trend_data(user_id, db)
+async def stream_ndjson(sessionmaker, query: str, params: dict, to_lines):
+    # Own session: the request's dependencies are closed before a streaming body starts
+    async with sessionmaker() as db:
+        rows = await db.stream(text(query), params) # Server-side cursor, rows arrive in batches
+        async for line in to_lines(rows):
+            yield line
 
-    if not results:
-        raise HTTPException(status_code=404, detail="No transactions found for this user.")
+async def summary_lines(rows):
+    async for row in rows:
+        yield SummaryStats(
+            user_id=row.user_id,
+            max_transaction=row.max_val,
+            min_transaction=row.min_val,
+            mean_transaction=row.mean_val,
+        ).model_dump_json() + "\n"
 
-    return [
-        SpendTrendItem(
-            spend_date=row.spend_date,
-            daily_total=row.daily_total,
-            rolling_7d_avg=row.rolling_7d_avg
-        ) for row in results
-    ]
+async def spend_trend_lines(rows):
+    user_id, trend = None, []
+    async for row in rows:
+        if row.user_id != user_id and trend:
+            yield encode_json_line({"user_id": user_id, "trend": trend})
+            trend = []
+        user_id = row.user_id
+        trend.append(spend_trend_dict(row))
+    if trend:
+        yield encode_json_line({"user_id": user_id, "trend": trend})
 
+@app.post("/batch/summary", response_class=StreamingResponse, responses={200: {
+    "description": "One SummaryStats object per line, ordered by user_id. Users without transactions in the range are left out.",
+    "content": {"application/x-ndjson": {"schema": SummaryStats.model_json_schema()}},
+}})
+async def get_batch_summary(batch: BatchSummaryQuery, sessionmaker=Depends(get_sessionmaker)):
+    """/summary for many users with one query."""
+    if batch.start_date > batch.end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
 
-@app.get("/dashboard/{user_id}", response_class=HTMLResponse)
-def get_user_dashboard(user_id: int, db: Session = Depends(get_db)):
-    """Plotly HTML dashboard for the user."""
-    results = fetch_spend_trend_data(user_id, db)
+    users, params = batch_users_filter(batch)
+    params |= {"start_date": batch.start_date, "end_before": batch.end_date + timedelta(days=1)}
+    return StreamingResponse(
+        stream_ndjson(sessionmaker, BATCH_SUMMARY_SQL.format(users=users), params, summary_lines),
+        media_type="application/x-ndjson",
+    )
 
-    if not results:
-        return HTMLResponse(content=f"<h2>No data available to plot for User {user_id}</h2>", status_code=404)
+@app.post("/batch/spend-trend", response_class=StreamingResponse, responses={200: {
+    "description": "One {user_id, trend} object per line, ordered by user_id. Users without transactions are left out.",
+    "content": {"application/x-ndjson": {"schema": UserSpendTrend.model_json_schema()}},
+}})
+async def get_batch_spend_trend(batch: BatchSpendTrendQuery, sessionmaker=Depends(get_sessionmaker)):
+    """/analytics/spend-trend for many users with one query, optionally cut to a date window."""
+    if batch.start_date and batch.end_date and batch.start_date > batch.end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
 
-    dates = [row.spend_date for row in results]
-    daily_totals = [row.daily_total for row in results]
-    rolling_avgs = [row.rolling_7d_avg for row in results]
-    fig = go.Figure()
-    
-    fig.add_trace(go.Bar(
-        x=dates, 
-        y=daily_totals, 
-        name="Daily Spend", 
-        opacity=0.6,
-        marker_color='lightblue'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=dates, 
-        y=rolling_avgs, 
-        mode='lines', 
-        name="7-Day Moving Average", 
-        line=dict(color='darkblue', width=3)
-    ))
-
-    fig.update_layout(
-        title=f"Transaction Analysis: User {user_id}",
-        xaxis_title="Date",
-        yaxis_title="Amount ($)",
-        template="plotly_white",
-        hovermode="x unified",
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    users, params = batch_users_filter(batch)
+    params |= {"start_date": batch.start_date, "end_date": batch.end_date}
+    return StreamingResponse(
+        stream_ndjson(sessionmaker, BATCH_SPEND_TREND_SQL.format(users=users), params, spend_trend_lines),
+        media_type="application/x-ndjson",
     )
 
-    html_content = fig.to_html(full_html=True, include_plotlyjs='cdn')
-    return HTMLResponse(content=html_content)
+# Exports: raw rows streamed off a server-side cursor, so memory stays flat however many rows match
+EXPORT_RESPONSES = {200: {
+    "description": "NDJSON (one object per line) or an Arrow IPC stream, depending on `format`.",
+    "content": {media_type: {} for media_type in MEDIA_TYPES.values()},
+}}
+
+@app.get("/export/transactions/{user_id}", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_user_transactions(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    after_timestamp: Optional[datetime] = Query(None, description="Keyset cursor: the last row's timestamp from the previous page."),
+    after_transaction_id: Optional[uuid.UUID] = Query(None, description="Keyset cursor: the last row's transaction_id (breaks timestamp ties)."),
+    limit: Optional[int] = Query(None, gt=0, description="Page size; omit to stream everything."),
+    format: Literal["ndjson", "arrow"] = "ndjson",
+    sessionmaker=Depends(get_sessionmaker),
+):
+    """A user's transactions in (timestamp, transaction_id) order. No matching rows gives an empty body."""
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date cannot be after end_date")
+    if after_transaction_id and not after_timestamp:
+        raise HTTPException(status_code=400, detail="after_transaction_id needs after_timestamp")
+
+    query, params = transactions_export_query(user_id, start_date, end_date, after_timestamp, after_transaction_id, limit)
+    return StreamingResponse(
+        stream_export(sessionmaker, query, params, format, TRANSACTION_SCHEMA, transaction_dict),
+        media_type=MEDIA_TYPES[format],
+    )
+
+@app.get("/export/spend-trend/{user_id}", response_class=StreamingResponse, responses=EXPORT_RESPONSES)
+async def export_user_spend_trend(user_id: int, format: Literal["ndjson", "arrow"] = "ndjson", sessionmaker=Depends(get_sessionmaker)):
+    """/analytics/spend-trend as a stream, for users with long histories."""
+    return StreamingResponse(
+        stream_export(sessionmaker, SPEND_TREND_SQL, {"uid": user_id}, format, SPEND_TREND_SCHEMA, spend_trend_dict),
+        media_type=MEDIA_TYPES[format],
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,112 @@
+# app/metrics.py
+import os
+import re
+import time
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+# Prometheus metrics for the API (/metrics) and the worker (its own HTTP port, see worker.py).
+# Flow runs and range workers are separate processes: with PROMETHEUS_MULTIPROC_DIR set, each one writes its
+# samples to files there and a scrape adds them up. Without it everything lives in this process's registry.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to the response headers, per route template.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL execution time, per engine and statement type.",
+    ["engine", "statement"], buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent getting a connection from the pool (waiting or connecting).",
+    ["engine"], buckets=LATENCY_BUCKETS,
+)
+
+INGEST_ROWS_READ = Counter("ingest_rows_read_total", "Rows parsed by ingestion.", ["loader"])
+INGEST_ROWS_INSERTED = Counter("ingest_rows_inserted_total", "Rows committed by ingestion (duplicates excluded).", ["loader"])
+INGEST_PARSE_SECONDS = Counter("ingest_chunk_parse_seconds_total", "Time spent reading and parsing chunks.", ["loader"])
+INGEST_INSERT_SECONDS = Counter(
+    "ingest_chunk_insert_seconds_total", "Time spent loading chunks, rollups included, up to commit.", ["loader"],
+)
+INGEST_ROWS_PER_SECOND = Gauge(
+    "ingest_last_file_rows_per_second", "Rows read per second by the most recently finished file.", ["loader"],
+    multiprocess_mode="mostrecent",
+)
+
+# The statement's leading keyword keeps the label's values few, whatever the SQL
+STATEMENT_TYPE = re.compile(r"^\W*(\w+)")
+
+def statement_type(statement: str):
+    match = STATEMENT_TYPE.match(statement)
+    return match.group(1).upper() if match else "OTHER"
+
+_instrumented_pools = {}
+
+def instrument_engine(engine, name: str):
+    """
+    Times every query on a (sync) engine, and every checkout from its pool. For an async engine pass .sync_engine.
+    Its pool's size and usage are reported at scrape time.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        QUERY_LATENCY.labels(name, statement_type(statement)).observe(elapsed)
+
+    time_checkouts(engine.pool, name)
+    # A dispose() swaps in a fresh pool of the same class, so follow it
+    event.listen(engine, "engine_disposed", lambda _: time_checkouts(engine.pool, name))
+    return engine
+
+def time_checkouts(pool, name: str):
+    connect = pool.connect
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT_WAIT.labels(name).observe(time.perf_counter() - start)
+    pool.connect = timed_connect
+    _instrumented_pools[name] = pool
+
+class PoolCollector:
+    """db_pool_connections{engine, state}: this process's pools as of the scrape."""
+    def collect(self):
+        gauge = GaugeMetricFamily("db_pool_connections", "Connections per pool and state.", labels=["engine", "state"])
+        for name, pool in _instrumented_pools.items():
+            if not hasattr(pool, "checkedout"): # NullPool and friends keep no connections
+                continue
+            gauge.add_metric([name, "size"], pool.size())
+            gauge.add_metric([name, "checked_out"], pool.checkedout())
+            gauge.add_metric([name, "idle"], pool.checkedin())
+            gauge.add_metric([name, "overflow"], max(pool.overflow(), 0))
+        yield gauge
+
+pool_collector = PoolCollector()
+if not MULTIPROC_DIR:
+    REGISTRY.register(pool_collector)
+
+def scrape_registry():
+    """Every process's samples in multiprocess mode (plus this process's pools), otherwise the default registry."""
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(pool_collector)
+    return registry
+
+def render_metrics():
+    return generate_latest(scrape_registry())
+
+def observe_chunk(loader: str, rows_read: int, rows_inserted: int, parse_seconds: float, insert_seconds: float):
+    INGEST_ROWS_READ.labels(loader).inc(rows_read)
+    INGEST_ROWS_INSERTED.labels(loader).inc(rows_inserted)
+    INGEST_PARSE_SECONDS.labels(loader).inc(parse_seconds)
+    INGEST_INSERT_SECONDS.labels(loader).inc(insert_seconds)
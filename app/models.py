@@ -1,19 +1,144 @@
 # app/models.py
-from sqlalchemy import Column, Integer, DateTime, Index, DECIMAL 
+from sqlalchemy import (Column, Integer, BigInteger, String, Boolean, Date, DateTime, Interval, Index, PrimaryKeyConstraint,
+                        DECIMAL, NUMERIC, DDL, event, func, text)
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from .database import Base
+from .ids import uuid7
+from .partitions import CREATE_DEFAULT_PARTITION_SQL
 
 class Transaction(Base):
+    """
+    Monthly RANGE partitions on timestamp (see app/partitions.py). user_id lookups go through idx_user_timestamp.
+    Amounts are whole cents. Columns run widest first (16, 8, 8, 4, 4 bytes) so no row carries alignment padding.
+    """
     __tablename__ = "transactions"
 
-    transaction_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(Integer, index=True)
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) # Time-ordered, see app/ids.py
+    timestamp = Column(DateTime, primary_key=True, index=True) # The partition key has to be part of the PK
+    amount_cents = Column(BigInteger)
+    user_id = Column(Integer, nullable=False)
     product_id = Column(Integer)
-    timestamp = Column(DateTime, index=True)
-    transaction_amount = Column(DECIMAL(10, 2))
 
     __table_args__ = (
         Index('idx_user_timestamp', 'user_id', 'timestamp'),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
+# Catch-all partition so rows for a month nobody created yet still insert
+event.listen(Transaction.__table__, "after_create", DDL(CREATE_DEFAULT_PARTITION_SQL))
+
+
+class TransactionId(Base):
+    """
+    Every transaction_id ever inserted. Postgres can't enforce a unique transaction_id across partitions,
+    so the loaders claim ids here first (ON CONFLICT DO NOTHING) and only insert the rows whose id was new.
+    """
+    __tablename__ = "transaction_ids"
+
+    transaction_id = Column(UUID(as_uuid=True), primary_key=True)
+
+
+class IngestionManifest(Base):
+    """Per-file (per byte range, in parallel mode) checkpoint so a retried ingestion resumes where it stopped."""
+    __tablename__ = "ingestion_manifest"
+
+    file_path = Column(String, primary_key=True)
+    range_start = Column(BigInteger, primary_key=True)
+    range_end = Column(BigInteger, nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    byte_offset = Column(BigInteger, nullable=False) # Next unread byte; everything before it is committed
+    chunk_index = Column(Integer, nullable=False, default=0)
+    rows_read = Column(BigInteger, nullable=False, default=0)
+    rows_inserted = Column(BigInteger, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class UserDailySpend(Base):
+    """
+    Per user per day rollup of transactions, kept up to date by ingestion (see app/rollups.py).
+    The primary key INCLUDEs the aggregates, so /summary's range scans are index-only.
+    """
+    __tablename__ = "user_daily_spend"
+
+    user_id = Column(Integer)
+    spend_date = Column(Date)
+    total_amount = Column(DECIMAL(18, 2), nullable=False, default=0)
+    txn_count = Column(BigInteger, nullable=False, default=0) # Transactions with a non-null amount
+    min_amount = Column(DECIMAL(10, 2))
+    max_amount = Column(DECIMAL(10, 2))
+
+    __table_args__ = (
+        PrimaryKeyConstraint('user_id', 'spend_date',
+                             postgresql_include=['total_amount', 'txn_count', 'min_amount', 'max_amount']),
+    )
+
+
+class UserAggregate(Base):
+    """Lifetime per-user totals behind /analytics/risk-profile, kept up to date by ingestion (see app/rollups.py)."""
+    __tablename__ = "user_aggregates"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False) # Always a transactions.user_id, never generated
+    txn_count = Column(BigInteger, nullable=False, default=0) # Transactions with a non-null amount
+    total_spend = Column(DECIMAL(18, 2), nullable=False, default=0, index=True) # Indexed for the whale rank lookup
+    sum_squares = Column(NUMERIC, nullable=False, default=0) # For the population stddev
+    max_amount = Column(DECIMAL(10, 2))
+    min_gap = Column(Interval) # Shortest time between two of the user's transactions
+
+
+class DataVersion(Base):
+    """
+    Counters bumped by ingestion whenever data changes: one "user:<id>" row per user and one "global" row.
+    Cached API responses are keyed on these (see app/cache.py), so they go stale exactly when the data does.
+    """
+    __tablename__ = "data_versions"
+
+    scope = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class InboxFile(Base):
+    """
+    One file dropped into the inbox (INGEST_MODE=inbox). The consumer loads pending files together in one batch
+    and records each file's outcome here: pending -> processing -> loaded or failed.
+    """
+    __tablename__ = "inbox_files"
+
+    file_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    file_path = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64))
+    status = Column(String, nullable=False, default="pending")
+    batch_id = Column(UUID(as_uuid=True)) # Files loaded together share one
+    rows_read = Column(BigInteger)
+    rows_inserted = Column(BigInteger)
+    error = Column(String)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_inbox_status_created", "status", "created_at"), # The consumer's oldest-pending-first scan
+    )
+
+
+class UploadedFile(Base):
+    """
+    Every accepted upload by content hash, so re-uploading the same file is answered without ingesting it again.
+    Ingestion records the outcome: pending -> loaded or failed. A failed (or long-stuck pending) upload can be taken over.
+    """
+    __tablename__ = "uploaded_files"
+
+    sha256 = Column(String(64), primary_key=True)
+    sample_sha256 = Column(String(64), nullable=False) # Size + first bytes, for the sampled fast check
+    size_bytes = Column(BigInteger, nullable=False)
+    file_id = Column(UUID(as_uuid=True), nullable=False) # The upload that was ingested
+    filename = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_uploaded_size_sample", "size_bytes", "sample_sha256"),
+        Index("idx_uploaded_pending", "created_at", postgresql_where=text("status = 'pending'")), # /upload's backlog count
+    )
@@ -0,0 +1,105 @@
+# app/partitions.py
+import argparse
+import re
+from datetime import date
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+
+# transactions is RANGE partitioned on timestamp, one partition per calendar month.
+# Rows outside every monthly partition land in transactions_default until their month is created.
+DEFAULT_PARTITION = "transactions_default"
+PARTITION_NAME = re.compile(r"^transactions_(default|y\d{4}m\d{2})$")
+
+CREATE_DEFAULT_PARTITION_SQL = f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF transactions DEFAULT"
+
+def is_partition(table_name: str):
+    return bool(PARTITION_NAME.match(table_name))
+
+def month_start(day: date):
+    return date(day.year, day.month, 1)
+
+def next_month(day: date):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def partition_name(month: date):
+    return f"transactions_y{month.year:04d}m{month.month:02d}"
+
+def months_between(start: date, end: date):
+    """Every month from start's to end's, inclusive."""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+def missing_partitions(connection, months):
+    # Reads pg_class rather than to_regclass(), whose catalog cache can miss a table another worker just created
+    existing = set(connection.execute(
+        text("SELECT relname FROM pg_class WHERE relname = ANY(:names) AND relnamespace = current_schema()::regnamespace"),
+        {"names": [partition_name(month) for month in months]},
+    ).scalars())
+    return [month for month in months if partition_name(month) not in existing]
+
+def create_month_partition(connection, month: date):
+    """
+    Creates and attaches one monthly partition. Rows for that month already sitting in the default partition
+    are moved into it first, otherwise attaching would fail the default partition's constraint check.
+    """
+    name = partition_name(month)
+    bounds = {"lower": month, "upper": next_month(month)}
+    connection.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS)"))
+    connection.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE timestamp >= :lower AND timestamp < :upper
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)  # nosec B608  # The partition name is derived from a date, the bounds are bound parameters
+    # Builds the partition's copies of the parent's indexes as part of the attach
+    connection.execute(text(
+        f"ALTER TABLE transactions ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lower'].isoformat()}') TO ('{bounds['upper'].isoformat()}')"
+    ))
+
+def ensure_partitions(connection, months):
+    """Makes sure each of the given months has its own partition. Returns the names of the ones created."""
+    months = sorted(set(months))
+    if not months or not missing_partitions(connection, months):
+        return []
+
+    # Serialise partition creation across parallel ingestion workers, then re-check under the lock
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('transactions_partitions'))"))
+    created = []
+    for month in missing_partitions(connection, months):
+        create_month_partition(connection, month)
+        created.append(partition_name(month))
+    return created
+
+def ensure_month_partitions(connection, start: date, end: date):
+    return ensure_partitions(connection, months_between(start, end))
+
+def ensure_partitions_for_timestamps(connection, timestamps):
+    """Creates the partitions a chunk of rows is about to land in, from the chunk's timestamp column."""
+    # Only the months actually present, so one stray old row doesn't create every month in between
+    months = timestamps.dropna().dt.to_period("M").unique()
+    return ensure_partitions(connection, (month.start_time.date() for month in months))
+
+def ensure_future_partitions(connection, today: date, months_ahead: int = None):
+    """Keeps the current month and the next months_ahead months pre-created."""
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    end = month_start(today)
+    for _ in range(months_ahead):
+        end = next_month(end)
+    return ensure_month_partitions(connection, today, end)
+
+if __name__ == "__main__":
+    # python -m app.partitions ensure
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of the transactions table.")
+    parser.add_argument("command", choices=["ensure"])
+    args = parser.parse_args()
+
+    engine = create_engine(settings.get_database_url())
+    with engine.begin() as connection:
+        created = ensure_future_partitions(connection, date.today())
+    print(f"Created partitions: {', '.join(created) or 'none'}.")
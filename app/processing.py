@@ -1,45 +1,552 @@
 # app/processing.py
+import csv
+import gzip
+import io
+import multiprocessing
+import time
+import uuid
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional
 import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.dialects.postgresql import insert 
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.tseries.api import guess_datetime_format
+from sqlalchemy import create_engine, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
 import os
 from prefect import task, flow
 
+from app.bulk_load import deferred_indexes
+from app.config import settings
+from app.database import get_cached_engine
+from app.metrics import INGEST_ROWS_PER_SECOND, instrument_engine, observe_chunk
+from app.models import IngestionManifest, TransactionId
+from app.partitions import ensure_partitions_for_timestamps
+from app.rollups import apply_inserted_rows, backfill_rollups
+from app.uploads import SET_UPLOAD_STATUS_SQL
+
 CHUNK_SIZE = 5_000
+COLUMNS = ["transaction_id", "user_id", "product_id", "timestamp", "transaction_amount"] # What files carry
+TABLE_COLUMNS = ["transaction_id", "timestamp", "amount_cents", "user_id", "product_id"] # What transactions stores
+# What the loaders hand to the rollups: amounts back in currency units
+INSERTED_COLUMNS = ["transaction_id", "user_id", "timestamp", "amount_cents * 0.01 AS transaction_amount"]
+COMPRESSED_SUFFIXES = (".gz", ".zst") # .zst needs the optional zstandard package
+COLUMNAR_SUFFIXES = (".parquet", ".arrow") # Parquet and Arrow IPC (file format) with the same five columns
+
+# "insert" = multi-row INSERT ... VALUES per chunk, "copy" = COPY into a staging table then one set-based merge
+LOADERS = ("insert", "copy")
+
+# "pandas" = infer types per chunk and parse timestamps with format='mixed'
+# "typed" = declared dtypes and one timestamp format detected from the first chunk
+# "pyarrow" = "typed" on pandas' pyarrow CSV engine (pair it with a larger chunk_size)
+PARSERS = ("pandas", "typed", "pyarrow")
+TYPED_DTYPES = {
+    "transaction_id": str, # UUIDs stay strings, Postgres validates them on insert
+    "user_id": "Int32",
+    "product_id": "Int32",
+    "timestamp": str,
+    "transaction_amount": "float64", # Rounded to whole cents by to_table_rows
+}
+
+STAGING_TABLE_SQL = text("""
+    CREATE TEMP TABLE IF NOT EXISTS transactions_staging (
+        row_num BIGINT,
+        transaction_id UUID,
+        user_id INTEGER,
+        product_id INTEGER,
+        timestamp TIMESTAMP,
+        amount_cents BIGINT
+    ) ON COMMIT DELETE ROWS
+""")
 
-def insert_on_conflict_nothing(table, conn, keys, data_iter): # If the transaction_id already exists, skip it
+# transaction_ids is the cross-partition uniqueness check: only rows whose id it didn't have yet are inserted.
+# DISTINCT ON ... row_num so that, like the VALUES insert, the first occurrence of a duplicate id wins.
+MERGE_STAGING_SQL = text(f"""
+    WITH first_rows AS (
+        SELECT DISTINCT ON (transaction_id) row_num, {", ".join(TABLE_COLUMNS)}
+        FROM transactions_staging
+        ORDER BY transaction_id, row_num
+    ),
+    new_ids AS (
+        INSERT INTO transaction_ids (transaction_id)
+        SELECT transaction_id FROM first_rows ORDER BY row_num
+        ON CONFLICT DO NOTHING
+        RETURNING transaction_id
+    )
+    INSERT INTO transactions ({", ".join(TABLE_COLUMNS)})
+    SELECT {", ".join(TABLE_COLUMNS)}
+    FROM first_rows JOIN new_ids USING (transaction_id)
+    ORDER BY row_num
+    RETURNING {", ".join(INSERTED_COLUMNS)}
+""")  # nosec B608  # Only the column-name constants are interpolated
+
+def to_table_rows(chunk_df):
+    """A parsed chunk in the table's layout: amounts rounded to whole cents, and every row has a user_id."""
+    missing = chunk_df["user_id"].isna()
+    if missing.any():
+        raise ValueError(f"Row {chunk_df.index[int(missing.to_numpy().argmax())]}: missing user_id.")
+    table_df = chunk_df.drop(columns="transaction_amount")
+    table_df["amount_cents"] = (chunk_df["transaction_amount"] * 100).round().astype("Int64")
+    return table_df[TABLE_COLUMNS]
+
+def insert_on_conflict_nothing(table, conn, keys, data_iter, inserted=None): # If the transaction_id already exists, skip it
     data = [dict(zip(keys, row)) for row in data_iter]
-    stmt = insert(table.table).values(data)
-    stmt = stmt.on_conflict_do_nothing(index_elements=['transaction_id'])
-    conn.execute(stmt)
+    first_rows = {}
+    for row in data:
+        first_rows.setdefault(uuid.UUID(str(row["transaction_id"])), row)
 
-@task(retries=3, retry_delay_seconds=10)
-def process_csv_to_db(file_path: str, database_url: str):
-    # Spin up the engine *inside* the task
-    engine = create_engine(database_url)
-    total_rows = 0
-    
-    with engine.begin() as connection:
+    # Claim the ids in the ledger first; the ones already there are duplicates
+    ledger = TransactionId.__table__
+    claimed = set(conn.execute(
+        insert(ledger).values([{"transaction_id": tid} for tid in first_rows])
+        .on_conflict_do_nothing().returning(ledger.c.transaction_id)
+    ).scalars())
+    rows = [row for tid, row in first_rows.items() if tid in claimed]
+    if not rows:
+        return 0
+
+    stmt = insert(table.table).values(rows)
+    if inserted is None:
+        conn.execute(stmt)
+        return len(rows) # to_sql sums these, so it returns the rows actually inserted
+
+    # Collect the rows that weren't skipped so the rollups only see new data
+    rows = conn.execute(stmt.returning(*(literal_column(col) for col in INSERTED_COLUMNS))).fetchall()
+    inserted.extend(rows)
+    return len(rows)
+
+def copy_chunk_to_db(chunk_df, connection):
+    """Stream a chunk into the staging table with COPY, then merge it into transactions."""
+    buffer = io.StringIO()
+    to_table_rows(chunk_df).to_csv(buffer, header=False, index=True, index_label="row_num")
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY transactions_staging (row_num, {', '.join(TABLE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+    inserted = connection.execute(MERGE_STAGING_SQL).fetchall()
+    connection.execute(text("TRUNCATE transactions_staging"))
+    return inserted
+
+def insert_chunk_to_db(chunk_df, connection):
+    inserted = []
+    to_table_rows(chunk_df).to_sql('transactions', con=connection, if_exists='append', index=False,
+                                   method=partial(insert_on_conflict_nothing, inserted=inserted))
+    return inserted
+
+# Session-level advisory locks (hashtext('transactions_writers'), slot) act as a cross-process semaphore
+WRITER_TRY_LOCK_SQL = text("SELECT pg_try_advisory_lock(hashtext('transactions_writers'), :slot)")
+WRITER_UNLOCK_SQL = text("SELECT pg_advisory_unlock(hashtext('transactions_writers'), :slot)")
+WRITER_POLL_SECONDS = 0.5
+
+@contextmanager
+def writer_slot(connection, max_writers: Optional[int] = None):
+    """
+    Holds one of max_writers (INGEST_MAX_WRITERS) slots for the connection, waiting until one is free.
+    However many flow runs and range workers are ingesting, only that many load into the database at once.
+    """
+    max_writers = max_writers or settings.INGEST_MAX_WRITERS
+    slot = None
+    while slot is None:
+        slot = next((s for s in range(max_writers) if connection.execute(WRITER_TRY_LOCK_SQL, {"slot": s}).scalar()), None)
+        connection.commit() # The lock outlives the transaction; the caller starts its own
+        if slot is None:
+            time.sleep(WRITER_POLL_SECONDS)
+    try:
+        yield slot
+    finally:
+        connection.rollback()
+        connection.execute(WRITER_UNLOCK_SQL, {"slot": slot})
+        connection.commit()
+
+def is_compressed(file_path: str):
+    return file_path.endswith(COMPRESSED_SUFFIXES)
+
+def is_columnar(file_path: str):
+    return file_path.endswith(COLUMNAR_SUFFIXES)
+
+def open_csv_stream(file_path: str):
+    """Opens a CSV for binary reading, decompressing .gz/.zst on the fly so no uncompressed copy hits the disk."""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rb")
+    if file_path.endswith(".zst"):
         try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Reading .zst files needs the optional 'zstandard' package.")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True))
+    return open(file_path, "rb")
+
+def seek_stream(f, offset: int):
+    if f.seekable():
+        f.seek(offset)
+    else:
+        # zstd streams can only move forward by decompressing
+        while offset > 0 and (skipped := len(f.read(min(offset, 1024 ** 2)))):
+            offset -= skipped
+
+def read_csv_header(file_path: str):
+    """Returns the header's column names and the (uncompressed) byte offset where the data rows start."""
+    with open_csv_stream(file_path) as f:
+        header = f.readline()
+    columns = [col.strip() for col in next(csv.reader([header.decode("utf-8-sig")]), [])]
+    if not set(COLUMNS).issubset(columns):
+        raise ValueError("CSV missing required columns.")
+    return columns, len(header)
+
+def read_columnar_columns(file_path: str):
+    if file_path.endswith(".parquet"):
+        columns = pq.ParquetFile(file_path).schema_arrow.names
+    else:
+        with pa.memory_map(file_path) as source:
+            columns = pa.ipc.open_file(source).schema.names
+    if not set(COLUMNS).issubset(columns):
+        raise ValueError("File missing required columns.")
+    return columns
+
+def split_byte_ranges(file_path: str, data_start: int, parts: int):
+    """Splits [data_start, EOF) into up to `parts` ranges that each start at the beginning of a line."""
+    size = os.path.getsize(file_path)
+    step = max((size - data_start) // parts, 1)
+    bounds = [data_start]
+
+    with open(file_path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(data_start + i * step - 1, bounds[-1]))
+            f.readline() # Move to the start of the next line
+            pos = min(f.tell(), size)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if bounds[-1] < size:
+        bounds.append(size)
+
+    return list(zip(bounds, bounds[1:]))
+
+def find_bad_row(chunk_df, first_row: int = 0):
+    """Describes the first row whose numeric or timestamp fields don't parse, or returns None."""
+    checks = {
+        "user_id": lambda col: pd.to_numeric(col, errors="coerce"),
+        "product_id": lambda col: pd.to_numeric(col, errors="coerce"),
+        "transaction_amount": lambda col: pd.to_numeric(col, errors="coerce"),
+        "timestamp": lambda col: pd.to_datetime(col, format="mixed", errors="coerce"),
+    }
+    for col, parse in checks.items():
+        if col not in chunk_df:
+            continue
+        bad = parse(chunk_df[col]).isna() & chunk_df[col].notna()
+        if bad.any():
+            pos = int(bad.to_numpy().argmax())
+            return f"Row {first_row + pos}: invalid {col} value {chunk_df[col].iloc[pos]!r}."
+    return None
+
+def read_csv_block(block: bytes, columns, parser: str = "pandas", first_row: int = 0):
+    if parser == "pandas":
+        return pd.read_csv(io.BytesIO(block), header=None, names=columns)
+
+    dtypes = {col: dtype for col, dtype in TYPED_DTYPES.items() if col in columns}
+    kwargs = {"dtype": dtypes}
+    if parser == "pyarrow":
+        # Let Arrow parse ISO timestamps natively; anything else comes back as strings for parse_timestamps
+        del dtypes["timestamp"]
+        kwargs["engine"] = "pyarrow"
+
+    try:
+        return pd.read_csv(io.BytesIO(block), header=None, names=columns, **kwargs)
+    except (ValueError, TypeError) as e:
+        # Re-read as plain strings only to point at the offending row
+        untyped_df = pd.read_csv(io.BytesIO(block), header=None, names=columns, dtype=str)
+        raise ValueError(find_bad_row(untyped_df, first_row) or str(e)) from e
+
+def iter_csv_chunks(file_path: str, columns, start: int, end: Optional[int] = None, chunk_size: Optional[int] = None,
+                    parser: str = "pandas", first_row: int = 0):
+    """
+    Yields (DataFrame, offset after it) for chunks of up to chunk_size rows parsed from the lines in [start, end).
+    Offsets are positions in the uncompressed stream; end=None reads to EOF. Rows are numbered from first_row.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    end = end if end is not None else float("inf")
+    with open_csv_stream(file_path) as f:
+        seek_stream(f, start)
+        pos = start
+        row_num = first_row
+        while pos < end:
+            lines = []
+            while len(lines) < chunk_size and pos < end:
+                line = f.readline()
+                if not line:
+                    end = pos
+                    break
+                pos += len(line)
+                lines.append(line)
+            if not lines:
+                break
+
+            chunk_df = read_csv_block(b"".join(lines), columns, parser, row_num)
+            chunk_df.index = pd.RangeIndex(row_num, row_num + len(chunk_df))
+            row_num += len(chunk_df)
+            yield chunk_df, pos
+
+def _columnar_groups(file_path: str):
+    """Yields (row count, reader) per Parquet row group / Arrow record batch, so skipped groups are never read."""
+    if file_path.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(file_path)
+        for i in range(parquet_file.num_row_groups):
+            yield parquet_file.metadata.row_group(i).num_rows, partial(parquet_file.read_row_group, i, columns=COLUMNS)
+    else:
+        with pa.memory_map(file_path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i) # Zero-copy view into the memory map
+                yield batch.num_rows, partial(batch.select, COLUMNS)
 
-            for chunk_df in pd.read_csv(file_path, chunksize=CHUNK_SIZE):
-                required_cols = {"transaction_id", "user_id", "product_id", "timestamp", "transaction_amount"}
-                if not required_cols.issubset(chunk_df.columns):
-                    raise ValueError("CSV missing required columns.")
-
-                chunk_df['timestamp'] = pd.to_datetime(chunk_df['timestamp'], format='mixed')
-                chunk_df['transaction_amount'] = pd.to_numeric(chunk_df['transaction_amount'])
-                
-                chunk_df.to_sql('transactions', con=connection, if_exists='append', index=False, method=insert_on_conflict_nothing) 
-                total_rows += len(chunk_df)
-                
-            return total_rows
-        except Exception as e:
-            raise Exception(f"CSV processing failed: {e}")
+def iter_columnar_chunks(file_path: str, skip_rows: int = 0, chunk_size: Optional[int] = None):
+    """Yields already-typed DataFrames of up to chunk_size rows, row group by row group, after the first skip_rows."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    for num_rows, read_group in _columnar_groups(file_path):
+        if skip_rows >= num_rows:
+            skip_rows -= num_rows
+            continue
+        group = read_group()
+        for offset in range(skip_rows, num_rows, chunk_size):
+            yield group.slice(offset, chunk_size).to_pandas()
+        skip_rows = 0
+
+def detect_timestamp_format(values):
+    """Picks one timestamp format for the whole file from a sample: ISO 8601 if it fits, else pandas' guess."""
+    sample = values.dropna().astype(str).head(100)
+    if sample.empty:
+        return None
+    try:
+        pd.to_datetime(sample, format="ISO8601")
+        return "ISO8601"
+    except (ValueError, TypeError):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # pandas warns when the guess is day-first
+            return guess_datetime_format(sample.iloc[0])
+
+def parse_timestamps(values, timestamp_format: Optional[str] = None):
+    if timestamp_format:
+        try:
+            return pd.to_datetime(values, format=timestamp_format) # Vectorized fixed-format parse
+        except (ValueError, TypeError):
+            pass # Some rows drifted from the detected format; fall back to per-element parsing for this chunk
+    try:
+        return pd.to_datetime(values, format='mixed')
+    except (ValueError, TypeError) as e:
+        raise ValueError(find_bad_row(values.to_frame(), values.index[0]) or str(e)) from e
+
+def prepare_chunk(chunk_df, loader: str, timestamp_format: Optional[str] = None):
+    # Columnar formats (and the pyarrow parser, for ISO input) arrive typed, only text needs parsing
+    if not pd.api.types.is_datetime64_any_dtype(chunk_df['timestamp']):
+        chunk_df['timestamp'] = parse_timestamps(chunk_df['timestamp'], timestamp_format)
+    if not pd.api.types.is_numeric_dtype(chunk_df['transaction_amount']):
+        chunk_df['transaction_amount'] = pd.to_numeric(chunk_df['transaction_amount'])
+
+    if loader == "copy":
+        # COPY's text format won't accept "123.0" for an INTEGER column
+        for col in ("user_id", "product_id"):
+            if pd.api.types.is_float_dtype(chunk_df[col]):
+                chunk_df[col] = chunk_df[col].astype("Int64")
+    return chunk_df
+
+def read_checkpoint(connection, file_path: str, start: int, end: int, file_size: int):
+    """
+    Returns the manifest row for this range, or a fresh one if the file is new or has changed since.
+    Ranges that run to EOF are recorded with the on-disk file size as their end.
+    """
+    manifest = IngestionManifest.__table__
+    row = connection.execute(
+        select(manifest).where(manifest.c.file_path == file_path, manifest.c.range_start == start)
+    ).mappings().first()
+
+    if row and row["range_end"] == end and row["file_size"] == file_size:
+        return {key: value for key, value in row.items() if key != "updated_at"}
+    return {"file_path": file_path, "range_start": start, "range_end": end, "file_size": file_size,
+            "byte_offset": start, "chunk_index": 0, "rows_read": 0, "rows_inserted": 0, "completed": False}
+
+def save_checkpoint(connection, checkpoint):
+    manifest = IngestionManifest.__table__
+    stmt = insert(manifest).values(**checkpoint, updated_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[manifest.c.file_path, manifest.c.range_start],
+        set_={col: stmt.excluded[col] for col in checkpoint if col not in ("file_path", "range_start")} | {"updated_at": func.now()},
+    )
+    connection.execute(stmt)
+
+def load_byte_range(connection, file_path: str, columns, start: int, end: Optional[int], loader: str,
+                    parser: str = "pandas", chunk_size: Optional[int] = None, rollups: bool = True):
+    """
+    Parses and loads one byte range, committing each chunk together with its manifest checkpoint.
+    A rerun over the same range resumes from the last committed offset. Returns (rows read, rows inserted).
+    Columnar files are a single range and resume from the number of rows already committed.
+    With rollups=False the chunks leave the rollups alone, and the caller rebuilds them afterwards.
+    """
+    with connection.begin():
+        file_size = os.path.getsize(file_path)
+        checkpoint = read_checkpoint(connection, file_path, start, end if end is not None else file_size, file_size)
+        if loader == "copy":
+            connection.execute(STAGING_TABLE_SQL)
+
+    if checkpoint["completed"]:
+        print(f"{file_path} from byte {start} already ingested, skipping.")
+        return checkpoint["rows_read"], checkpoint["rows_inserted"]
+    if checkpoint["chunk_index"] > 0:
+        print(f"Resuming {file_path} after chunk {checkpoint['chunk_index']} ({checkpoint['rows_read']} rows already committed).")
+
+    if is_columnar(file_path):
+        chunks = ((chunk_df, start) for chunk_df in iter_columnar_chunks(file_path, checkpoint["rows_read"], chunk_size))
+    else:
+        chunks = iter_csv_chunks(file_path, columns, checkpoint["byte_offset"], end, chunk_size, parser, checkpoint["rows_read"])
+
+    timestamp_format = None
+    parse_start = time.perf_counter() # Reading the next chunk happens inside the iterator, so it's timed from here
+    for chunk_df, next_offset in chunks:
+        if parser != "pandas" and timestamp_format is None:
+            timestamp_format = detect_timestamp_format(chunk_df["timestamp"])
+        chunk_df = prepare_chunk(chunk_df, loader, timestamp_format)
+        insert_start = time.perf_counter()
+        with connection.begin():
+            # Own transaction, so the partition's locks aren't held while the chunk loads
+            ensure_partitions_for_timestamps(connection, chunk_df["timestamp"])
+        with connection.begin():
+            if loader == "copy":
+                inserted = copy_chunk_to_db(chunk_df, connection)
+            else:
+                inserted = insert_chunk_to_db(chunk_df, connection)
+            # Same transaction as the rows and the checkpoint, so a resumed run never double counts
+            if rollups:
+                apply_inserted_rows(connection, inserted)
+
+            checkpoint["byte_offset"] = next_offset
+            checkpoint["chunk_index"] += 1
+            checkpoint["rows_read"] += len(chunk_df)
+            checkpoint["rows_inserted"] += len(inserted)
+            save_checkpoint(connection, checkpoint)
+        observe_chunk(loader, len(chunk_df), len(inserted), insert_start - parse_start, time.perf_counter() - insert_start)
+        parse_start = time.perf_counter()
+
+    with connection.begin():
+        checkpoint["completed"] = True
+        save_checkpoint(connection, checkpoint)
+
+    return checkpoint["rows_read"], checkpoint["rows_inserted"]
+
+# Each pool process keeps one engine (and so one pooled connection) for all of its ranges
+_worker_engine = None
+
+def _init_range_worker(database_url: str):
+    global _worker_engine
+    _worker_engine = instrument_engine(create_engine(database_url, pool_size=1, max_overflow=0), "ingest")
+
+def _load_range_in_worker(file_path: str, columns, start: int, end: int, loader: str, parser: str, chunk_size: Optional[int],
+                          rollups: bool):
+    with _worker_engine.connect() as connection, writer_slot(connection):
+        return load_byte_range(connection, file_path, columns, start, end, loader, parser, chunk_size, rollups)
+
+def load_csv_in_parallel(file_path: str, database_url: str, columns, data_start: int, loader: str, workers: int,
+                         parser: str = "pandas", chunk_size: Optional[int] = None, rollups: bool = True):
+    ranges = split_byte_ranges(file_path, data_start, workers)
+    # spawn, not fork: the parent is running inside Prefect with live threads and connections
+    ctx = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)) or 1, mp_context=ctx,
+                             initializer=_init_range_worker, initargs=(database_url,)) as pool:
+        futures = [
+            pool.submit(_load_range_in_worker, file_path, columns, start, end, loader, parser, chunk_size, rollups)
+            for start, end in ranges
+        ]
+        results = [future.result() for future in futures]
+
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+@task(retries=3, retry_delay_seconds=10)
+def process_csv_to_db(file_path: str, database_url: str, loader: str = "insert", workers: Optional[int] = None,
+                      parser: str = "pandas", chunk_size: Optional[int] = None, rollups: bool = True):
+    if loader not in LOADERS:
+        raise ValueError(f"Unknown loader '{loader}'. Choose one of: {', '.join(LOADERS)}.")
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser '{parser}'. Choose one of: {', '.join(PARSERS)}.")
+    workers = workers or settings.INGEST_WORKERS
+
+    try:
+        start = time.perf_counter()
+        if is_columnar(file_path):
+            columns, data_start = read_columnar_columns(file_path), 0
+        else:
+            columns, data_start = read_csv_header(file_path)
+
+        if workers > 1 and (is_compressed(file_path) or is_columnar(file_path)):
+            # Only plain CSVs can be split into byte ranges without decoding them first
+            print(f"{file_path} can't be split into byte ranges, ingesting it with a single worker.")
+            workers = 1
+
+        if workers > 1:
+            # Each range checkpoints on its own; ON CONFLICT still guarantees one row per transaction_id
+            total_rows, inserted_rows = load_csv_in_parallel(
+                file_path, database_url, columns, data_start, loader, workers, parser, chunk_size, rollups
+            )
+        else:
+            # Long-lived per process, so consecutive runs reuse the pool
+            engine = get_cached_engine(database_url)
+            with engine.connect() as connection, writer_slot(connection):
+                total_rows, inserted_rows = load_byte_range(
+                    connection, file_path, columns, data_start, None, loader, parser, chunk_size, rollups
+                )
+
+        INGEST_ROWS_PER_SECOND.labels(loader).set(total_rows / (time.perf_counter() - start))
+        print(f"Loaded {file_path} via '{loader}' with the '{parser}' parser ({workers} worker(s)): {total_rows} rows read, "
+              f"{inserted_rows} inserted, {total_rows - inserted_rows} skipped as duplicates.")
+        return total_rows
+    except Exception as e:
+        raise Exception(f"CSV processing failed: {e}")
+
+def set_upload_status(database_url: str, upload_id: Optional[str], status: str):
+    if upload_id:
+        with get_cached_engine(database_url).begin() as connection:
+            connection.execute(SET_UPLOAD_STATUS_SQL, {"file_id": upload_id, "status": status})
+
+def load_in_bulk(file_path: str, database_url: str, **options):
+    """
+    process_csv_to_db with the secondary indexes deferred. The per-chunk rollup update looks up each new row's
+    neighbours through idx_user_timestamp, a scan of every partition per row without it, so the chunks skip it
+    and the rollups are rebuilt in one pass once the indexes are back (even if the load failed half way).
+    """
+    loading = False
+    try:
+        with deferred_indexes(database_url):
+            loading = True
+            process_csv_to_db(file_path, database_url, rollups=False, **options)
+    finally:
+        if loading:
+            with get_cached_engine(database_url).begin() as connection:
+                backfill_rollups(connection)
 
 @flow(name="CSV Ingestion Pipeline")
-def run_csv_pipeline(file_path: str, database_url: str):
-    process_csv_to_db(file_path, database_url)
+def run_csv_pipeline(file_path: str, database_url: str, loader: str = "insert", workers: Optional[int] = None,
+                     parser: str = "pandas", chunk_size: Optional[int] = None, bulk: bool = False,
+                     upload_id: Optional[str] = None):
+    """
+    `bulk` drops transactions' secondary indexes for the load and rebuilds them, then the rollups, afterwards
+    (very large initial loads).
+    `upload_id` is the uploaded_files entry to mark loaded or failed, so a failed upload can be uploaded again.
+    """
+    try:
+        if bulk:
+            load_in_bulk(file_path, database_url, loader=loader, workers=workers, parser=parser, chunk_size=chunk_size)
+        else:
+            process_csv_to_db(file_path, database_url, loader=loader, workers=workers, parser=parser, chunk_size=chunk_size)
+    except Exception:
+        set_upload_status(database_url, upload_id, "failed")
+        raise
+    set_upload_status(database_url, upload_id, "loaded")
     if os.path.exists(file_path):
         os.remove(file_path)
-
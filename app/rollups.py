@@ -0,0 +1,178 @@
+# app/rollups.py
+import argparse
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+
+# Folds a batch of freshly inserted transactions (passed as arrays) into the daily rollup.
+# ORDER BY keeps the upsert's row locks in a consistent order across parallel ingestion workers.
+APPLY_DAILY_SPEND_SQL = text("""
+    INSERT INTO user_daily_spend (user_id, spend_date, total_amount, txn_count, min_amount, max_amount)
+    SELECT
+        user_id,
+        DATE(ts),
+        COALESCE(SUM(amount), 0),
+        COUNT(amount),
+        MIN(amount),
+        MAX(amount)
+    FROM unnest(CAST(:user_ids AS INTEGER[]), CAST(:timestamps AS TIMESTAMP[]), CAST(:amounts AS NUMERIC[])) AS t(user_id, ts, amount)
+    WHERE user_id IS NOT NULL AND ts IS NOT NULL
+    GROUP BY user_id, DATE(ts)
+    ORDER BY user_id, DATE(ts)
+    ON CONFLICT (user_id, spend_date) DO UPDATE SET
+        total_amount = user_daily_spend.total_amount + EXCLUDED.total_amount,
+        txn_count = user_daily_spend.txn_count + EXCLUDED.txn_count,
+        min_amount = LEAST(user_daily_spend.min_amount, EXCLUDED.min_amount),
+        max_amount = GREATEST(user_daily_spend.max_amount, EXCLUDED.max_amount)
+""")
+
+BACKFILL_DAILY_SPEND_SQL = text("""
+    INSERT INTO user_daily_spend (user_id, spend_date, total_amount, txn_count, min_amount, max_amount)
+    SELECT
+        user_id,
+        DATE(timestamp),
+        COALESCE(SUM(amount_cents) * 0.01, 0),
+        COUNT(amount_cents),
+        MIN(amount_cents) * 0.01,
+        MAX(amount_cents) * 0.01
+    FROM transactions
+    WHERE user_id IS NOT NULL AND timestamp IS NOT NULL
+    GROUP BY user_id, DATE(timestamp)
+""")
+
+# Same for the lifetime aggregates. The shortest gap can only shrink, and only next to a new row,
+# so each new row looks up its nearest neighbours through idx_user_timestamp instead of rescanning the user.
+# That lookup can't see rows another writer hasn't committed yet: see LOCK_USERS_SQL.
+APPLY_USER_AGGREGATES_SQL = text("""
+    WITH new_rows AS (
+        SELECT *
+        FROM unnest(
+            CAST(:transaction_ids AS UUID[]), CAST(:user_ids AS INTEGER[]),
+            CAST(:timestamps AS TIMESTAMP[]), CAST(:amounts AS NUMERIC[])
+        ) AS t(transaction_id, user_id, ts, amount)
+        WHERE user_id IS NOT NULL
+    ),
+    gaps AS (
+        SELECT n.user_id, MIN(LEAST(n.ts - prev.timestamp, next.timestamp - n.ts)) as min_gap
+        FROM new_rows n
+        LEFT JOIN LATERAL (
+            SELECT t.timestamp FROM transactions t
+            WHERE t.user_id = n.user_id AND t.timestamp <= n.ts AND t.transaction_id <> n.transaction_id
+            ORDER BY t.timestamp DESC LIMIT 1
+        ) prev ON true
+        LEFT JOIN LATERAL (
+            SELECT t.timestamp FROM transactions t
+            WHERE t.user_id = n.user_id AND t.timestamp >= n.ts AND t.transaction_id <> n.transaction_id
+            ORDER BY t.timestamp LIMIT 1
+        ) next ON true
+        WHERE n.ts IS NOT NULL
+        GROUP BY n.user_id
+    )
+    INSERT INTO user_aggregates (user_id, txn_count, total_spend, sum_squares, max_amount, min_gap)
+    SELECT
+        n.user_id,
+        COUNT(n.amount),
+        COALESCE(SUM(n.amount), 0),
+        COALESCE(SUM(n.amount * n.amount), 0),
+        MAX(n.amount),
+        MIN(g.min_gap)
+    FROM new_rows n
+    LEFT JOIN gaps g ON g.user_id = n.user_id
+    GROUP BY n.user_id
+    ORDER BY n.user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        txn_count = user_aggregates.txn_count + EXCLUDED.txn_count,
+        total_spend = user_aggregates.total_spend + EXCLUDED.total_spend,
+        sum_squares = user_aggregates.sum_squares + EXCLUDED.sum_squares,
+        max_amount = GREATEST(user_aggregates.max_amount, EXCLUDED.max_amount),
+        min_gap = LEAST(user_aggregates.min_gap, EXCLUDED.min_gap)
+""")
+
+# Writers updating the same users take turns from here until they commit. Under READ COMMITTED each statement gets
+# a fresh snapshot, so whoever applies second sees the first one's rows, and the gap between them is counted.
+# Users share USER_LOCK_BUCKETS transaction-level advisory locks, which bounds the lock table however many users
+# a batch touches. Taken in bucket order, like the upserts, so two writers can't deadlock on them.
+USER_LOCK_BUCKETS = 64
+LOCK_USERS_SQL = text("""
+    SELECT pg_advisory_xact_lock(hashtext('user_aggregates'), bucket)
+    FROM (
+        SELECT DISTINCT user_id % :buckets AS bucket
+        FROM unnest(CAST(:user_ids AS INTEGER[])) AS user_id
+        WHERE user_id IS NOT NULL
+        ORDER BY bucket
+    ) b
+""")
+
+BACKFILL_USER_AGGREGATES_SQL = text("""
+    INSERT INTO user_aggregates (user_id, txn_count, total_spend, sum_squares, max_amount, min_gap)
+    SELECT
+        user_id,
+        COUNT(amount_cents),
+        COALESCE(SUM(amount_cents) * 0.01, 0),
+        COALESCE(SUM(amount_cents::numeric * amount_cents) * 0.0001, 0),
+        MAX(amount_cents) * 0.01,
+        MIN(gap)
+    FROM (
+        SELECT
+            user_id,
+            amount_cents,
+            timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp) as gap
+        FROM transactions
+        WHERE user_id IS NOT NULL
+    ) t
+    GROUP BY user_id
+""")
+
+# Invalidates cached responses for the touched users, and for cross-user results ("global"), at commit.
+# ORDER BY scope, like the rollups, keeps row lock order consistent across parallel workers.
+BUMP_DATA_VERSIONS_SQL = text("""
+    INSERT INTO data_versions (scope, version)
+    SELECT DISTINCT scope, 1
+    FROM unnest(CAST(:scopes AS TEXT[])) AS scope
+    ORDER BY scope
+    ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1
+""")
+
+BUMP_ALL_DATA_VERSIONS_SQL = text("""
+    INSERT INTO data_versions (scope, version)
+    SELECT scope, 1
+    FROM (SELECT 'user:' || user_id as scope FROM user_aggregates UNION ALL SELECT 'global') s
+    ORDER BY scope
+    ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1
+""")
+
+def apply_inserted_rows(connection, inserted_rows):
+    """
+    Updates the rollups, and the data versions cached responses are keyed on, with rows that were actually inserted
+    (skipped duplicates never reach here).
+    Rows are (transaction_id, user_id, timestamp, transaction_amount), as returned by the loaders.
+    """
+    if not inserted_rows:
+        return
+    transaction_ids, user_ids, timestamps, amounts = (list(col) for col in zip(*inserted_rows))
+    connection.execute(LOCK_USERS_SQL, {"user_ids": user_ids, "buckets": USER_LOCK_BUCKETS})
+    params = {"user_ids": user_ids, "timestamps": timestamps, "amounts": amounts}
+    connection.execute(APPLY_DAILY_SPEND_SQL, params)
+    connection.execute(APPLY_USER_AGGREGATES_SQL, params | {"transaction_ids": [str(tid) for tid in transaction_ids]})
+    scopes = ["global"] + [f"user:{user_id}" for user_id in set(user_ids) if user_id is not None]
+    connection.execute(BUMP_DATA_VERSIONS_SQL, {"scopes": scopes})
+
+def backfill_rollups(connection):
+    """Rebuilds the rollups from scratch. Blocks writers to transactions while it runs, readers are unaffected."""
+    connection.execute(text("LOCK TABLE transactions IN SHARE MODE"))
+    connection.execute(text("DELETE FROM user_daily_spend"))
+    connection.execute(BACKFILL_DAILY_SPEND_SQL)
+    connection.execute(text("DELETE FROM user_aggregates"))
+    connection.execute(BACKFILL_USER_AGGREGATES_SQL)
+    connection.execute(BUMP_ALL_DATA_VERSIONS_SQL)
+
+if __name__ == "__main__":
+    # python -m app.rollups backfill
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup tables.")
+    parser.add_argument("command", choices=["backfill"])
+    args = parser.parse_args()
+
+    engine = create_engine(settings.get_database_url())
+    with engine.begin() as connection:
+        backfill_rollups(connection)
+    print("Rollups rebuilt from transactions.")
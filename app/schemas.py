@@ -1,6 +1,10 @@
 # app/schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime, date
+from typing import Optional
+import uuid
+
+from .config import settings
 
 class TransactionBase(BaseModel):
     transaction_id: str
@@ -15,8 +19,67 @@ class SummaryStats(BaseModel):
     min_transaction: float
     mean_transaction: float
 
+class SummaryBucket(BaseModel):
+    """SummaryStats for one week or month (starting on bucket_start)."""
+    bucket_start: date
+    txn_count: int
+    max_transaction: float
+    min_transaction: float
+    mean_transaction: float
+
 class SpendTrendItem(BaseModel):
     spend_date: date
     daily_total: float
     rolling_7d_avg: float
 
+
+class SpendTrendColumns(BaseModel):
+    """The spend trend as parallel arrays, one entry per day (layout=columns)."""
+    dates: list[date]
+    totals: list[float]
+    avgs: list[float]
+
+class BatchUsers(BaseModel):
+    """Either a list of user_ids or an inclusive user_id_from..user_id_to range."""
+    user_ids: Optional[list[int]] = None
+    user_id_from: Optional[int] = None
+    user_id_to: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_users(self):
+        if self.user_ids is not None:
+            if self.user_id_from is not None or self.user_id_to is not None:
+                raise ValueError("Pass either user_ids or a user_id_from/user_id_to range, not both.")
+            count = len(self.user_ids)
+        elif self.user_id_from is not None and self.user_id_to is not None:
+            count = self.user_id_to - self.user_id_from + 1
+        else:
+            raise ValueError("Pass user_ids or both user_id_from and user_id_to.")
+        if not 0 < count <= settings.BATCH_MAX_USERS:
+            raise ValueError(f"A batch must cover between 1 and {settings.BATCH_MAX_USERS} users.")
+        return self
+
+class BatchSummaryQuery(BatchUsers):
+    start_date: date
+    end_date: date
+
+class BatchSpendTrendQuery(BatchUsers):
+    start_date: Optional[date] = None # Omitted = the user's whole history, like /analytics/spend-trend
+    end_date: Optional[date] = None
+
+class UserSpendTrend(BaseModel):
+    user_id: int
+    trend: list[SpendTrendItem]
+
+class InboxFileStatus(BaseModel):
+    file_id: uuid.UUID
+    filename: str
+    size_bytes: int
+    sha256: Optional[str] = None
+    status: str # pending, processing, loaded or failed
+    batch_id: Optional[uuid.UUID] = None
+    rows_read: Optional[int] = None
+    rows_inserted: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
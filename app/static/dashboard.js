@@ -0,0 +1,40 @@
+// app/static/dashboard.js
+// Draws the dashboard in the browser from /dashboard/{user_id}/data, so the server never builds a Plotly figure.
+// The browser revalidates the data with If-None-Match and gets a 304 until the user's data changes.
+(async function () {
+    const container = document.getElementById("dashboard");
+    const userId = container.dataset.userId;
+    const response = await fetch(container.dataset.src, { cache: "no-cache" });
+
+    if (!response.ok) {
+        container.innerHTML = `<h2>No data available to plot for User ${userId}</h2>`;
+        return;
+    }
+    const data = await response.json();
+
+    Plotly.newPlot(container, [
+        {
+            type: "bar",
+            x: data.dates,
+            y: data.totals,
+            name: "Daily Spend",
+            opacity: 0.6,
+            marker: { color: "lightblue" },
+        },
+        {
+            type: "scatter",
+            mode: "lines",
+            x: data.dates,
+            y: data.avgs,
+            name: "7-Day Moving Average",
+            line: { color: "darkblue", width: 3 },
+        },
+    ], {
+        title: { text: `Transaction Analysis: User ${userId}` },
+        xaxis: { title: { text: "Date" }, gridcolor: "#ebf0f8" },
+        yaxis: { title: { text: "Amount ($)" }, gridcolor: "#ebf0f8" },
+        plot_bgcolor: "white",
+        hovermode: "x unified",
+        legend: { orientation: "h", yanchor: "bottom", y: 1.02, xanchor: "right", x: 1 },
+    });
+})();
@@ -0,0 +1,223 @@
+# app/uploads.py
+import hashlib
+import os
+from typing import Optional
+import anyio
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import text
+
+from .config import settings
+
+# /upload reads the multipart body off the socket itself: the file part goes straight to its final path as it arrives,
+# with the size cap and the hashes applied per chunk, instead of Starlette spooling the whole body first.
+UPLOAD_FIELD = "file"
+MULTIPART_OVERHEAD_BYTES = 64 * 1024 # Allowed on top of MAX_UPLOAD_BYTES for the other fields and the framing
+
+def too_large(max_bytes: int):
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes} byte upload limit.")
+
+def head_digest(size: int, head: bytes):
+    """The sampled hash: sha256 of the file's size plus its first UPLOAD_SAMPLE_BYTES."""
+    return hashlib.sha256(str(size).encode() + head).hexdigest()
+
+def _write_chunk(buffer, checksum, chunk: bytes):
+    # hashlib releases the GIL for large buffers, so hashing in the worker thread is free for the event loop
+    checksum.update(chunk)
+    buffer.write(chunk)
+
+class MultipartEvents:
+    """python-multipart callbacks, collected so the (async) upload loop can act on them after each parsed chunk."""
+    def __init__(self):
+        self.events = []
+        self.headers = {}
+        self.field = self.value = b""
+        self.offset = 0 # Body bytes fed to the parser before the current chunk
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.headers.clear,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": lambda: self.events.append(("part", dict(self.headers), None)),
+            "on_part_data": self.on_part_data,
+            "on_part_end": lambda: self.events.append(("part_end", None, None)),
+        }
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.field.lower()] = self.value
+        self.field = self.value = b""
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        # Body offset of the slice, when it comes from the chunk being parsed (not from the boundary look-behind)
+        self.events.append(("data", data[start:end], self.offset + start if data is self.chunk else None))
+
+    def feed(self, parser, chunk: bytes):
+        self.chunk = chunk
+        parser.write(chunk)
+        self.offset += len(chunk)
+        events, self.events = self.events, []
+        return events
+
+def part_filename(headers: dict):
+    """The filename of the form's file field, or None for any other part."""
+    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+    if options.get(b"name", b"").decode() != UPLOAD_FIELD or b"filename" not in options:
+        return None
+    return os.path.basename(options[b"filename"].decode("utf-8", "replace"))
+
+async def receive_upload(request: Request, open_path, find_duplicate=None, max_bytes: Optional[int] = None,
+                         chunk_size: Optional[int] = None, sample_bytes: Optional[int] = None):
+    """
+    Streams the request's multipart "file" field to disk without blocking the event loop or spooling the body.
+    open_path(filename) returns where to write it, or raises to refuse the file before anything is written.
+    find_duplicate(size, sample_sha256) is awaited once the file's first sample_bytes are in: if it returns an earlier
+    upload's file_id, nothing more is written or hashed and the rest of the body is only drained.
+    Returns {filename, file_path, size, sha256, sample_sha256, duplicate_of}; sha256 is None for a sampled duplicate.
+    Raises 413 (removing the partial file) as soon as the file is known to exceed max_bytes.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    sample_bytes = sample_bytes or settings.UPLOAD_SAMPLE_BYTES
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail=f"Expected a multipart/form-data body with a '{UPLOAD_FIELD}' file.")
+    boundary = options[b"boundary"]
+    content_length = request.headers.get("content-length")
+    body_bytes = int(content_length) if content_length and content_length.isdigit() else None
+
+    events = MultipartEvents()
+    parser = MultipartParser(boundary, events.callbacks())
+    upload = None # The file part, once its headers are in
+    in_file = False
+    buffer = None
+    pending = bytearray() # Written in chunk_size steps, so each thread hop moves a useful amount
+    checksum = hashlib.sha256()
+
+    async def flush():
+        if pending and buffer:
+            await anyio.to_thread.run_sync(_write_chunk, buffer, checksum, bytes(pending))
+        pending.clear()
+
+    async def close(remove: bool = False):
+        nonlocal buffer
+        if buffer:
+            await anyio.to_thread.run_sync(buffer.close)
+            buffer = None
+        if remove and upload and os.path.exists(upload["file_path"]):
+            await anyio.to_thread.run_sync(os.remove, upload["file_path"])
+
+    async def check_head(size: int):
+        """The sampled lookup: a duplicate stops the write (and removes what was written) right here."""
+        upload["sample_sha256"] = head_digest(size, upload["head"])
+        if find_duplicate and upload["duplicate_of"] is None:
+            upload["duplicate_of"] = await find_duplicate(size, upload["sample_sha256"])
+            if upload["duplicate_of"]:
+                pending.clear()
+                await close(remove=True)
+
+    try:
+        async for chunk in request.stream():
+            for kind, data, offset in events.feed(parser, chunk):
+                if kind == "part":
+                    filename = part_filename(data)
+                    in_file = filename is not None and upload is None
+                    if in_file:
+                        upload = {"filename": filename, "file_path": open_path(filename), "size": 0, "head": b"",
+                                  "expected_size": None, "sha256": None, "sample_sha256": None, "duplicate_of": None}
+                        buffer = await anyio.to_thread.run_sync(open, upload["file_path"], "wb")
+                elif kind == "data" and in_file:
+                    if upload["size"] == 0 and body_bytes is not None and offset is not None:
+                        # Everything after the file is the closing delimiter (when the file is the last field)
+                        upload["expected_size"] = body_bytes - offset - len(b"\r\n--" + boundary + b"--\r\n")
+                        if upload["expected_size"] > max_bytes:
+                            raise too_large(max_bytes)
+                    upload["size"] += len(data)
+                    if upload["size"] > max_bytes:
+                        raise too_large(max_bytes)
+                    if upload["duplicate_of"]:
+                        continue
+                    if len(upload["head"]) < sample_bytes:
+                        upload["head"] += data[:sample_bytes - len(upload["head"])]
+                        if len(upload["head"]) == sample_bytes and upload["expected_size"]:
+                            await check_head(upload["expected_size"])
+                            if upload["duplicate_of"]:
+                                continue
+                    pending.extend(data)
+                    if len(pending) >= chunk_size:
+                        await flush()
+                elif kind == "part_end" and in_file:
+                    in_file = False
+                    if not upload["duplicate_of"]:
+                        await flush()
+                        await close()
+                        upload["sha256"] = checksum.hexdigest()
+                        # Smaller than the sample, or its size couldn't be told in advance: the lookup runs on the actual size
+                        if upload["expected_size"] != upload["size"] or len(upload["head"]) < sample_bytes:
+                            await check_head(upload["size"])
+            if events.offset > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                raise too_large(max_bytes)
+        parser.finalize()
+    except BaseException:
+        await close(remove=True)
+        raise
+
+    if upload is None or in_file:
+        await close(remove=True)
+        raise HTTPException(status_code=400, detail=f"No complete '{UPLOAD_FIELD}' file in the request.")
+    del upload["head"], upload["expected_size"]
+    return upload
+
+# Only uploads that loaded, or may still be loading, count as the original: a failed or stale one is ingested again
+FIND_SAMPLED_UPLOAD_SQL = text("""
+    SELECT file_id FROM uploaded_files
+    WHERE size_bytes = :size_bytes AND sample_sha256 = :sample_sha256
+    AND (status = 'loaded' OR (status = 'pending' AND created_at > now() - make_interval(secs => :stale_seconds)))
+    LIMIT 1
+""")
+
+RECORD_UPLOAD_SQL = text("""
+    INSERT INTO uploaded_files (sha256, sample_sha256, size_bytes, file_id, filename, status)
+    VALUES (:sha256, :sample_sha256, :size_bytes, :file_id, :filename, 'pending')
+    ON CONFLICT (sha256) DO UPDATE
+    SET file_id = EXCLUDED.file_id, filename = EXCLUDED.filename, status = 'pending', created_at = now()
+    WHERE uploaded_files.status = 'failed'
+    OR (uploaded_files.status = 'pending' AND uploaded_files.created_at <= now() - make_interval(secs => :stale_seconds))
+    RETURNING file_id
+""")
+
+# Uploads still waiting for (or in) their deployment-mode flow run; stale ones lost it and don't hold up new uploads
+PENDING_UPLOADS_SQL = text("""
+    SELECT COUNT(*) FROM uploaded_files
+    WHERE status = 'pending' AND created_at > now() - make_interval(secs => :stale_seconds)
+""")
+
+# Set by ingestion (run_csv_pipeline, the inbox consumer) once the upload's rows are committed or it gave up
+SET_UPLOAD_STATUS_SQL = text("UPDATE uploaded_files SET status = :status WHERE file_id = :file_id")
+
+async def pending_uploads(db):
+    return (await db.execute(PENDING_UPLOADS_SQL, {"stale_seconds": settings.UPLOAD_STALE_SECONDS})).scalar()
+
+async def find_sampled_upload(db, size_bytes: int, sample_sha256: str):
+    """file_id of an earlier upload with the same size and sampled hash, if any."""
+    params = {"size_bytes": size_bytes, "sample_sha256": sample_sha256, "stale_seconds": settings.UPLOAD_STALE_SECONDS}
+    return (await db.execute(FIND_SAMPLED_UPLOAD_SQL, params)).scalar()
+
+async def record_upload(db, sha256: str, sample_sha256: str, size_bytes: int, file_id, filename: str):
+    """
+    Adds the upload to the manifest as pending (in the caller's transaction). Returns the original upload's file_id
+    if this content was already uploaded, else None.
+    """
+    params = {"sha256": sha256, "sample_sha256": sample_sha256, "size_bytes": size_bytes,
+              "file_id": file_id, "filename": filename, "stale_seconds": settings.UPLOAD_STALE_SECONDS}
+    if (await db.execute(RECORD_UPLOAD_SQL, params)).scalar() is not None:
+        return None
+    return (await db.execute(text("SELECT file_id FROM uploaded_files WHERE sha256 = :sha256"), {"sha256": sha256})).scalar()
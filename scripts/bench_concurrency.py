@@ -0,0 +1,55 @@
+# scripts/bench_concurrency.py
+import asyncio
+import os
+import random
+import time
+import httpx
+import numpy as np
+
+# Requests/s and latency of the read endpoints with many concurrent clients.
+# Run against a live app (docker compose up) that already has data, ideally started with CACHE_BACKEND=none
+# so every request reaches the database, e.g. `CLIENTS=200 python scripts/bench_concurrency.py`.
+# Check out the commit before and after the async database layer to compare the two.
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+CLIENTS = int(os.getenv("CLIENTS", 200))
+DURATION = float(os.getenv("DURATION", 30)) # Seconds per endpoint
+MAX_USER_ID = int(os.getenv("MAX_USER_ID", 1000))
+
+ENDPOINTS = {
+    "summary": "/summary/{uid}?start_date=2024-01-01&end_date=2024-12-31",
+    "risk-profile": "/analytics/risk-profile/{uid}",
+    "spend-trend": "/analytics/spend-trend/{uid}",
+}
+
+async def client_loop(client: httpx.AsyncClient, path: str, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        url = path.format(uid=random.randint(1, MAX_USER_ID))  # nosec B311
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+async def measure(name: str, path: str):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=CLIENTS, max_keepalive_connections=CLIENTS)
+    async with httpx.AsyncClient(base_url=API_URL, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + DURATION
+        await asyncio.gather(*(client_loop(client, path, deadline, latencies, errors) for _ in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:<14} {len(latencies) / elapsed:8.1f} req/s  p50={p50:7.1f}ms  p95={p95:7.1f}ms  p99={p99:7.1f}ms  errors={len(errors)}")
+
+async def main():
+    print(f"{CLIENTS} concurrent clients, {DURATION:.0f}s per endpoint against {API_URL}")
+    for name, path in ENDPOINTS.items():
+        await measure(name, path)
+
+if __name__ == "__main__":
+    asyncio.run(main())
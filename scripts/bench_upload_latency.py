@@ -0,0 +1,64 @@
+# scripts/bench_upload_latency.py
+import os
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import requests
+
+# Measures read latency on the API while a large CSV is being uploaded.
+# Run against a live app (docker compose up), e.g. `python scripts/bench_upload_latency.py`
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+READ_PATH = os.getenv("READ_PATH", "/")
+NUM_ROWS = int(os.getenv("NUM_ROWS", 5_000_000)) # ~300 MB
+FILENAME = "bench_upload_file.csv"
+
+def generate_csv():
+    print(f"Generating {NUM_ROWS} rows of dummy data...")
+    pd.DataFrame({
+        'transaction_id': [str(uuid.uuid4()) for _ in range(NUM_ROWS)],
+        'user_id': np.random.randint(1, 1000, NUM_ROWS),
+        'product_id': np.random.randint(1, 500, NUM_ROWS),
+        'timestamp': pd.date_range(start='1/1/2024', periods=NUM_ROWS, freq='min'),
+        'transaction_amount': np.random.uniform(10, 1000, NUM_ROWS).round(2)
+    }).to_csv(FILENAME, index=False)
+    print(f"File generated: {os.path.getsize(FILENAME) / (1024 * 1024):.2f} MB")
+
+def sample_reads(stop: threading.Event, latencies: list):
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(API_URL + READ_PATH, timeout=60)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+def measure(label: str, seconds: float = None, during=None):
+    latencies = []
+    stop = threading.Event()
+    reader = threading.Thread(target=sample_reads, args=(stop, latencies))
+    reader.start()
+
+    if during:
+        during()
+    else:
+        time.sleep(seconds)
+    stop.set()
+    reader.join()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{label:<16} n={len(latencies):<6} p50={p50:7.2f}ms  p95={p95:7.2f}ms  p99={p99:7.2f}ms  max={max(latencies):7.2f}ms")
+
+def upload():
+    start = time.perf_counter()
+    with open(FILENAME, 'rb') as f:
+        response = requests.post(API_URL + "/upload", files={'file': (FILENAME, f, 'text/csv')}, timeout=600)
+    print(f"Upload finished with {response.status_code} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    generate_csv()
+    try:
+        measure("idle", seconds=5)
+        measure("during upload", during=upload)
+    finally:
+        os.remove(FILENAME)
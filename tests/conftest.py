@@ -8,11 +8,14 @@ os.environ["PREFECT_LOGGING_LEVEL"] = "ERROR"
 os.environ["UPLOAD_DIR"] = "./test_shared_data"
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
-from app.main import app, get_engine, get_db
-from app.database import Base
+from app.main import app, get_engine, get_db, get_cache, get_sessionmaker
+from app.cache import MemoryCache
+from app.database import Base, to_async_url
 
 # Specific test database name to avoid wiping dev data
 TEST_DATABASE_URL = os.getenv(
@@ -30,6 +33,10 @@ test_engine = create_engine(TEST_DATABASE_URL)
 # Create Testing Session
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
+# The API's async sessions. NullPool: TestClient's event loop changes between tests, pooled connections can't follow
+test_async_engine = create_async_engine(to_async_url(TEST_DATABASE_URL), poolclass=NullPool)
+TestAsyncSessionLocal = async_sessionmaker(bind=test_async_engine, autoflush=False, expire_on_commit=False)
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
     pass
@@ -54,14 +61,21 @@ def client(db_session):
     """
     Overrides the dependency injection to use our test database.
     """
-    def get_test_db_override():
-        yield db_session
+    # Endpoints read through their own async session, so data set up via db_session must be committed first
+    async def get_test_db_override():
+        async with TestAsyncSessionLocal() as session:
+            yield session
     
     def get_test_engine_override():
         yield test_engine
 
+    # Fresh cache per test: the tables (and so the data versions) are recreated for every test
+    test_cache = MemoryCache()
+
     app.dependency_overrides[get_db] = get_test_db_override
     app.dependency_overrides[get_engine] = get_test_engine_override
+    app.dependency_overrides[get_cache] = lambda: test_cache
+    app.dependency_overrides[get_sessionmaker] = lambda: TestAsyncSessionLocal
     
     # TestClient runs background tasks SYNCHRONOUSLY, which is great for testing.
     with TestClient(app) as c:
@@ -1,6 +1,12 @@
 # tests/test_api.py
 import io
+import os
+from datetime import date
 from unittest.mock import patch, AsyncMock
+import pytest
+from sqlalchemy import text
+
+from app.main import UPLOAD_DIR
 
 # --- Tests ---
 
@@ -25,6 +31,205 @@ def test_upload_csv_success(mock_run_deployment, client):
     assert "queued" in response.json()["message"]
     mock_run_deployment.assert_called_once()
 
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_csv_reports_size_and_checksum(mock_run_deployment, client, monkeypatch):
+    import hashlib
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 7) # force several chunks
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n" \
+                  b"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50"
+
+    response = client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["size_bytes"] == len(csv_content)
+    assert data["sha256"] == hashlib.sha256(csv_content).hexdigest()
+
+    saved_path = mock_run_deployment.call_args.kwargs["parameters"]["file_path"]
+    with open(saved_path, "rb") as f:
+        assert f.read() == csv_content
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_duplicate_upload_points_at_original(mock_run_deployment, client):
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n" \
+                  b"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50\n"
+
+    first = client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")}).json()
+    second = client.post("/upload", files={"file": ("copy.csv", io.BytesIO(csv_content), "text/csv")}).json()
+
+    assert second["duplicate_of"] == first["file_id"] == second["file_id"]
+    assert second["sha256"] == first["sha256"]
+    mock_run_deployment.assert_called_once() # The duplicate was never queued
+    assert not any(name.endswith("_copy.csv") for name in os.listdir(UPLOAD_DIR)) # Removed again
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_failed_ingestion_can_be_uploaded_again(mock_run_deployment, client, monkeypatch):
+    from app import processing
+    from tests.conftest import TEST_DATABASE_URL
+
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n" \
+                  b"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50\n"
+    def upload():
+        return client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")}).json()
+    def ingest(**options):
+        parameters = mock_run_deployment.call_args.kwargs["parameters"] | {"database_url": TEST_DATABASE_URL}
+        processing.run_csv_pipeline.fn(**parameters, **options)
+
+    load = processing.process_csv_to_db.fn # The task without Prefect's retries
+    def broken_load(*args, **kwargs):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(processing, "process_csv_to_db", broken_load)
+    first = upload()
+    assert upload()["duplicate_of"] == first["file_id"] # Still being ingested
+    with pytest.raises(RuntimeError):
+        ingest()
+
+    retry = upload()
+    assert "duplicate_of" not in retry and retry["file_id"] != first["file_id"]
+    monkeypatch.setattr(processing, "process_csv_to_db", load)
+    ingest()
+    assert upload()["duplicate_of"] == retry["file_id"]
+    assert client.get("/summary/1?start_date=2025-01-01&end_date=2025-01-31").json()["max_transaction"] == 100.50
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_whose_flow_run_never_started_can_be_uploaded_again(mock_run_deployment, client):
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+    def upload():
+        return client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")})
+
+    mock_run_deployment.side_effect = RuntimeError("Prefect is down")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    files_before = set(os.listdir(UPLOAD_DIR))
+    failed = upload()
+    assert failed.status_code == 503 and "Prefect is down" in failed.json()["detail"]
+    assert set(os.listdir(UPLOAD_DIR)) == files_before # Nothing will ingest it
+
+    # Marked failed, so it's neither a duplicate nor part of the backlog
+    mock_run_deployment.side_effect = None
+    retry = upload()
+    assert retry.status_code == 200 and "duplicate_of" not in retry.json()
+    assert retry.json()["queue_position"] == 1
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_backlog_counts_unfinished_flow_runs(mock_run_deployment, client, monkeypatch):
+    from app import processing
+    from app.config import settings
+    from tests.conftest import TEST_DATABASE_URL
+
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BACKLOG", 1)
+    def upload(n):
+        csv_content = f"transaction_id,user_id,product_id,timestamp,transaction_amount\n{n}\n".encode()
+        return client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")})
+
+    assert upload(1).status_code == 200
+    refused = upload(2)
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == str(settings.UPLOAD_RETRY_AFTER_SECONDS)
+    # Its run fails and leaves the file in UPLOAD_DIR, but it's no longer waiting
+    parameters = mock_run_deployment.call_args.kwargs["parameters"] | {"database_url": TEST_DATABASE_URL}
+    monkeypatch.setattr(processing, "process_csv_to_db", lambda *args, **kwargs: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        processing.run_csv_pipeline.fn(**parameters)
+    assert os.path.exists(parameters["file_path"])
+    assert upload(3).status_code == 200
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_stale_pending_upload_can_be_uploaded_again(mock_run_deployment, client, monkeypatch):
+    from app.config import settings
+
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+    def upload():
+        return client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content), "text/csv")}).json()
+
+    first = upload()
+    # Its flow run never reported back (a killed worker): once stale, the next upload takes it over
+    monkeypatch.setattr(settings, "UPLOAD_STALE_SECONDS", 0)
+    retry = upload()
+    assert "duplicate_of" not in retry and retry["file_id"] != first["file_id"]
+    assert mock_run_deployment.call_count == 2
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_sampled_check_skips_large_duplicates(mock_run_deployment, client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "UPLOAD_SAMPLE_BYTES", 64)
+    monkeypatch.setattr(settings, "UPLOAD_SAMPLED_DEDUPE_MIN_BYTES", 100)
+    header = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+    row = b"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50\n"
+    original = header + row * 5
+    # Same size, head and tail, different middle: only the sampled check calls it a duplicate
+    lookalike = header + row * 2 + row.replace(b"100.50", b"900.50") + row * 2
+
+    first = client.post("/upload", files={"file": ("big.csv", io.BytesIO(original), "text/csv")}).json()
+    second = client.post("/upload", files={"file": ("big.csv", io.BytesIO(lookalike), "text/csv")}).json()
+    assert second["duplicate_of"] == first["file_id"]
+    assert second["sha256"] is None # Never fully read
+
+    monkeypatch.setattr(settings, "UPLOAD_SAMPLED_DEDUPE_MIN_BYTES", None)
+    third = client.post("/upload", files={"file": ("big.csv", io.BytesIO(lookalike), "text/csv")}).json()
+    assert "duplicate_of" not in third
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_csv_too_large(mock_run_deployment, client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 10)
+    response = client.post(
+        "/upload",
+        files={"file": ("test.csv", io.BytesIO(b"x" * 100), "text/csv")}
+    )
+
+    assert response.status_code == 413
+    mock_run_deployment.assert_not_called()
+
+def chunked_multipart(file_name: str, content: bytes, piece: int = 5):
+    """A multipart body sent in small pieces with no Content-Length, with a form field after the file."""
+    boundary = "test-boundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{file_name}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode() + content + \
+           f"\r\n--{boundary}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n--{boundary}--\r\n".encode()
+    pieces = (body[i:i + piece] for i in range(0, len(body), piece))
+    return {"content": pieces, "headers": {"Content-Type": f"multipart/form-data; boundary={boundary}"}}
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_streamed_in_pieces(mock_run_deployment, client):
+    import hashlib
+
+    csv_content = b"transaction_id,user_id,product_id,timestamp,transaction_amount\n" \
+                  b"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50\n"
+    response = client.post("/upload", **chunked_multipart("pieces.csv", csv_content))
+
+    assert response.status_code == 200
+    assert response.json()["sha256"] == hashlib.sha256(csv_content).hexdigest()
+    with open(mock_run_deployment.call_args.kwargs["parameters"]["file_path"], "rb") as f:
+        assert f.read() == csv_content
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_too_large_stopped_mid_stream(mock_run_deployment, client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_BYTES", 10)
+    response = client.post("/upload", **chunked_multipart("huge.csv", b"x" * 100))
+
+    assert response.status_code == 413
+    assert not any(name.endswith("_huge.csv") for name in os.listdir(UPLOAD_DIR)) # The partial file is removed
+    mock_run_deployment.assert_not_called()
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_gzip_csv_stored_compressed(mock_run_deployment, client):
+    import gzip
+
+    compressed = gzip.compress(b"transaction_id,user_id,product_id,timestamp,transaction_amount\n")
+    response = client.post("/upload", files={"file": ("test.csv.gz", io.BytesIO(compressed), "application/gzip")})
+
+    assert response.status_code == 200
+    saved_path = mock_run_deployment.call_args.kwargs["parameters"]["file_path"]
+    assert saved_path.endswith(".csv.gz")
+    with open(saved_path, "rb") as f:
+        assert f.read() == compressed
+
 def test_invalid_file_type(client):
     response = client.post(
         "/upload", 
@@ -55,6 +260,42 @@ def test_get_summary_bad_date_logic(client):
     response = client.get("/summary/1?start_date=2025-02-01&end_date=2025-01-01")
     assert response.status_code == 400
 
+def test_get_summary_buckets(client, seed_db_data):
+    from tests.test_rollups import ingest
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440010,123,101,2025-02-03 09:00:00,10.00\n")
+
+    weeks = client.get("/summary/123/buckets?start_date=2025-01-01&end_date=2025-02-28&granularity=week")
+    assert weeks.status_code == 200
+    assert [(b["bucket_start"], b["txn_count"], b["max_transaction"]) for b in weeks.json()] == [
+        ("2025-01-13", 2, 200.75), # Jan 15 and 16 share the week starting Monday the 13th
+        ("2025-02-03", 1, 10.00),
+    ]
+
+    months = client.get("/summary/123/buckets?start_date=2025-01-16&end_date=2025-02-03&granularity=month").json()
+    assert [(b["bucket_start"], b["min_transaction"], b["mean_transaction"]) for b in months] == [
+        ("2025-01-01", 200.75, 200.75), # The range's end date is included, its start cuts off Jan 15
+        ("2025-02-01", 10.00, 10.00),
+    ]
+
+    assert client.get("/summary/123/buckets?start_date=2025-01-01&end_date=2025-02-28&granularity=day").status_code == 422
+    assert client.get("/summary/9999/buckets?start_date=2025-01-01&end_date=2025-02-28").status_code == 404
+
+@pytest.mark.parametrize("query", ["SUMMARY_SQL", "SUMMARY_BUCKETS_SQL"])
+def test_summary_is_index_only_range_scan(db_session, seed_db_data, query):
+    import app.main
+    from tests.conftest import test_engine
+    with test_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM (ANALYZE) user_daily_spend")) # Index-only scans need the visibility map
+        connection.execute(text("SET enable_seqscan = off")) # The table is tiny; plan it as if it weren't
+        params = app.main.summary_params(123, date(2025, 1, 1), date(2025, 1, 31)) | {"granularity": "week"}
+        plan = "\n".join(connection.execute(text("EXPLAIN " + getattr(app.main, query).text), params).scalars())
+
+    assert "Index Only Scan using user_daily_spend_pkey" in plan
+    # Both bounds are index conditions on the bare column, not a filter applied to every row of the user
+    index_cond = next(line for line in plan.splitlines() if "Index Cond" in line)
+    assert "spend_date >=" in index_cond and "spend_date <" in index_cond
+
 def test_get_risk_profile_success(client, seed_db_data):
     response = client.get("/analytics/risk-profile/123")
     assert response.status_code == 200
@@ -80,14 +321,17 @@ def test_get_spend_trend_gap_fill(client, db_session):
     ensure the SQL query successfully generates a $0 row for the missing day.
     """
     from sqlalchemy import text
+    from app.rollups import backfill_rollups
     
     # Insert a transaction on Jan 1st and Jan 3rd (Skipping Jan 2nd)
     db_session.execute(text("""
-        INSERT INTO transactions (transaction_id, user_id, product_id, timestamp, transaction_amount)
+        INSERT INTO transactions (transaction_id, user_id, product_id, timestamp, amount_cents)
         VALUES 
-        ('11111111-1111-1111-1111-111111111111', 777, 1, '2025-01-01 10:00:00', 100.00),
-        ('22222222-2222-2222-2222-222222222222', 777, 2, '2025-01-03 10:00:00', 200.00)
+        ('11111111-1111-1111-1111-111111111111', 777, 1, '2025-01-01 10:00:00', 10000),
+        ('22222222-2222-2222-2222-222222222222', 777, 2, '2025-01-03 10:00:00', 20000)
     """))
+    # Raw inserts bypass ingestion, so rebuild the rollup the endpoint reads from
+    backfill_rollups(db_session.connection())
     db_session.commit()
 
     response = client.get("/analytics/spend-trend/777")
@@ -131,3 +375,59 @@ def test_get_dashboard_no_data(client):
     assert response.status_code == 404
     assert "No data available to plot" in response.text
 
+def test_dashboard_data_revalidates_with_etag(client, seed_db_data):
+    shell = client.get("/dashboard/123")
+    assert shell.headers["cache-control"] == "public, max-age=86400"
+    script_url = shell.text.split('<script src="')[-1].split('"')[0]
+    script = client.get(script_url)
+    assert script.status_code == 200
+    assert "immutable" in script.headers["cache-control"]
+    assert client.get("/dashboard/assets/dashboard.stale.js").status_code == 404
+
+    response = client.get("/dashboard/123/data")
+    assert response.status_code == 200
+    assert response.json() == client.get("/analytics/spend-trend/123?layout=columns").json()
+    etag = response.headers["etag"]
+    assert client.get("/dashboard/123/data", headers={"If-None-Match": etag}).status_code == 304
+
+    from tests.test_rollups import ingest
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440009,123,101,2025-01-20 10:00:00,900.00\n")
+    refreshed = client.get("/dashboard/123/data", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert 900.0 in refreshed.json()["totals"]
+
+
+def test_get_spend_trend_columns_layout(client, seed_db_data):
+    rows = client.get("/analytics/spend-trend/123").json()
+    columns = client.get("/analytics/spend-trend/123?layout=columns").json()
+    assert columns == {
+        "dates": [row["spend_date"] for row in rows],
+        "totals": [row["daily_total"] for row in rows],
+        "avgs": [row["rolling_7d_avg"] for row in rows],
+    }
+
+    # Documented as either shape even though the handler skips response_model validation
+    schema = client.get("/openapi.json").json()["paths"]["/analytics/spend-trend/{user_id}"]["get"]
+    assert len(schema["responses"]["200"]["content"]["application/json"]["schema"]["anyOf"]) == 2
+
+def test_large_responses_gzipped(client, db_session):
+    from sqlalchemy import text
+    from app.rollups import backfill_rollups
+
+    # Two years of daily history for one user
+    db_session.execute(text("""
+        INSERT INTO transactions (transaction_id, user_id, product_id, timestamp, amount_cents)
+        SELECT gen_random_uuid(), 42, 1, TIMESTAMP '2023-01-01' + n * INTERVAL '1 day', (10 + n % 50) * 100
+        FROM generate_series(0, 730) AS n
+    """))
+    backfill_rollups(db_session.connection())
+    db_session.commit()
+
+    response = client.get("/analytics/spend-trend/42", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 731
+
+    small = client.get("/summary/42?start_date=2023-01-01&end_date=2023-01-02", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,52 @@
+# tests/test_batch.py
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from tests.test_rollups import ingest
+
+def seed_users(num_users=5, rows=200):
+    rng = random.Random(13)
+    lines = ["transaction_id,user_id,product_id,timestamp,transaction_amount"]
+    for _ in range(rows):
+        ts = datetime(2025, 1, 1) + timedelta(minutes=rng.randint(0, 60 * 24 * 40)) # ~40 days, with gaps
+        lines.append(f"{uuid.UUID(int=rng.getrandbits(128))},{rng.randint(1, num_users)},1,{ts},{rng.uniform(1, 500):.2f}")
+    ingest("\n".join(lines) + "\n")
+
+def ndjson(response):
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_batch_summary_matches_per_user_endpoint(client, db_session):
+    seed_users()
+    window = {"start_date": "2025-01-10", "end_date": "2025-01-25"}
+
+    lines = ndjson(client.post("/batch/summary", json={"user_ids": [5, 3, 1, 99], **window}))
+    assert [line["user_id"] for line in lines] == [1, 3, 5] # ordered, user 99 has no data
+    for line in lines:
+        single = client.get(f"/summary/{line['user_id']}", params=window).json()
+        assert line == single
+
+    by_range = ndjson(client.post("/batch/summary", json={"user_id_from": 1, "user_id_to": 5, **window}))
+    assert [line["user_id"] for line in by_range] == [1, 2, 3, 4, 5]
+
+def test_batch_spend_trend_matches_per_user_endpoint(client, db_session):
+    seed_users()
+
+    lines = ndjson(client.post("/batch/spend-trend", json={"user_id_from": 1, "user_id_to": 6}))
+    assert [line["user_id"] for line in lines] == [1, 2, 3, 4, 5]
+    for line in lines:
+        assert line["trend"] == client.get(f"/analytics/spend-trend/{line['user_id']}").json()
+
+    # A window is a slice of the full-history series, rolling averages included
+    windowed = ndjson(client.post("/batch/spend-trend", json={"user_ids": [2], "start_date": "2025-01-20", "end_date": "2025-01-27"}))
+    full = client.get("/analytics/spend-trend/2").json()
+    assert windowed[0]["trend"] == [day for day in full if "2025-01-20" <= day["spend_date"] <= "2025-01-27"]
+
+def test_batch_request_validation(client):
+    window = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+    assert client.post("/batch/summary", json=window).status_code == 422
+    assert client.post("/batch/summary", json={"user_ids": [1], "user_id_from": 1, "user_id_to": 2, **window}).status_code == 422
+    assert client.post("/batch/summary", json={"user_id_from": 1, "user_id_to": 1_000_000, **window}).status_code == 422
+    assert client.post("/batch/summary", json={"user_ids": [1], "start_date": "2025-02-01", "end_date": "2025-01-01"}).status_code == 400
@@ -0,0 +1,93 @@
+# tests/test_bulk_load.py
+import os
+import tempfile
+from datetime import timedelta
+import pytest
+from sqlalchemy import text
+
+from app.bulk_load import build_secondary_indexes, deferred_indexes, index_state, secondary_indexes
+from tests.conftest import TEST_DATABASE_URL, test_engine
+from tests.test_rollups import ingest
+
+HEADER = "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+
+INDEX_COVERAGE_SQL = text("""
+    SELECT parent.relname, ix.indisvalid, COUNT(i.inhrelid) AS children
+    FROM pg_class parent
+    JOIN pg_index ix ON ix.indexrelid = parent.oid
+    LEFT JOIN pg_inherits i ON i.inhparent = parent.oid
+    WHERE ix.indrelid = 'transactions'::regclass AND NOT ix.indisprimary
+    GROUP BY parent.relname, ix.indisvalid
+""")
+
+def index_coverage():
+    with test_engine.connect() as connection:
+        partitions = connection.execute(text("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'transactions'::regclass")).scalar()
+        return partitions, {row.relname: (row.indisvalid, row.children) for row in connection.execute(INDEX_COVERAGE_SQL)}
+
+def assert_indexes_complete():
+    partitions, coverage = index_coverage()
+    assert coverage == {index.name: (True, partitions) for index in secondary_indexes()}
+
+def test_bulk_load_drops_and_rebuilds_indexes(db_session):
+    ingest(HEADER + "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,10.00\n")
+
+    with deferred_indexes(TEST_DATABASE_URL) as timings:
+        assert index_coverage()[1] == {} # Loading with no secondary indexes to maintain
+        # A month with no partition yet: it's created (without indexes) mid-load
+        ingest(HEADER +
+               "22222222-2222-2222-2222-222222222222,2,1,2025-03-15 10:00:00,20.00\n"
+               "33333333-3333-3333-3333-333333333333,2,1,2025-03-16 10:00:00,30.00\n", loader="copy")
+
+    assert_indexes_complete()
+    assert {"drop_indexes", "load", "analyze"} <= timings.keys()
+    assert {f"build:{index.name}" for index in secondary_indexes()} <= timings.keys()
+    assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 3
+
+def test_failed_bulk_load_still_rebuilds_indexes(db_session):
+    with pytest.raises(Exception, match="missing required columns"):
+        with deferred_indexes(TEST_DATABASE_URL):
+            ingest("not,a,transactions,file\n")
+    assert_indexes_complete()
+
+    # The lock was released, so the next bulk load can start
+    with deferred_indexes(TEST_DATABASE_URL):
+        pass
+
+def test_rebuild_finishes_interrupted_build(db_session):
+    ingest(HEADER + "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,10.00\n")
+    name = secondary_indexes()[0].name
+    with test_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # As left behind by a bulk load killed half way through its rebuild
+        connection.execute(text(f"DROP INDEX {name}"))
+        connection.execute(text(f"CREATE INDEX {name} ON ONLY transactions (user_id, timestamp)"))
+        assert index_state(connection, name) is False
+
+        assert list(build_secondary_indexes(connection)) == [name]
+        assert build_secondary_indexes(connection) == {} # Nothing left to do
+    assert_indexes_complete()
+
+def test_bulk_pipeline_rebuilds_rollups_instead_of_per_row_updates(db_session, monkeypatch):
+    from app import processing
+    from tests.test_rollups import ROLLUP_QUERY
+    ingest(HEADER + "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,10.00\n")
+
+    def per_row_update(connection, inserted_rows):
+        raise AssertionError("Bulk mode ran the per-row rollup update without idx_user_timestamp")
+    monkeypatch.setattr(processing, "apply_inserted_rows", per_row_update)
+    monkeypatch.setattr(processing, "process_csv_to_db", processing.process_csv_to_db.fn)
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write(HEADER +
+                "22222222-2222-2222-2222-222222222222,1,1,2025-01-15 10:05:00,20.00\n"
+                "33333333-3333-3333-3333-333333333333,2,1,2025-01-16 10:00:00,30.00\n")
+    processing.run_csv_pipeline.fn(file_path=path, database_url=TEST_DATABASE_URL, bulk=True)
+
+    assert_indexes_complete()
+    rows = db_session.execute(ROLLUP_QUERY).fetchall()
+    assert [(r.user_id, str(r.spend_date), float(r.total_amount), r.txn_count) for r in rows] == [
+        (1, "2025-01-15", 30.00, 2), (2, "2025-01-16", 30.00, 1),
+    ]
+    aggregates = db_session.execute(text("SELECT user_id, txn_count, min_gap FROM user_aggregates ORDER BY user_id")).fetchall()
+    assert [(r.user_id, r.txn_count, r.min_gap) for r in aggregates] == [(1, 2, timedelta(minutes=5)), (2, 1, None)]
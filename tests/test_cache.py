@@ -0,0 +1,70 @@
+# tests/test_cache.py
+import asyncio
+import time
+import fakeredis
+
+from app.cache import MISSING, MemoryCache, RedisCache, get_or_compute
+from tests.test_rollups import ingest
+
+SUMMARY_URL = "/summary/{}?start_date=2025-01-01&end_date=2025-01-31"
+
+def test_summary_cached_until_user_data_changes(client, seed_db_data):
+    assert client.get(SUMMARY_URL.format(123)).json()["max_transaction"] == 200.75
+    assert client.get(SUMMARY_URL.format(456)).status_code == 200
+    assert client.get(SUMMARY_URL.format(123)).json()["max_transaction"] == 200.75
+    assert client.get("/cache/stats").json() | {"entries": None} == {
+        "backend": "memory", "hits": 1, "misses": 2, "entries": None, "max_entries": 10_000
+    }
+
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440009,123,101,2025-01-20 10:00:00,900.00\n")
+
+    # Only user 123's entry went stale
+    assert client.get(SUMMARY_URL.format(123)).json()["max_transaction"] == 900.00
+    assert client.get(SUMMARY_URL.format(456)).status_code == 200
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+def test_risk_profile_invalidated_by_any_ingestion(client, seed_db_data):
+    assert client.get("/analytics/risk-profile/456").json()["risk_metrics"]["global_whale_rank"] == 2
+
+    # Another user overtaking 456 changes 456's rank, so the global version has to move
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440009,789,101,2025-01-20 10:00:00,100.00\n")
+
+    assert client.get("/analytics/risk-profile/456").json()["risk_metrics"]["global_whale_rank"] == 3
+
+def test_not_found_is_not_cached(client, seed_db_data):
+    assert client.get("/analytics/spend-trend/9999").status_code == 404
+    assert client.get("/analytics/spend-trend/9999").status_code == 404
+    assert client.get("/dashboard/9999/data").status_code == 404
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (0, 3)
+
+def test_memory_cache_evicts_least_recently_used_and_expired():
+    async def scenario():
+        cache = MemoryCache(max_entries=2, ttl_seconds=1)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        assert await cache.get("a") == 1
+        await cache.set("c", 3) # "b" is the least recently used
+        assert await cache.get("b") is MISSING
+        assert await cache.get("c") == 3
+
+        time.sleep(1.1)
+        assert await cache.get("a") is MISSING
+
+    asyncio.run(scenario())
+
+def test_redis_cache_round_trips_json():
+    async def compute(value):
+        return value
+
+    async def scenario():
+        cache = RedisCache(fakeredis.FakeAsyncRedis())
+        value = [{"spend_date": "2025-01-01", "daily_total": 100.0}]
+        assert await get_or_compute(cache, "k", lambda: compute(value)) == value
+        assert await get_or_compute(cache, "k", lambda: compute(None)) == value
+        assert cache.stats() == {"backend": "redis", "hits": 1, "misses": 1}
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+# tests/test_exports.py
+import asyncio
+import json
+from datetime import date
+import pyarrow as pa
+
+from app.exports import stream_export, transactions_export_query, TRANSACTION_SCHEMA, transaction_dict
+from tests.conftest import TestAsyncSessionLocal
+from tests.test_batch import seed_users
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_export_transactions_keyset_pages_cover_every_row(client, db_session):
+    seed_users(num_users=2, rows=100)
+    everything = ndjson(client.get("/export/transactions/1"))
+    keys = [(row["timestamp"], row["transaction_id"]) for row in everything]
+    assert keys == sorted(keys) and len(everything) > 20
+
+    pages, params = [], {"limit": 7}
+    while page := ndjson(client.get("/export/transactions/1", params=params)):
+        pages += page
+        params = {"limit": 7, "after_timestamp": page[-1]["timestamp"], "after_transaction_id": page[-1]["transaction_id"]}
+    assert pages == everything
+
+    window = ndjson(client.get("/export/transactions/1", params={"start_date": "2025-01-05", "end_date": "2025-01-06"}))
+    assert window == [row for row in everything if "2025-01-05" <= row["timestamp"] < "2025-01-07"]
+
+def test_export_arrow_matches_ndjson(client, db_session):
+    seed_users(num_users=2, rows=100)
+
+    response = client.get("/export/transactions/2", params={"format": "arrow"})
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema == TRANSACTION_SCHEMA
+    assert table.column("transaction_id").to_pylist() == [row["transaction_id"] for row in ndjson(client.get("/export/transactions/2"))]
+
+    trend = pa.ipc.open_stream(client.get("/export/spend-trend/2", params={"format": "arrow"}).content).read_all()
+    assert trend.to_pylist() == [
+        {**day, "spend_date": date.fromisoformat(day["spend_date"])}
+        for day in client.get("/analytics/spend-trend/2").json()
+    ]
+
+def test_export_streams_in_cursor_batches(db_session):
+    seed_users(num_users=1, rows=50)
+
+    async def collect():
+        query, params = transactions_export_query(1)
+        return [chunk async for chunk in stream_export(TestAsyncSessionLocal, query, params, "ndjson",
+                                                       TRANSACTION_SCHEMA, transaction_dict, batch_rows=20)]
+
+    chunks = asyncio.run(collect())
+    assert [chunk.count(b"\n") for chunk in chunks] == [20, 20, 10]
+
+def test_export_empty_and_bad_requests(client):
+    assert client.get("/export/transactions/9999").text == ""
+    assert client.get("/export/transactions/1", params={"format": "csv"}).status_code == 422
+    assert client.get("/export/transactions/1", params={"after_transaction_id": "11111111-1111-1111-1111-111111111111"}).status_code == 400
@@ -0,0 +1,55 @@
+# tests/test_gen_fast.py
+import uuid
+from datetime import datetime
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.gen_fast import SEEDED_END, generate_batch, iter_batches, load_generated
+from tests.conftest import test_engine
+from tests.test_rollups import ROLLUP_QUERY
+
+WINDOW = {"start": datetime(2025, 1, 1), "end": datetime(2025, 3, 1)}
+
+def test_batches_are_reproducible_and_valid():
+    first = list(iter_batches(2_500, seed=7, batch_rows=1_000, **WINDOW))
+    second = list(iter_batches(2_500, seed=7, batch_rows=1_000, **WINDOW))
+    assert [len(df) for df in first] == [1_000, 1_000, 500]
+    for a, b in zip(first, second):
+        assert a.equals(b)
+    assert not first[0].equals(next(iter_batches(1_000, seed=8, **WINDOW)))
+
+    df = first[0]
+    assert all(uuid.UUID(value).version == 7 for value in df["transaction_id"])
+    # Time-ordered: increasing within a batch and from one batch to the next
+    ids = [value for batch in first for value in batch["transaction_id"]]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert df["timestamp"].min() >= WINDOW["start"] and df["timestamp"].max() < WINDOW["end"]
+    assert df["user_id"].between(1, 1000).all() and df["product_id"].between(1, 500).all()
+    assert df["transaction_amount"].between(5.0, 500.0).all()
+
+def test_seeded_batches_default_to_a_fixed_window():
+    df = next(iter_batches(1_000, seed=7))
+    assert df["timestamp"].max() < SEEDED_END
+    assert uuid.UUID(df["transaction_id"].iloc[0]).int >> 80 == int(SEEDED_END.timestamp() * 1000) # The id's ms prefix
+
+def test_zipf_users_are_skewed():
+    rng = np.random.default_rng(1)
+    df = generate_batch(rng, 50_000, num_users=1000, user_distribution="zipf", zipf_exponent=1.1, **WINDOW)
+    counts = df["user_id"].value_counts()
+    assert counts.index[0] == 1
+    assert counts.iloc[:10].sum() > len(df) * 0.25 # Uniform would give the top 10 users ~1%
+
+    with pytest.raises(ValueError):
+        generate_batch(rng, 10, user_distribution="pareto", **WINDOW)
+
+@pytest.mark.parametrize("loader", ["insert", "copy"])
+def test_load_generated_streams_into_transactions(db_session, loader):
+    with test_engine.connect() as connection:
+        assert load_generated(connection, 3_000, loader, seed=3, batch_rows=1_000, **WINDOW) == (3_000, 3_000)
+        # Same seed, same ids: a rerun inserts nothing
+        assert load_generated(connection, 1_000, loader, seed=3, **WINDOW) == (1_000, 0)
+
+    assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 3_000
+    rollup_rows = db_session.execute(ROLLUP_QUERY).fetchall()
+    assert sum(row.txn_count for row in rollup_rows) == 3_000
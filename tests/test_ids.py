@@ -0,0 +1,13 @@
+# tests/test_ids.py
+import numpy as np
+
+from app.ids import uuid7, uuid7_strings
+
+def test_uuid7_is_time_ordered():
+    ids = [uuid7() for _ in range(10_000)] # Far more than one millisecond's worth share a timestamp
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(value.version == 7 and value.variant == "specified in RFC 4122" for value in ids)
+    assert str(ids[-1]) < str(uuid7()) # Text order matches, so string ids sort the same way
+
+    batch = uuid7_strings(np.random.default_rng(0), 1_000, 1_700_000_000_000)
+    assert list(batch) == sorted(batch) and batch[0].startswith("018bcfe5-6800-7")
@@ -0,0 +1,138 @@
+# tests/test_inbox.py
+import io
+import os
+from unittest.mock import patch, AsyncMock
+from sqlalchemy import text
+
+from app.config import settings
+from app.inbox import claim_due_batch, drain_inbox, enqueue_file, inbox_dir, load_batch
+from tests.conftest import test_engine
+
+HEADER = "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+
+def queue(csv_content, name="batch.csv"):
+    os.makedirs("./test_shared_data", exist_ok=True)
+    path = os.path.join("./test_shared_data", name)
+    with open(path, "w") as f:
+        f.write(csv_content)
+    with test_engine.begin() as connection:
+        return enqueue_file(connection, path)
+
+def statuses():
+    with test_engine.connect() as connection:
+        rows = connection.execute(text("SELECT file_id, status, rows_read, rows_inserted, error, batch_id FROM inbox_files")).fetchall()
+    return {row.file_id: row for row in rows}
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_inbox_upload_is_queued_then_loaded(mock_run_deployment, client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MODE", "inbox")
+    csv_content = HEADER + "a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,2025-01-15 10:00:00,100.50\n"
+
+    response = client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content.encode()), "text/csv")})
+    assert response.status_code == 200
+    mock_run_deployment.assert_not_called()
+    file_id = response.json()["file_id"]
+    assert client.get(f"/uploads/{file_id}").json()["status"] == "pending"
+
+    with test_engine.connect() as connection:
+        assert claim_due_batch(connection) == [] # Not due yet: too small and too recent
+        files = claim_due_batch(connection, max_bytes=1) # Due by size; a batch always takes at least one file
+        assert [str(f.file_id) for f in files] == [file_id]
+        assert client.get(f"/uploads/{file_id}").json()["status"] == "processing"
+        assert load_batch(connection, files) == 1
+
+    status = client.get(f"/uploads/{file_id}").json()
+    assert (status["status"], status["rows_read"], status["rows_inserted"]) == ("loaded", 1, 1)
+    assert not any(name.startswith(file_id) for name in os.listdir(inbox_dir())) # Loaded files are removed
+    assert client.get("/summary/1?start_date=2025-01-01&end_date=2025-01-31").json()["max_transaction"] == 100.50
+    assert client.get("/uploads/00000000-0000-0000-0000-000000000000").status_code == 404
+
+def test_failures_stay_per_file(db_session):
+    first = queue(HEADER +
+                  "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,10.00\n"
+                  "22222222-2222-2222-2222-222222222222,2,1,2025-02-15 10:00:00,20.00\n", "a.csv")
+    # Shares an id with the earlier file, which keeps it
+    second = queue(HEADER +
+                   "22222222-2222-2222-2222-222222222222,2,1,2025-02-15 10:00:00,99.00\n"
+                   "33333333-3333-3333-3333-333333333333,3,1,2025-03-15 10:00:00,30.00\n", "b.csv")
+    unparseable = queue(HEADER + "44444444-4444-4444-4444-444444444444,4,1,not a date,40.00\n", "c.csv")
+    bad_uuid = queue(HEADER + "not-a-uuid,5,1,2025-01-15 10:00:00,50.00\n", "d.csv")
+
+    # The database rejects the batch over the bad UUID, so each file is retried on its own
+    with test_engine.connect() as connection:
+        assert drain_inbox(connection, force=True) == (4, 2)
+
+    result = statuses()
+    assert (result[first].status, result[first].rows_read, result[first].rows_inserted) == ("loaded", 2, 2)
+    assert (result[second].status, result[second].rows_read, result[second].rows_inserted) == ("loaded", 2, 1)
+    assert result[unparseable].status == result[bad_uuid].status == "failed"
+    assert "timestamp" in result[unparseable].error
+
+    assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 3
+
+def test_pending_files_load_as_one_batch(db_session):
+    ids = [queue(HEADER + f"{n}{n}111111-1111-1111-1111-111111111111,{n},1,2025-01-15 10:00:00,10.00\n"
+                 "99999999-9999-9999-9999-999999999999,9,1,2025-01-15 10:00:00,90.00\n", f"{n}.csv")
+           for n in range(1, 4)]
+    with test_engine.connect() as connection:
+        assert drain_inbox(connection, force=True) == (3, 3)
+
+    result = statuses()
+    assert len({result[file_id].batch_id for file_id in ids}) == 1
+    # The shared id counts for the oldest file only
+    assert [result[file_id].rows_inserted for file_id in ids] == [2, 1, 1]
+    assert db_session.execute(text("SELECT SUM(txn_count) FROM user_aggregates")).scalar() == 4
+
+@patch("app.main.run_deployment", new_callable=AsyncMock)
+def test_upload_refused_when_backlog_is_full(mock_run_deployment, client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MODE", "inbox")
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BACKLOG", 2)
+    def upload(n):
+        csv_content = HEADER + f"a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a1{n},1,101,2025-01-15 10:00:00,100.50\n"
+        return client.post("/upload", files={"file": ("test.csv", io.BytesIO(csv_content.encode()), "text/csv")})
+
+    assert [upload(n).json()["queue_position"] for n in range(2)] == [1, 2]
+    refused = upload(2)
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == str(settings.INBOX_MAX_WAIT_SECONDS)
+    assert sum(name.endswith("_test.csv") for name in os.listdir(inbox_dir())) == 2 # The refused body never hit the disk
+
+    with test_engine.connect() as connection:
+        drain_inbox(connection, force=True)
+    assert upload(3).json()["queue_position"] == 1
+
+def test_failed_upload_can_be_uploaded_again(client, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MODE", "inbox")
+    csv_content = HEADER + "a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11,1,101,not a date,100.50\n"
+
+    def upload():
+        return client.post("/upload", files={"file": ("bad.csv", io.BytesIO(csv_content.encode()), "text/csv")}).json()
+
+    first = upload()
+    assert upload()["duplicate_of"] == first["file_id"] # Still pending
+    with test_engine.connect() as connection:
+        drain_inbox(connection, force=True)
+    assert client.get(f"/uploads/{first['file_id']}").json()["status"] == "failed"
+
+    retry = upload()
+    assert "duplicate_of" not in retry and retry["file_id"] != first["file_id"]
+
+def test_file_larger_than_a_batch_is_loaded_in_chunks(db_session, monkeypatch):
+    from app import inbox, processing
+    monkeypatch.setattr(settings, "INBOX_MAX_BATCH_BYTES", 64)
+    monkeypatch.setattr(processing, "CHUNK_SIZE", 2)
+    def whole_file(*args):
+        raise AssertionError("A file bigger than a batch was read into memory at once")
+    monkeypatch.setattr(inbox, "read_inbox_file", whole_file)
+
+    large = queue(HEADER + "".join(f"{n}{n}111111-1111-1111-1111-111111111111,{n},1,2025-01-15 10:0{n}:00,10.00\n"
+                                   for n in range(1, 6)), "large.csv")
+    with test_engine.connect() as connection:
+        assert drain_inbox(connection, force=True) == (1, 1)
+
+    result = statuses()
+    assert (result[large].status, result[large].rows_read, result[large].rows_inserted) == ("loaded", 5, 5)
+    with test_engine.connect() as connection:
+        chunks = connection.execute(text("SELECT chunk_index FROM ingestion_manifest")).scalar()
+    assert chunks == 3 # Checkpointed chunk by chunk
+    assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 5
@@ -0,0 +1,33 @@
+# tests/test_metrics.py
+from prometheus_client import REGISTRY
+
+from tests.test_rollups import ingest
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_metrics_endpoint_reports_requests_queries_and_ingestion(client, seed_db_data):
+    route = {"method": "GET", "route": "/summary/{user_id}", "status": "200"}
+    requests_before = sample("http_request_duration_seconds_count", **route)
+    rows_before = sample("ingest_rows_inserted_total", loader="copy")
+    selects_before = sample("db_query_duration_seconds_count", engine="ingest", statement="SELECT")
+
+    for user_id in (123, 456):
+        assert client.get(f"/summary/{user_id}?start_date=2025-01-01&end_date=2025-12-31").status_code == 200
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440100,7,1,2025-01-15 10:00:00,1.00\n"
+           "550e8400-e29b-41d4-a716-446655440101,7,1,2025-01-15 11:00:00,2.00\n", loader="copy")
+
+    # Both users' requests land in the route template's series
+    assert sample("http_request_duration_seconds_count", **route) == requests_before + 2
+    assert sample("ingest_rows_inserted_total", loader="copy") == rows_before + 2
+    assert sample("ingest_chunk_insert_seconds_total", loader="copy") > 0
+    assert sample("db_query_duration_seconds_count", engine="ingest", statement="SELECT") > selects_before
+    assert sample("db_pool_checkout_wait_seconds_count", engine="ingest") > 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_bucket{le="0.1",method="GET",route="/summary/{user_id}",status="200"}' in response.text
+    assert 'db_pool_connections{engine="ingest",state="size"}' in response.text
+    assert "ingest_last_file_rows_per_second" in response.text
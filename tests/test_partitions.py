@@ -0,0 +1,51 @@
+# tests/test_partitions.py
+from datetime import date
+import pytest
+from sqlalchemy import text
+
+from app.partitions import ensure_future_partitions, ensure_month_partitions
+from tests.test_rollups import ingest
+
+PLACEMENT_QUERY = text("SELECT tableoid::regclass::text, user_id FROM transactions ORDER BY timestamp")
+
+@pytest.mark.parametrize("loader", ["insert", "copy"])
+def test_ingestion_creates_monthly_partitions(db_session, loader):
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "11111111-1111-1111-1111-111111111111,1,1,2025-01-31 23:59:59,10.00\n"
+           "22222222-2222-2222-2222-222222222222,2,1,2025-02-01 00:00:00,20.00\n"
+           "11111111-1111-1111-1111-111111111111,3,1,2025-02-02 00:00:00,30.00\n", loader=loader) # duplicate id, other partition
+
+    assert db_session.execute(PLACEMENT_QUERY).fetchall() == [
+        ("transactions_y2025m01", 1),
+        ("transactions_y2025m02", 2),
+    ]
+    assert db_session.execute(text("SELECT COUNT(*) FROM transaction_ids")).scalar() == 2
+
+def test_new_partition_takes_rows_from_default(db_session):
+    db_session.execute(text("""
+        INSERT INTO transactions (transaction_id, user_id, product_id, timestamp, amount_cents)
+        VALUES ('33333333-3333-3333-3333-333333333333', 1, 1, '2024-06-10 12:00:00', 500)
+    """))
+    db_session.commit()
+    assert db_session.execute(PLACEMENT_QUERY).fetchall() == [("transactions_default", 1)]
+    db_session.commit() # Attaching needs an exclusive lock on the default partition
+
+    with db_session.get_bind().begin() as connection:
+        assert ensure_month_partitions(connection, date(2024, 5, 20), date(2024, 6, 1)) == [
+            "transactions_y2024m05", "transactions_y2024m06"
+        ]
+        assert ensure_month_partitions(connection, date(2024, 6, 1), date(2024, 6, 30)) == []
+    assert db_session.execute(PLACEMENT_QUERY).fetchall() == [("transactions_y2024m06", 1)]
+
+    # A half-open range on the raw column only touches the matching partition
+    plan = "\n".join(db_session.execute(text("""
+        EXPLAIN SELECT * FROM transactions
+        WHERE timestamp >= '2024-06-01' AND timestamp < '2024-07-01'
+    """)).scalars())
+    assert "transactions_y2024m06" in plan
+    assert "transactions_y2024m05" not in plan and "transactions_default" not in plan
+
+def test_future_partitions_precreated(db_session):
+    with db_session.get_bind().begin() as connection:
+        created = ensure_future_partitions(connection, date(2025, 11, 15), months_ahead=2)
+    assert created == ["transactions_y2025m11", "transactions_y2025m12", "transactions_y2026m01"]
@@ -64,3 +64,310 @@ def test_corrupt_csv_columns():
     finally:
         os.remove(path)
 
+
+def test_copy_loader_dedupes_and_reports_counts(db_session, capsys):
+    csv_content = (
+        "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+        "11111111-1111-1111-1111-111111111111,123,101,2025-01-15 10:00:00,100.50\n"
+        "11111111-1111-1111-1111-111111111111,999,999,2025-01-16 11:00:00,500.00\n"
+        "22222222-2222-2222-2222-222222222222,456,102,2025-01-16 11:00:00,200.75"
+    )
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(csv_content)
+
+        total_rows = process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy")
+        assert total_rows == 3
+        assert "2 inserted, 1 skipped" in capsys.readouterr().out
+
+        # Re-uploading the same rows under a new file inserts nothing new
+        fd2, path2 = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd2, 'w') as f:
+            f.write(csv_content)
+        try:
+            process_csv_to_db.fn(file_path=path2, database_url=TEST_DATABASE_URL, loader="copy")
+            assert "0 inserted, 3 skipped" in capsys.readouterr().out
+        finally:
+            os.remove(path2)
+
+        rows = db_session.execute(text("SELECT user_id, amount_cents FROM transactions ORDER BY user_id")).fetchall()
+        assert [(r.user_id, r.amount_cents) for r in rows] == [(123, 10050), (456, 20075)]
+    finally:
+        os.remove(path)
+
+def test_unknown_loader_rejected():
+    with pytest.raises(ValueError):
+        process_csv_to_db.fn(file_path="unused.csv", database_url=TEST_DATABASE_URL, loader="bogus")
+
+def test_split_byte_ranges_are_line_aligned():
+    from app.processing import read_csv_header, split_byte_ranges
+
+    rows = [f"{i:08d}-0000-0000-0000-000000000000,{i},1,2025-01-01 00:00:00,{i}.25" for i in range(100)]
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("transaction_id,user_id,product_id,timestamp,transaction_amount\n" + "\n".join(rows))
+
+        _, data_start = read_csv_header(path)
+        ranges = split_byte_ranges(path, data_start, 4)
+        assert len(ranges) == 4
+        assert ranges[0][0] == data_start
+        assert ranges[-1][1] == os.path.getsize(path)
+
+        with open(path, "rb") as f:
+            content = f.read()
+        for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+            assert end == next_start
+            assert content[start - 1:start] == b"\n"
+        assert sum(content[s:e].count(b"\n") for s, e in ranges) == 99
+    finally:
+        os.remove(path)
+
+def test_parallel_ingestion_dedupes_across_ranges(db_session):
+    ids = [f"{i:08d}-0000-0000-0000-000000000000" for i in range(200)]
+    rows = [f"{tid},{i % 7},1,2025-01-01 00:00:00,10.00" for i, tid in enumerate(ids)]
+    rows += [f"{ids[0]},1,1,2025-01-02 00:00:00,99.00"] # duplicate id in the last range
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("transaction_id,user_id,product_id,timestamp,transaction_amount\n" + "\n".join(rows) + "\n")
+
+        total_rows = process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy", workers=3)
+        assert total_rows == 201
+        assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 200
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("loader", ["insert", "copy"])
+def test_failed_ingestion_resumes_from_checkpoint(db_session, monkeypatch, loader):
+    import app.processing as processing
+
+    rows = [f"{i:08d}-0000-0000-0000-000000000000,{i},1,2025-01-01 00:00:00,10.00" for i in range(10)]
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("transaction_id,user_id,product_id,timestamp,transaction_amount\n" + "\n".join(rows) + "\n")
+
+        monkeypatch.setattr(processing, "CHUNK_SIZE", 3)
+        real_loader = getattr(processing, f"{loader}_chunk_to_db")
+        calls = []
+
+        def flaky_loader(chunk_df, connection):
+            calls.append(len(chunk_df))
+            if len(calls) == 3:
+                raise RuntimeError("connection dropped")
+            return real_loader(chunk_df, connection)
+
+        monkeypatch.setattr(processing, f"{loader}_chunk_to_db", flaky_loader)
+        with pytest.raises(Exception, match="connection dropped"):
+            process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader=loader)
+
+        # The first two chunks were committed before the failure
+        assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 6
+        checkpoint = db_session.execute(text("SELECT chunk_index, completed FROM ingestion_manifest")).one()
+        assert (checkpoint.chunk_index, checkpoint.completed) == (2, False)
+        db_session.commit()
+
+        # The retry only reads the remaining rows
+        calls.clear()
+        assert process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader=loader) == 10
+        assert calls == [3, 1]
+        assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 10
+        assert db_session.execute(text("SELECT completed FROM ingestion_manifest")).scalar() is True
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("suffix", [".csv.gz", ".csv.zst"])
+def test_compressed_csv_ingested_and_resumed(db_session, monkeypatch, suffix):
+    import app.processing as processing
+
+    rows = [f"{i:08d}-0000-0000-0000-000000000000,{i},1,2025-01-01 00:00:00,10.00" for i in range(7)]
+    raw = ("transaction_id,user_id,product_id,timestamp,transaction_amount\n" + "\n".join(rows) + "\n").encode()
+    if suffix == ".csv.gz":
+        import gzip
+        compressed = gzip.compress(raw)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        compressed = zstandard.ZstdCompressor().compress(raw)
+
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+
+        # Fail on the second chunk, then check the retry picks up mid-stream
+        monkeypatch.setattr(processing, "CHUNK_SIZE", 3)
+        real_loader = processing.copy_chunk_to_db
+        calls = []
+
+        def flaky_loader(chunk_df, connection):
+            calls.append(chunk_df["user_id"].tolist())
+            if calls == [[0, 1, 2], [3, 4, 5]]:
+                raise RuntimeError("connection dropped")
+            return real_loader(chunk_df, connection)
+
+        monkeypatch.setattr(processing, "copy_chunk_to_db", flaky_loader)
+        with pytest.raises(Exception, match="connection dropped"):
+            process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy", workers=2)
+
+        assert process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy", workers=2) == 7
+        assert calls[2:] == [[3, 4, 5], [6]]
+        assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 7
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_columnar_file_ingested_row_group_by_row_group(db_session, monkeypatch, suffix):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import app.processing as processing
+
+    table = pa.table({
+        "transaction_id": [f"{i:08d}-0000-0000-0000-000000000000" for i in range(10)] + ["00000000-0000-0000-0000-000000000000"],
+        "user_id": pa.array(list(range(11)), pa.int32()),
+        "product_id": pa.array([1] * 11, pa.int32()),
+        "timestamp": pd.date_range("2025-01-01", periods=11, freq="h"),
+        "transaction_amount": [10.5] * 11,
+    })
+
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        if suffix == ".parquet":
+            pq.write_table(table, path, row_group_size=4)
+        else:
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                for batch in table.to_batches(max_chunksize=4):
+                    writer.write_batch(batch)
+
+        monkeypatch.setattr(processing, "CHUNK_SIZE", 3)
+        chunk_sizes = []
+        real_loader = processing.copy_chunk_to_db
+
+        def recording_loader(chunk_df, connection):
+            chunk_sizes.append(len(chunk_df))
+            assert pd.api.types.is_datetime64_any_dtype(chunk_df["timestamp"])
+            return real_loader(chunk_df, connection)
+
+        monkeypatch.setattr(processing, "copy_chunk_to_db", recording_loader)
+        assert process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy") == 11
+
+        # Row groups of 4, 4, 3 are each sliced into chunks of at most 3 rows
+        assert chunk_sizes == [3, 1, 3, 1, 3]
+        assert db_session.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 10
+        assert db_session.execute(text("SELECT MAX(timestamp) FROM transactions")).scalar().hour == 9
+    finally:
+        os.remove(path)
+
+def test_columnar_iteration_skips_committed_rows():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from app.processing import iter_columnar_chunks
+
+    table = pa.table({
+        "transaction_id": [str(i) for i in range(10)], "user_id": list(range(10)), "product_id": [1] * 10,
+        "timestamp": pa.array([0] * 10, pa.timestamp("us")), "transaction_amount": [1.0] * 10,
+    })
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        pq.write_table(table, path, row_group_size=4)
+        chunks = list(iter_columnar_chunks(path, skip_rows=5, chunk_size=2))
+        assert [chunk["user_id"].tolist() for chunk in chunks] == [[5, 6], [7], [8, 9]]
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("parser", ["typed", "pyarrow"])
+def test_typed_parsers_load_rows(db_session, parser):
+    csv_content = (
+        "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+        "550e8400-e29b-41d4-a716-446655440000,123,101,2025-01-15 10:00:00,100.50\n"
+        "550e8400-e29b-41d4-a716-446655440001,456,,2025-01-16 11:00:00.250000,200.75"
+    )
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(csv_content)
+
+        assert process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, loader="copy", parser=parser) == 2
+        rows = db_session.execute(text("SELECT user_id, product_id, timestamp, amount_cents FROM transactions ORDER BY user_id")).fetchall()
+        assert rows[0].product_id == 101
+        assert rows[1].product_id is None
+        assert rows[1].timestamp.microsecond == 250000
+        assert rows[1].amount_cents == 20075
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("parser", ["typed", "pyarrow"])
+@pytest.mark.parametrize("bad_field, bad_row", [
+    ("user_id", "550e8400-e29b-41d4-a716-446655440004,abc,1,2025-01-15 10:00:00,1.00"),
+    ("timestamp", "550e8400-e29b-41d4-a716-446655440004,5,1,not a date,1.00"),
+])
+def test_typed_parser_reports_offending_row(db_session, monkeypatch, parser, bad_field, bad_row):
+    import app.processing as processing
+
+    good_rows = [f"550e8400-e29b-41d4-a716-44665544000{i},{i},1,2025-01-15 10:00:00,1.00" for i in range(4)]
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write("transaction_id,user_id,product_id,timestamp,transaction_amount\n" + "\n".join(good_rows + [bad_row]))
+
+        monkeypatch.setattr(processing, "CHUNK_SIZE", 3)
+        with pytest.raises(Exception) as excinfo:
+            process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, parser=parser)
+
+        assert f"Row 4: invalid {bad_field}" in str(excinfo.value)
+    finally:
+        os.remove(path)
+
+def test_detect_timestamp_format():
+    import pandas as pd
+    from app.processing import detect_timestamp_format
+
+    assert detect_timestamp_format(pd.Series(["2025-01-15 10:00:00", "2025-01-16T11:00:00.5"])) == "ISO8601"
+    assert detect_timestamp_format(pd.Series(["25/01/2025 10:00", "26/01/2025 11:30"])) == "%d/%m/%Y %H:%M"
+    assert detect_timestamp_format(pd.Series([None], dtype=object)) is None
+
+def test_writer_slots_cap_concurrent_loads():
+    import threading
+    from app.database import get_cached_engine
+    from app.processing import writer_slot
+
+    engine = get_cached_engine(TEST_DATABASE_URL)
+    assert get_cached_engine(TEST_DATABASE_URL) is engine # One pool per URL for the whole process
+    acquired = threading.Event()
+
+    def second_writer():
+        with engine.connect() as connection, writer_slot(connection, max_writers=1):
+            acquired.set()
+
+    with engine.connect() as connection:
+        with writer_slot(connection, max_writers=1) as slot:
+            assert slot == 0
+            thread = threading.Thread(target=second_writer)
+            thread.start()
+            assert not acquired.wait(1.0) # Waits while the only slot is taken
+        assert acquired.wait(5.0)
+        thread.join()
+
+        # Released slots leave the connection usable for the caller's own transactions
+        with connection.begin():
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+
+@pytest.mark.parametrize("loader", ["insert", "copy"])
+def test_amounts_stored_as_whole_cents(db_session, loader):
+    from tests.test_rollups import ingest
+    ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+           "550e8400-e29b-41d4-a716-446655440000,1,1,2025-01-15 10:00:00,19.99\n"
+           "550e8400-e29b-41d4-a716-446655440001,1,1,2025-01-15 11:00:00,0.29\n", loader=loader)
+    cents = db_session.execute(text("SELECT amount_cents FROM transactions ORDER BY timestamp")).scalars().all()
+    assert cents == [1999, 29] # Not 28, as a truncating float conversion would give
+
+    with pytest.raises(Exception, match="missing user_id"):
+        ingest("transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+               "550e8400-e29b-41d4-a716-446655440002,,1,2025-01-15 12:00:00,1.00\n", loader=loader)
@@ -0,0 +1,133 @@
+# tests/test_rollups.py
+import os
+import tempfile
+import pytest
+from sqlalchemy import text
+
+from app.processing import process_csv_to_db
+from app.rollups import backfill_rollups
+from tests.conftest import TEST_DATABASE_URL
+
+ROLLUP_QUERY = text("""
+    SELECT user_id, spend_date, total_amount, txn_count, min_amount, max_amount
+    FROM user_daily_spend ORDER BY user_id, spend_date
+""")
+
+def ingest(csv_content, **kwargs):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(csv_content)
+        return process_csv_to_db.fn(file_path=path, database_url=TEST_DATABASE_URL, **kwargs)
+    finally:
+        os.remove(path)
+
+@pytest.mark.parametrize("loader", ["insert", "copy"])
+def test_rollup_updated_from_inserted_rows_only(db_session, loader):
+    header = "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+    ingest(header +
+           "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,100.50\n"
+           "22222222-2222-2222-2222-222222222222,1,1,2025-01-15 18:00:00,20.00\n"
+           "33333333-3333-3333-3333-333333333333,2,1,2025-01-16 09:00:00,5.25\n", loader=loader)
+
+    # A second file re-sends one existing id (ignored) alongside a new row for an existing day
+    ingest(header +
+           "11111111-1111-1111-1111-111111111111,1,1,2025-01-15 10:00:00,100.50\n"
+           "44444444-4444-4444-4444-444444444444,1,1,2025-01-15 23:59:59,300.00\n", loader=loader)
+
+    rows = db_session.execute(ROLLUP_QUERY).fetchall()
+    assert [(r.user_id, str(r.spend_date), float(r.total_amount), r.txn_count, float(r.min_amount), float(r.max_amount)) for r in rows] == [
+        (1, "2025-01-15", 420.50, 3, 20.00, 300.00),
+        (2, "2025-01-16", 5.25, 1, 5.25, 5.25),
+    ]
+
+    # The incrementally maintained rollup matches a rebuild from scratch
+    backfill_rollups(db_session.connection())
+    assert db_session.execute(ROLLUP_QUERY).fetchall() == rows
+
+# The full-table query /analytics/risk-profile used before user_aggregates existed
+FULL_SCAN_RISK_QUERY = text("""
+    WITH Amounts AS (
+        SELECT user_id, timestamp, amount_cents * 0.01 as transaction_amount FROM transactions
+    ),
+    UserAggregates AS (
+        SELECT user_id, SUM(transaction_amount) as total_spend, AVG(transaction_amount) as avg_spend,
+               COALESCE(STDDEV_POP(transaction_amount), 0) as spend_stddev
+        FROM Amounts GROUP BY user_id
+    ),
+    GlobalRanking AS (
+        SELECT user_id, total_spend,
+               CASE WHEN avg_spend = 0 THEN 0 ELSE (spend_stddev / avg_spend) END as volatility_index,
+               DENSE_RANK() OVER (ORDER BY total_spend DESC) as whale_rank
+        FROM UserAggregates
+    ),
+    UserTimeGaps AS (
+        SELECT user_id, transaction_amount,
+               EXTRACT(EPOCH FROM (timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp))) / 60 as mins_since_last_txn
+        FROM Amounts
+    )
+    SELECT r.user_id, r.whale_rank, ROUND(r.volatility_index, 2) as volatility_index, r.total_spend,
+           ROUND(MIN(g.mins_since_last_txn), 2) as shortest_txn_gap_mins, MAX(g.transaction_amount) as max_single_spike
+    FROM GlobalRanking r LEFT JOIN UserTimeGaps g ON r.user_id = g.user_id
+    GROUP BY r.user_id, r.whale_rank, r.volatility_index, r.total_spend
+    ORDER BY r.user_id
+""")
+
+def test_risk_profile_from_aggregates_matches_full_scan(client, db_session):
+    import random
+
+    rng = random.Random(7)
+    header = "transaction_id,user_id,product_id,timestamp,transaction_amount\n"
+    rows = [
+        f"{i:08d}-0000-0000-0000-000000000000,{rng.randint(1, 6)},1,"
+        f"2025-01-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00,{rng.uniform(1, 500):.2f}"
+        for i in range(300)
+    ]
+    # Several batches, out of time order, with duplicates, so gaps are found against older rows
+    ingest(header + "\n".join(rows[:120]), loader="copy")
+    ingest(header + "\n".join(rows[100:220]), loader="insert")
+    ingest(header + "\n".join(rows[200:] + rows[:10]), loader="copy", parser="typed")
+
+    for expected in db_session.execute(FULL_SCAN_RISK_QUERY).fetchall():
+        metrics = client.get(f"/analytics/risk-profile/{expected.user_id}").json()["risk_metrics"]
+        assert metrics["global_whale_rank"] == expected.whale_rank
+        assert metrics["spending_volatility_index"] == float(expected.volatility_index)
+        assert metrics["total_lifetime_spend"] == float(expected.total_spend)
+        assert metrics["max_single_transaction_spike"] == float(expected.max_single_spike)
+        assert metrics["shortest_time_between_transactions_mins"] == (
+            float(expected.shortest_txn_gap_mins) if expected.shortest_txn_gap_mins else None
+        )
+
+    # And the incremental aggregates agree with a rebuild from scratch
+    aggregates_query = text("SELECT * FROM user_aggregates ORDER BY user_id")
+    incremental = db_session.execute(aggregates_query).fetchall()
+    backfill_rollups(db_session.connection())
+    assert db_session.execute(aggregates_query).fetchall() == incremental
+
+def test_min_gap_counted_between_concurrent_writers(db_session):
+    import threading
+    from datetime import timedelta
+    import pandas as pd
+    from app.processing import COLUMNS, insert_chunk_to_db, prepare_chunk
+    from app.rollups import apply_inserted_rows
+    from tests.conftest import test_engine
+
+    def load(connection, transaction_id, timestamp):
+        chunk_df = pd.DataFrame([[transaction_id, 1, 1, timestamp, 10.0]], columns=COLUMNS)
+        apply_inserted_rows(connection, insert_chunk_to_db(prepare_chunk(chunk_df, "insert"), connection))
+
+    # Two writers each load one row for the same user; neither can see the other's row until it commits.
+    # Different days, so the daily rollup's row locks don't serialise them by accident
+    with test_engine.connect() as first, test_engine.connect() as second:
+        first.begin()
+        load(first, "11111111-1111-1111-1111-111111111111", "2025-01-15 23:59:00")
+        second.begin()
+        writer = threading.Thread(target=lambda: (load(second, "22222222-2222-2222-2222-222222222222", "2025-01-16 00:02:00"), second.commit()))
+        writer.start()
+        writer.join(timeout=1)
+        assert writer.is_alive() # Waiting for the first writer's lock on the user
+        first.commit()
+        writer.join()
+
+    min_gap = db_session.execute(text("SELECT min_gap FROM user_aggregates WHERE user_id = 1")).scalar()
+    assert min_gap == timedelta(minutes=3)
@@ -1,10 +1,25 @@
 # worker.py
+import glob
+import os
 from prefect import serve
+from prometheus_client import start_http_server
 from app.processing import run_csv_pipeline
 from app.gen_daily import run_nightly_generation
 from app.gen_bulk import run_bulk_generation
+from app.gen_fast import run_fast_generation
+from app.inbox import run_inbox_consumer
+from app.config import settings
+from app.metrics import MULTIPROC_DIR, scrape_registry
 
 if __name__ == "__main__":
+    # Flow runs are subprocesses, so their ingestion metrics reach this server through PROMETHEUS_MULTIPROC_DIR.
+    # Files left by a previous worker would be counted again.
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+    start_http_server(settings.WORKER_METRICS_PORT, registry=scrape_registry())
+
     # Upload any bulk CSV to database.
     csv_processor = run_csv_pipeline.to_deployment(
         name="csv-processor",
@@ -27,5 +42,24 @@ if __name__ == "__main__":
         description="Generates a custom number of rows and uploads them to the DB."
     )
 
-    serve(csv_processor, nightly_generator, bulk_generator, limit=1, pause_on_shutdown=False)
+    # On-demand vectorized generation straight into the loaders; a fixed seed reproduces the same rows.
+    fast_generator = run_fast_generation.to_deployment(
+        name="fast-generation-job",
+        tags=["generation", "manual"],
+        description="Generates millions of rows with NumPy and streams them into the DB, reproducibly with a seed."
+    )
+
+    deployments = [csv_processor, nightly_generator, bulk_generator, fast_generator]
+
+    # Loads queued inbox uploads in batches; a no-op run when nothing is due, so only served in inbox mode.
+    if settings.INGEST_MODE == "inbox":
+        deployments.append(run_inbox_consumer.to_deployment(
+            name="inbox-consumer",
+            tags=["csv", "inbox"],
+            interval=max(settings.INBOX_MAX_WAIT_SECONDS // 2, 1),
+            description="Coalesces pending inbox uploads into one ingestion batch."
+        ))
+
+    # Runs overlap up to WORKER_CONCURRENCY; INGEST_MAX_WRITERS separately caps how many of them write at once
+    serve(*deployments, limit=settings.WORKER_CONCURRENCY, pause_on_shutdown=False)
 